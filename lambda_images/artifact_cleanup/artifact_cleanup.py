@@ -0,0 +1,210 @@
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import unquote_plus
+from clients import client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+INVENTORY_PREFIX = "inventory"
+# delete_objects accepts at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+# Default Canvas layout and the per-user workspaces of the Canvas User product
+SHARED_WORKSPACE = re.compile(r"^Canvas/(?P<user>[^/]+)/")
+PER_USER_WORKSPACE = re.compile(r"^(?P<hash>[0-9a-f]{4})/(?P<user>[^/]+)/")
+
+
+class S3Store:
+    def __init__(self, bucket, max_workers=8):
+        self.bucket = bucket
+        self.s3 = client("s3", max_pool_connections=max_workers)
+
+    def list_prefixes(self, prefix):
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for common_prefix in page.get("CommonPrefixes", []):
+                yield common_prefix["Prefix"]
+
+    def exists(self, key):
+        return bool(self.s3.list_objects_v2(Bucket=self.bucket, Prefix=key, MaxKeys=1).get("KeyCount"))
+
+    def open(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+    def delete(self, keys):
+        response = self.s3.delete_objects(
+            Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+        return [error["Key"] for error in response.get("Errors", [])]
+
+
+class LocalStore:
+    # A local directory standing in for the Canvas bucket, inventory included
+    def __init__(self, root):
+        self.root = root
+
+    def list_prefixes(self, prefix):
+        directory = os.path.join(self.root, prefix)
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if os.path.isdir(os.path.join(directory, name)):
+                    yield f"{prefix}{name}/"
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.root, key))
+
+    def open(self, key):
+        return open(os.path.join(self.root, key), "rb")
+
+    def delete(self, keys):
+        failed = []
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                failed.append(key)
+        return failed
+
+
+def latest_manifest(store, bucket):
+    # Inventory reports are delivered to inventory/<bucket>/<configuration>/<timestamp>/manifest.json
+    timestamps = [
+        timestamp
+        for configuration in store.list_prefixes(f"{INVENTORY_PREFIX}/{bucket}/")
+        for timestamp in store.list_prefixes(configuration)
+        if not timestamp.endswith(("/data/", "/hive/"))
+    ]
+    for timestamp in sorted(timestamps, key=lambda prefix: prefix.split("/")[-2], reverse=True):
+        if store.exists(f"{timestamp}manifest.json"):
+            return f"{timestamp}manifest.json"
+    raise RuntimeError(f"no inventory report under {INVENTORY_PREFIX}/{bucket}/")
+
+
+def inventory_keys(store, manifest_key):
+    # Streams the keys of every report file, one gzip CSV row at a time
+    manifest = json.load(store.open(manifest_key))
+    if manifest.get("fileFormat", "CSV") != "CSV":
+        raise ValueError(f"unsupported inventory format {manifest['fileFormat']}, expected CSV")
+    columns = [column.strip() for column in manifest["fileSchema"].split(",")]
+    key_index = columns.index("Key")
+    for report_file in manifest["files"]:
+        with gzip.open(store.open(report_file["key"]), "rt", newline="") as rows:
+            for row in csv.reader(rows):
+                yield unquote_plus(row[key_index])
+
+
+def active_users(sagemaker=None):
+    # The bucket is shared by every domain of the account, so every profile of the account counts
+    sagemaker = sagemaker or client("sagemaker")
+    users = set()
+    for page in sagemaker.get_paginator("list_user_profiles").paginate(PaginationConfig={"PageSize": 100}):
+        for profile in page["UserProfiles"]:
+            if profile["Status"] != "Deleting":
+                users.add(profile["UserProfileName"].lower())
+    return users
+
+
+def owner(key):
+    match = SHARED_WORKSPACE.match(key)
+    if match:
+        return match.group(0), match.group("user").lower()
+    match = PER_USER_WORKSPACE.match(key)
+    # Only prefixes whose hash matches the user name are workspaces, any other 4 character folder is left alone
+    if match and hashlib.sha256(match.group("user").lower().encode()).hexdigest()[:4] == match.group("hash"):
+        return match.group(0), match.group("user").lower()
+    return None, None
+
+
+def delete_batch(store, keys):
+    failed = store.delete(keys)
+    return len(keys) - len(failed), failed
+
+
+def cleanup(store, manifest_key, users, dry_run=True, max_workers=8):
+    if not users:
+        raise RuntimeError("no active user profile found, refusing to treat every workspace as orphaned")
+
+    report = {"dry_run": dry_run, "manifest": manifest_key, "scanned": 0, "orphaned": {}, "deleted": 0, "failed": []}
+
+    def collect(futures):
+        for future in futures:
+            deleted, failed = future.result()
+            report["deleted"] += deleted
+            report["failed"].extend(failed)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        batch = []
+        for key in inventory_keys(store, manifest_key):
+            report["scanned"] += 1
+            prefix, user = owner(key)
+            if prefix is None or user in users:
+                continue
+            report["orphaned"][prefix] = report["orphaned"].get(prefix, 0) + 1
+            if dry_run:
+                continue
+            batch.append(key)
+            if len(batch) == DELETE_BATCH_SIZE:
+                pending.add(executor.submit(delete_batch, store, batch))
+                batch = []
+            # Keeps a bounded number of batches in flight so memory stays flat whatever the inventory size
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        if batch:
+            pending.add(executor.submit(delete_batch, store, batch))
+        collect(wait(pending).done)
+
+    logger.info(
+        f"scanned {report['scanned']} keys, {sum(report['orphaned'].values())} in "
+        f"{len(report['orphaned'])} orphaned prefixes, deleted {report['deleted']}, failed {len(report['failed'])}"
+    )
+    return report
+
+
+def lambda_handler(event, context):
+    bucket = os.environ["CANVAS_BUCKET"]
+    max_workers = int(os.environ.get("MAX_WORKERS", "8"))
+    store = S3Store(bucket, max_workers=max_workers)
+    manifest_key = event.get("manifest") or latest_manifest(store, bucket)
+    dry_run = str(event.get("dry_run", os.environ.get("DRY_RUN", "true"))).lower() == "true"
+    report = cleanup(store, manifest_key, active_users(), dry_run=dry_run, max_workers=max_workers)
+    if report["failed"]:
+        raise RuntimeError(f"failed to delete {len(report['failed'])} objects, e.g. {report['failed'][:10]}")
+    return report
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("s3", max_pool_connections=int(os.environ.get("MAX_WORKERS", "8")))
+    client("sagemaker")
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description="Delete the Canvas artifacts of user profiles that no longer exist")
+    parser.add_argument("root", help="s3://<canvas bucket> or a local directory with the same layout")
+    parser.add_argument("--manifest", help="Inventory manifest key, defaults to the latest report")
+    parser.add_argument("--users", nargs="*", help="Active user profiles, defaults to the profiles of the account")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--delete", action="store_true", help="Delete the orphaned objects, only reports them otherwise")
+    args = parser.parse_args()
+
+    if args.root.startswith("s3://"):
+        bucket = args.root[len("s3://"):].strip("/")
+        store = S3Store(bucket, max_workers=args.workers)
+    else:
+        bucket = os.path.basename(os.path.abspath(args.root))
+        store = LocalStore(args.root)
+    users = {user.lower() for user in args.users} if args.users is not None else active_users()
+    report = cleanup(
+        store, args.manifest or latest_manifest(store, bucket), users, dry_run=not args.delete, max_workers=args.workers
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,168 @@
+import os
+import datetime
+import hashlib
+from clients import client
+
+ACTIVITY_NAMESPACE = '/aws/sagemaker/Canvas/AppActivity'
+# GetMetricData accepts at most 500 queries per call
+MAX_QUERIES = 500
+
+# List operation and result key of every job type that a Canvas model build can run
+JOB_LISTINGS = [
+    ('list_auto_ml_jobs', 'AutoMLJobSummaries', 'AutoMLJobArn'),
+    ('list_training_jobs', 'TrainingJobSummaries', 'TrainingJobArn'),
+    ('list_processing_jobs', 'ProcessingJobSummaries', 'ProcessingJobArn'),
+]
+JOB_RESOURCE_TYPES = ['sagemaker:automl-job', 'sagemaker:training-job', 'sagemaker:processing-job']
+OWNER_TAG = 'sagemaker:user-profile-arn'
+
+
+def job_owners(tagging):
+    # Owner of every job started from a user profile, in one sweep instead of a ListTags call per job
+    owners = {}
+    for page in tagging.get_paginator('get_resources').paginate(
+        ResourceTypeFilters=JOB_RESOURCE_TYPES,
+        TagFilters=[{'Key': OWNER_TAG}],
+    ):
+        for resource in page['ResourceTagMappingList']:
+            owner = next(tag['Value'] for tag in resource['Tags'] if tag['Key'] == OWNER_TAG)
+            owners[resource['ResourceARN'].lower()] = owner
+    return owners
+
+
+def running_jobs_index(sagemaker, tagging):
+    # Maps (domain_id, user_profile_name) to the in-progress jobs started from that user profile
+    owners = job_owners(tagging)
+    index = {}
+    for operation, summaries_key, arn_key in JOB_LISTINGS:
+        for page in sagemaker.get_paginator(operation).paginate(StatusEquals='InProgress'):
+            for job in page[summaries_key]:
+                owner = owners.get(job[arn_key].lower())
+                if owner is None:
+                    continue
+                # ARNs are lower case while metric labels keep the user profile name as created
+                domain_id, user_profile_name = owner.lower().split('/')[-2:]
+                index.setdefault((domain_id, user_profile_name), []).append(job[arn_key])
+    return index
+
+
+def shard_of(user_profile_name, shard_count):
+    # Stable across runs, unlike hash(), and spreads users evenly whatever their names have in common
+    digest = hashlib.sha256(user_profile_name.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def running_canvas_users(sagemaker, domain_id, shard, shard_count):
+    # User profiles of this shard with a Canvas app in service, the only ones publishing TimeSinceLastActive
+    users = []
+    for page in sagemaker.get_paginator('list_apps').paginate(DomainIdEquals=domain_id):
+        for app in page['Apps']:
+            if app['AppType'] == 'Canvas' and app['Status'] == 'InService' \
+                    and shard_of(app['UserProfileName'], shard_count) == shard:
+                users.append(app['UserProfileName'])
+    return users
+
+
+def time_since_last_active(cloudwatch, domain_id, user_profile_names, period, end_time):
+    # Latest TimeSinceLastActive of every user, a plain metric query per user in batches of MAX_QUERIES,
+    # so that no user is dropped from a capped Metrics Insights GROUP BY result
+    latest = {}
+    for start in range(0, len(user_profile_names), MAX_QUERIES):
+        batch = user_profile_names[start:start + MAX_QUERIES]
+        queries = [
+            {
+                "Id": f"u{index}",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": ACTIVITY_NAMESPACE,
+                        "MetricName": "TimeSinceLastActive",
+                        "Dimensions": [
+                            {"Name": "DomainId", "Value": domain_id},
+                            {"Name": "UserProfileName", "Value": user_profile_name},
+                        ],
+                    },
+                    "Period": period,
+                    "Stat": "Maximum",
+                },
+            }
+            for index, user_profile_name in enumerate(batch)
+        ]
+        for page in cloudwatch.get_paginator('get_metric_data').paginate(
+            MetricDataQueries=queries,
+            StartTime=end_time - datetime.timedelta(seconds=3 * period),
+            EndTime=end_time,
+            ScanBy='TimestampDescending',
+        ):
+            for result in page['MetricDataResults']:
+                user_profile_name = batch[int(result['Id'][1:])]
+                # Datapoints come newest first, later pages only hold older ones
+                if result['Values'] and user_profile_name not in latest:
+                    latest[user_profile_name] = result['Values'][0]
+    return latest
+
+
+def lambda_handler(event, context):
+    region = event['region']
+    shard = event.get('shard', 0)
+    shard_count = int(os.environ.get('SHARD_COUNT', 1))
+    domain_id = os.environ['DOMAIN_ID']
+    period = int(os.environ['ALARM_PERIOD'])
+    threshold = int(os.environ['TIMEOUT_THRESHOLD'])
+
+    try:
+        sagemaker = client('sagemaker', region)
+        cloudwatch = client('cloudwatch', region)
+        end_time = datetime.datetime.now(datetime.timezone.utc)
+        users = running_canvas_users(sagemaker, domain_id, shard, shard_count)
+        idle_times = time_since_last_active(cloudwatch, domain_id, users, period, end_time) if users else {}
+        print(f"Evaluating {len(users)} Canvas apps in shard {shard}.")
+
+        jobs_index = None
+        # Apps still running once this run is over, their idle time is what the shard alarm watches
+        left_running = {}
+        for user_profile_name, latest_value in idle_times.items():
+            if latest_value < threshold:
+                left_running[user_profile_name] = latest_value
+                continue
+            status = sagemaker.describe_app(
+                DomainId=domain_id,
+                UserProfileName=user_profile_name,
+                AppType='Canvas',
+                AppName='default'
+            )['Status'] # Possible options: 'Deleted'|'Deleting'|'Failed'|'InService'|'Pending'
+            if status == 'InService' and jobs_index is None:
+                # Only built once per run, and only when at least one app is about to be deleted
+                jobs_index = running_jobs_index(sagemaker, client('resourcegroupstaggingapi', region))
+            running_jobs = (jobs_index or {}).get((domain_id.lower(), user_profile_name.lower()), [])
+            if status == 'InService' and running_jobs:
+                print(f"Canvas App for {user_profile_name} in domain {domain_id} has {len(running_jobs)} jobs in progress. Will not delete for now.")
+                left_running[user_profile_name] = latest_value
+                continue
+            if status == 'InService':
+                print(f"Canvas App for {user_profile_name} in domain {domain_id} will be deleted.")
+                sagemaker.delete_app(
+                    DomainId=domain_id,
+                    UserProfileName=user_profile_name,
+                    AppType='Canvas',
+                    AppName='default'
+                )
+            else:
+                print(f"Canvas App for {user_profile_name} in domain {domain_id} is in {status} status. Will not delete for now.")
+
+        cloudwatch.put_metric_data(
+            Namespace=os.environ['METRIC_NAMESPACE'],
+            MetricData=[{
+                "MetricName": "MaxTimeSinceLastActive",
+                "Dimensions": [{"Name": "DomainId", "Value": domain_id}, {"Name": "Shard", "Value": str(shard)}],
+                "Value": max(left_running.values(), default=0),
+                "Unit": "Seconds",
+            }],
+        )
+    except Exception as e:
+        print(str(e))
+        raise e
+
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'snap-start':
+    client('cloudwatch', os.environ['AWS_REGION'])
+    client('sagemaker', os.environ['AWS_REGION'])
+    client('resourcegroupstaggingapi', os.environ['AWS_REGION'])
@@ -0,0 +1,119 @@
+import os
+import datetime
+from clients import client
+
+# GetMetricData accepts at most 500 queries per call
+MAX_QUERIES = 500
+
+
+def canvas_endpoints(sagemaker, tagging, domain_arn):
+    # Canvas direct deployments are tagged with the domain they were deployed from
+    tagged = set()
+    for page in tagging.get_paginator('get_resources').paginate(
+        ResourceTypeFilters=['sagemaker:endpoint'],
+        TagFilters=[{'Key': 'sagemaker:domain-arn', 'Values': [domain_arn]}],
+    ):
+        for resource in page['ResourceTagMappingList']:
+            tagged.add(resource['ResourceARN'].split('/')[-1].lower())
+
+    endpoints = []
+    for page in sagemaker.get_paginator('list_endpoints').paginate(StatusEquals='InService'):
+        for endpoint in page['Endpoints']:
+            if endpoint['EndpointName'].lower() in tagged:
+                endpoints.append(endpoint)
+    return endpoints
+
+
+def variant_metrics(cloudwatch, endpoint_names):
+    # One sweep of the Invocations metrics instead of a SEARCH per endpoint, GetMetricData only takes a few SEARCH
+    # expressions per call. An endpoint without any metric was not invoked in the 2 weeks ListMetrics covers.
+    metrics = []
+    for page in cloudwatch.get_paginator('list_metrics').paginate(Namespace='AWS/SageMaker', MetricName='Invocations'):
+        for metric in page['Metrics']:
+            dimensions = {dimension['Name']: dimension['Value'] for dimension in metric['Dimensions']}
+            if set(dimensions) == {'EndpointName', 'VariantName'} and dimensions['EndpointName'] in endpoint_names:
+                metrics.append(metric)
+    return metrics
+
+
+def invocation_queries(metrics, idle_timeout):
+    # A plain metric query per variant, summed over the whole idle window in a single datapoint
+    return [
+        {
+            "Id": f"v{index}",
+            "Label": next(dimension['Value'] for dimension in metric['Dimensions'] if dimension['Name'] == 'EndpointName'),
+            "MetricStat": {"Metric": metric, "Period": idle_timeout, "Stat": "Sum"},
+        }
+        for index, metric in enumerate(metrics)
+    ]
+
+
+def invocations(cloudwatch, endpoints, idle_timeout, end_time):
+    # Sum of the Invocations of every variant over the whole idle window, per endpoint
+    totals = {}
+    metrics = variant_metrics(cloudwatch, {endpoint['EndpointName'] for endpoint in endpoints})
+    for start in range(0, len(metrics), MAX_QUERIES):
+        queries = invocation_queries(metrics[start:start + MAX_QUERIES], idle_timeout)
+        for page in cloudwatch.get_paginator('get_metric_data').paginate(
+            MetricDataQueries=queries,
+            StartTime=end_time - datetime.timedelta(seconds=idle_timeout),
+            EndTime=end_time,
+        ):
+            for result in page['MetricDataResults']:
+                totals[result['Label']] = totals.get(result['Label'], 0) + sum(result['Values'])
+    return totals
+
+
+def scale_down(sagemaker, endpoint_name):
+    variants = sagemaker.describe_endpoint(EndpointName=endpoint_name)['ProductionVariants']
+    capacities = [
+        {'VariantName': variant['VariantName'], 'DesiredInstanceCount': 1}
+        for variant in variants
+        if variant.get('CurrentInstanceCount', 0) > 1
+    ]
+    if capacities:
+        sagemaker.update_endpoint_weights_and_capacities(
+            EndpointName=endpoint_name,
+            DesiredWeightsAndCapacities=capacities,
+        )
+
+
+def lambda_handler(event, context):
+    region = event['region']
+    idle_timeout = int(os.environ['ENDPOINT_IDLE_TIMEOUT'])
+    action = os.environ['ENDPOINT_IDLE_ACTION']
+
+    try:
+        sagemaker = client('sagemaker', region)
+        tagging = client('resourcegroupstaggingapi', region)
+
+        end_time = datetime.datetime.now(datetime.timezone.utc)
+        endpoints = canvas_endpoints(sagemaker, tagging, os.environ['DOMAIN_ARN'])
+        # Endpoints created or updated within the window haven't had the chance to be invoked yet
+        candidates = [
+            endpoint for endpoint in endpoints
+            if (end_time - endpoint['LastModifiedTime']).total_seconds() >= idle_timeout
+        ]
+        totals = invocations(client('cloudwatch', region), candidates, idle_timeout, end_time) if candidates else {}
+        print(f"Evaluating {len(candidates)} of {len(endpoints)} Canvas endpoints.")
+
+        for endpoint in candidates:
+            endpoint_name = endpoint['EndpointName']
+            if totals.get(endpoint_name, 0) > 0:
+                continue
+            if action == 'Delete':
+                # The endpoint config is kept so that a redeploy from Canvas stays fast
+                print(f"Canvas endpoint {endpoint_name} is idle and will be deleted.")
+                sagemaker.delete_endpoint(EndpointName=endpoint_name)
+            else:
+                print(f"Canvas endpoint {endpoint_name} is idle and will be scaled down.")
+                scale_down(sagemaker, endpoint_name)
+    except Exception as e:
+        print(str(e))
+        raise e
+
+
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'snap-start':
+    client('cloudwatch', os.environ['AWS_REGION'])
+    client('sagemaker', os.environ['AWS_REGION'])
+    client('resourcegroupstaggingapi', os.environ['AWS_REGION'])
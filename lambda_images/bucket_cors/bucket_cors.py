@@ -0,0 +1,35 @@
+import json
+import os
+from clients import client
+
+
+def lambda_handler(event, context):
+    s3 = client('s3')
+    bucket_name = event['BucketName']
+    cors_configuration = {
+        'CORSRules': [{
+            'AllowedMethods': ['POST', 'PUT', 'GET', 'HEAD', 'DELETE'],
+            'AllowedOrigins': ['https://*.sagemaker.aws'],
+            'AllowedHeaders': ['*'],
+            'ExposeHeaders': ['ETag', 'x-amz-delete-marker', 'x-amz-id-2', 'x-amz-request-id', 'x-amz-server-side-encryption', 'x-amz-version-id']
+        }]
+    }
+    try:
+        s3.head_bucket(Bucket=bucket_name)
+        print(f"Bucket {bucket_name} exists. Applying CORS configuration.")
+    except s3.exceptions.ClientError:
+        print(f"Bucket {bucket_name} does not exist. Creating bucket and applying CORS configuration.")
+        s3.create_bucket(Bucket=bucket_name)
+
+    s3.put_bucket_cors(
+        Bucket=bucket_name,
+        CORSConfiguration=cors_configuration
+    )
+    return {
+        'statusCode': 200,
+        'body': json.dumps(f"CORS configuration applied to {bucket_name}")
+    }
+
+
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'snap-start':
+    client('s3')
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from clients import client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Polled at a fixed interval rather than backing off, the interval bounds the precision of the measured latencies
+POLL_INTERVAL = 5
+# Set by the product, which keeps the latency alarm threshold under it
+START_TIMEOUT = int(os.environ.get("START_TIMEOUT", 12 * 60))
+APP_TYPE = "Canvas"
+APP_NAME = "default"
+UNKNOWN_AZ = "unknown"
+
+
+async def call(service_name, operation, **kwargs):
+    # Clients block, each call runs in a worker thread so the domains are probed concurrently.
+    # The client is built here, on the event loop, as building clients is not thread safe.
+    return await asyncio.to_thread(getattr(client(service_name), operation), **kwargs)
+
+
+def not_found(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code") == "ResourceNotFound"
+
+
+async def app_status(app_id):
+    try:
+        return (await call("sagemaker", "describe_app", **app_id))["Status"]
+    except Exception as e:
+        if not_found(e):
+            return "Deleted"
+        raise
+
+
+async def wait_status(app_id, statuses, timeout):
+    # Returns the first status among statuses, or None once the timeout is reached
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        status = await app_status(app_id)
+        if status in statuses:
+            return status
+        await asyncio.sleep(POLL_INTERVAL)
+    return None
+
+
+async def network_interfaces(subnet_ids):
+    # ENIs SageMaker manages in the domain subnets, with their description, which names the domain
+    ec2 = client("ec2")
+
+    def collect():
+        paginator = ec2.get_paginator("describe_network_interfaces")
+        pages = paginator.paginate(Filters=[
+            {"Name": "subnet-id", "Values": subnet_ids},
+            {"Name": "requester-managed", "Values": ["true"]},
+        ])
+        return {
+            eni["NetworkInterfaceId"]: (eni["AvailabilityZone"], eni.get("Description", ""))
+            for page in pages for eni in page["NetworkInterfaces"]
+        }
+    return await asyncio.to_thread(collect)
+
+
+def app_zone(domain_id, before, after):
+    # The app's ENI is among the ENIs of the domain that appeared while it started. Other apps of the domain starting
+    # at the same time cannot be told apart from it, so the AZ is only known when all those ENIs are in one AZ.
+    zones = {
+        az for eni, (az, description) in after.items()
+        if eni not in before and domain_id in description
+    }
+    return zones.pop() if len(zones) == 1 else UNKNOWN_AZ
+
+
+async def probe(domain_id, user_profile_name, timeout):
+    # Starts the Canvas app of the probe profile, times each phase until it is deleted again
+    app_id = {"DomainId": domain_id, "UserProfileName": user_profile_name, "AppType": APP_TYPE, "AppName": APP_NAME}
+    result = {"domain_id": domain_id, "user": user_profile_name, "az": UNKNOWN_AZ, "phases": {}, "status": "failed"}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    # Leftover of a run that could not delete its app
+    if await app_status(app_id) not in ("Deleted", "Deleting"):
+        await call("sagemaker", "delete_app", **app_id)
+    if await wait_status(app_id, ("Deleted",), timeout / 2) is None:
+        result["error"] = "the app of the previous run is still being deleted"
+        return result
+
+    # SageMaker picks the subnet of the app, its AZ is the one of the network interface that appears with the app
+    subnet_ids = (await call("sagemaker", "describe_domain", DomainId=domain_id))["SubnetIds"]
+    before = await network_interfaces(subnet_ids)
+
+    start = loop.time()
+    await call("sagemaker", "create_app", **app_id)
+    result["phases"]["CreateAppCall"] = loop.time() - start
+    try:
+        status = await wait_status(app_id, ("InService", "Failed"), min(START_TIMEOUT, deadline - loop.time()))
+        if status == "InService":
+            result["phases"]["TimeToInService"] = loop.time() - start
+            result["status"] = "succeeded"
+        elif status is None:
+            # Published as a sample too, a start slower than the timeout still counts in the latency percentiles
+            result["phases"]["TimeToInService"] = loop.time() - start
+            result["error"] = "the app is still starting"
+        else:
+            result["error"] = f"the app is {status}"
+        result["az"] = app_zone(domain_id, before, await network_interfaces(subnet_ids))
+    finally:
+        # A billed Canvas session, deleted as soon as it is measured or given up on, whatever happened since it was created
+        start = loop.time()
+        await call("sagemaker", "delete_app", **app_id)
+        if await wait_status(app_id, ("Deleted",), max(deadline - loop.time(), 0)) is not None:
+            result["phases"]["TimeToDeleted"] = loop.time() - start
+    return result
+
+
+def metric_data(result):
+    # Every datapoint is published per domain and per domain and AZ, as a distribution with one value,
+    # so that CloudWatch aggregates them into histograms and serves any percentile of them
+    data = []
+    for dimensions in (
+        [{"Name": "DomainId", "Value": result["domain_id"]}],
+        [{"Name": "DomainId", "Value": result["domain_id"]}, {"Name": "AvailabilityZone", "Value": result["az"]}],
+    ):
+        for phase, seconds in result["phases"].items():
+            data.append({
+                "MetricName": phase, "Dimensions": dimensions, "Values": [seconds], "Counts": [1], "Unit": "Seconds",
+            })
+        data.append({
+            "MetricName": "StartFailures", "Dimensions": dimensions,
+            "Value": 0 if result["status"] == "succeeded" else 1, "Unit": "Count",
+        })
+    return data
+
+
+async def run_canary(probes, timeout):
+    results = await asyncio.gather(
+        *(probe(domain_id, user_profile_name, timeout) for domain_id, user_profile_name in probes),
+        return_exceptions=True,
+    )
+    report = []
+    for (domain_id, user_profile_name), result in zip(probes, results):
+        if isinstance(result, Exception):
+            result = {"domain_id": domain_id, "user": user_profile_name, "az": UNKNOWN_AZ, "phases": {},
+                      "status": "failed", "error": str(result)}
+        report.append(result)
+    return report
+
+
+def publish(report, namespace):
+    for result in report:
+        client("cloudwatch").put_metric_data(Namespace=namespace, MetricData=metric_data(result))
+
+
+def lambda_handler(event, context):
+    # Other domains can be probed with {"probes": ["<domain id>/<user profile name>"]}
+    probes = [probe.split("/", 1) for probe in event.get("probes", [])] or [
+        (os.environ["DOMAIN_ID"], os.environ["PROBE_USER_PROFILE"])
+    ]
+    # Keeps a minute to publish the metrics
+    timeout = context.get_remaining_time_in_millis() / 1000 - 60
+    report = asyncio.run(run_canary(probes, timeout))
+    publish(report, os.environ["METRIC_NAMESPACE"])
+    logger.info(json.dumps(report))
+    return report
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("sagemaker")
+    client("ec2")
+    client("cloudwatch")
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description="Time the start and deletion of the Canvas app of probe user profiles")
+    parser.add_argument("probes", nargs="+", help="<domain id>/<user profile name> of the probe profiles")
+    parser.add_argument("--timeout", type=int, default=15 * 60, help="Seconds a probe may take")
+    parser.add_argument("--namespace", help="Publishes the metrics to this namespace when given")
+    args = parser.parse_args()
+    report = asyncio.run(run_canary([probe.split("/", 1) for probe in args.probes], args.timeout))
+    if args.namespace:
+        publish(report, args.namespace)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,33 @@
+import cfnresponse
+from clients import client
+
+
+def lambda_handler(event, context):
+    response_status = cfnresponse.SUCCESS
+    sagemaker_domain_id = event['ResourceProperties']['SageMakerDomainId']
+    sagemaker_execution_role = event['ResourceProperties']['SageMakerExecutionRoleARN']
+    canvas_bucket_artifacts = event['ResourceProperties']['CanvasBucketName']
+
+    if 'RequestType' in event and event['RequestType'] == 'Create':
+        client('sagemaker').update_domain(
+            DomainId=sagemaker_domain_id,
+            DefaultUserSettings={
+                'CanvasAppSettings': {
+                    'WorkspaceSettings': {'S3ArtifactPath': f's3://{canvas_bucket_artifacts}/'},
+                    'TimeSeriesForecastingSettings': {'Status': 'ENABLED'},
+                    'ModelRegisterSettings': {'Status': 'ENABLED'},
+                    'DirectDeploySettings': {'Status': 'ENABLED'},
+                    'KendraSettings': {'Status': 'DISABLED'}, # Change to ENABLED when you want to use Kendra for RAG
+                    'GenerativeAiSettings': {'AmazonBedrockRoleArn':sagemaker_execution_role},
+                    # Uncomment and modify the below if you need to add OAuth for Salesforce or Snowflake
+                    # 'IdentityProviderOAuthSettings': [
+                    #     {
+                    #         'DataSourceName': 'SalesforceGenie'|'Snowflake',
+                    #         'Status': 'ENABLED'|'DISABLED',
+                    #         'SecretArn': 'string'
+                    #     },
+                    # ],
+                }
+            }
+        )
+    cfnresponse.send(event, context, response_status, {}, '')
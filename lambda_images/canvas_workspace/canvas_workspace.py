@@ -0,0 +1,48 @@
+import copy
+import hashlib
+import cfnresponse
+from clients import client
+
+
+def merge(current, desired):
+    # UpdateUserProfile replaces the whole WorkspaceSettings structure it is given, the desired settings are applied on top
+    if not isinstance(desired, dict) or not isinstance(current, dict):
+        return copy.deepcopy(desired)
+    merged = copy.deepcopy(current)
+    for key, value in desired.items():
+        merged[key] = merge(current.get(key), value)
+    return merged
+
+
+def canvas_settings(domain_id, user_profile_name, artifact_path):
+    # Only the workspace settings are sent, the other Canvas settings keep following the domain defaults
+    profile = client('sagemaker').describe_user_profile(DomainId=domain_id, UserProfileName=user_profile_name)
+    current = profile.get('UserSettings', {}).get('CanvasAppSettings', {}).get('WorkspaceSettings', {})
+    return {'WorkspaceSettings': merge(current, {'S3ArtifactPath': artifact_path})}
+
+
+def workspace_prefix(user_profile_name):
+    # A hashed leading prefix spreads the users' request load across S3 partitions
+    return hashlib.sha256(user_profile_name.lower().encode()).hexdigest()[:4]
+
+
+def lambda_handler(event, context):
+    response_status = cfnresponse.SUCCESS
+    data = {}
+    try:
+        domain_id = event['ResourceProperties']['SageMakerDomainId']
+        user_profile_name = event['ResourceProperties']['UserProfileName']
+        canvas_bucket = event['ResourceProperties']['CanvasBucketName']
+        artifact_path = f's3://{canvas_bucket}/{workspace_prefix(user_profile_name)}/{user_profile_name}/'
+        data['S3ArtifactPath'] = artifact_path
+
+        if event['RequestType'] in ('Create', 'Update'):
+            client('sagemaker').update_user_profile(
+                DomainId=domain_id,
+                UserProfileName=user_profile_name,
+                UserSettings={'CanvasAppSettings': canvas_settings(domain_id, user_profile_name, artifact_path)},
+            )
+    except Exception as e:
+        print(str(e))
+        response_status = cfnresponse.FAILED
+    cfnresponse.send(event, context, response_status, data, event.get('PhysicalResourceId', context.log_stream_name))
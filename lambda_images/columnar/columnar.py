@@ -0,0 +1,187 @@
+import argparse
+import base64
+import json
+import logging
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+REGISTRY_KEY = "columnar/registry.json"
+OUTPUT_PREFIX = "columnar"
+SCHEMA_CACHE_PREFIX = "columnar/_schemas"
+# Size of the CSV chunks read at a time, memory stays bounded by a few chunks whatever the file size
+BLOCK_SIZE = 64 * 1024 * 1024
+# The writer buffers up to a row group for each open file, at most MAX_OPEN_FILES * ROW_GROUP_SIZE bytes
+# whatever the number of partitions, files are closed and new ones started past MAX_OPEN_FILES
+ROW_GROUP_SIZE = 64 * 1024 * 1024
+MAX_OPEN_FILES = 16
+MIN_ROWS_PER_GROUP = 16 * 1024
+MAX_ROWS_PER_GROUP = 1024 * 1024
+MAX_ROWS_PER_FILE = 16 * 1024 * 1024
+CONVERSION_ERROR = re.compile(r"In CSV column #(\d+): .*CSV conversion error")
+
+
+def open_root(root):
+    # root is s3://bucket for the Canvas bucket, or a local directory standing in for it
+    filesystem, path = fs.FileSystem.from_uri(root)
+    return filesystem, path.rstrip("/")
+
+
+def read_json(filesystem, path):
+    if filesystem.get_file_info(path).type == fs.FileType.NotFound:
+        return None
+    with filesystem.open_input_stream(path) as f:
+        return json.loads(f.read())
+
+
+def write_json(filesystem, path, document):
+    filesystem.create_dir(os.path.dirname(path), recursive=True)
+    with filesystem.open_output_stream(path) as f:
+        f.write(json.dumps(document, indent=2).encode())
+
+
+def source_version(info):
+    return f"{info.size}-{info.mtime_ns}"
+
+
+def widen(field):
+    # Types inferred from the first block only, widened to hold what later blocks may bring
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    if pa.types.is_integer(field.type):
+        return field.with_type(pa.int64())
+    if pa.types.is_floating(field.type):
+        return field.with_type(pa.float64())
+    return field
+
+
+def initial_schema(stream, cached_schema, column_types):
+    # Cached types first, then the registry's explicit column_types, then the widened inference
+    reader = csv.open_csv(stream, read_options=csv.ReadOptions(block_size=BLOCK_SIZE))
+    batch = reader.read_next_batch()
+    fields = []
+    for field in reader.schema:
+        if field.name in column_types:
+            fields.append(field.with_type(pa.type_for_alias(column_types[field.name])))
+        elif cached_schema is not None and field.name in cached_schema.names:
+            fields.append(cached_schema.field(field.name))
+        else:
+            fields.append(widen(field))
+    return pa.schema(fields), batch.nbytes / max(batch.num_rows, 1)
+
+
+def rows_per_group(row_size):
+    return int(min(max(ROW_GROUP_SIZE // max(row_size, 1), MIN_ROWS_PER_GROUP), MAX_ROWS_PER_GROUP))
+
+
+def write_parquet(filesystem, source, output, schema, partitioning, row_size):
+    with filesystem.open_input_stream(source) as stream:
+        reader = csv.open_csv(
+            stream,
+            read_options=csv.ReadOptions(block_size=BLOCK_SIZE),
+            convert_options=csv.ConvertOptions(column_types=schema),
+        )
+        # Streams record batches to Parquet, hive partitioned so that Athena and Glue prune partitions
+        ds.write_dataset(
+            reader,
+            output,
+            filesystem=filesystem,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([schema.field(column) for column in partitioning]), flavor="hive"
+            ) if partitioning else None,
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression="zstd", write_statistics=True
+            ),
+            min_rows_per_group=min(MIN_ROWS_PER_GROUP, rows_per_group(row_size)),
+            max_rows_per_group=rows_per_group(row_size),
+            max_rows_per_file=MAX_ROWS_PER_FILE,
+            max_open_files=MAX_OPEN_FILES,
+            existing_data_behavior="delete_matching",
+        )
+
+
+def materialize(filesystem, root, dataset):
+    name = dataset["name"]
+    source = f"{root}/{dataset['source']}"
+    output = f"{root}/{OUTPUT_PREFIX}/{name}"
+    cache_path = f"{root}/{SCHEMA_CACHE_PREFIX}/{name}.json"
+
+    info = filesystem.get_file_info(source)
+    if info.type == fs.FileType.NotFound:
+        logger.warning(f"dataset {name}: {source} not found")
+        return "missing"
+
+    # The schema cache skips unchanged sources and pins the column types across chunks and runs
+    cache = read_json(filesystem, cache_path)
+    if cache and cache["source_version"] == source_version(info) and cache.get("materialized"):
+        logger.info(f"dataset {name}: unchanged, skipping")
+        return "skipped"
+    cached_schema = pa.ipc.read_schema(pa.py_buffer(base64.b64decode(cache["schema"]))) if cache else None
+
+    with filesystem.open_input_stream(source) as stream:
+        schema, row_size = initial_schema(stream, cached_schema, dataset.get("column_types", {}))
+    write_json(filesystem, cache_path, {
+        "source_version": source_version(info),
+        "schema": base64.b64encode(schema.serialize().to_pybytes()).decode(),
+        "columns": {field.name: str(field.type) for field in schema},
+        "materialized": False,
+    })
+
+    # A value later in the file that does not fit its column's type turns the column into strings,
+    # and the conversion restarts, at most once per column
+    for _ in range(len(schema) + 1):
+        try:
+            write_parquet(filesystem, source, output, schema, dataset.get("partition_by", []), row_size)
+            break
+        except pa.ArrowInvalid as e:
+            match = CONVERSION_ERROR.search(str(e))
+            if not match or pa.types.is_string(schema.field(int(match.group(1))).type):
+                raise
+            index = int(match.group(1))
+            logger.warning(f"dataset {name}: column {schema.field(index).name} widened to string, {e}")
+            schema = schema.set(index, schema.field(index).with_type(pa.string()))
+
+    write_json(filesystem, cache_path, {
+        "source_version": source_version(info),
+        "schema": base64.b64encode(schema.serialize().to_pybytes()).decode(),
+        "columns": {field.name: str(field.type) for field in schema},
+        "materialized": True,
+    })
+    logger.info(f"dataset {name}: materialized to {output}")
+    return "materialized"
+
+
+def materialize_registry(root):
+    filesystem, root = open_root(root)
+    registry = read_json(filesystem, f"{root}/{REGISTRY_KEY}") or {"datasets": []}
+    report = {}
+    for dataset in registry["datasets"]:
+        try:
+            report[dataset["name"]] = materialize(filesystem, root, dataset)
+        except Exception as e:
+            logger.error(f"dataset {dataset['name']}: {e}")
+            report[dataset["name"]] = "failed"
+    return report
+
+
+def lambda_handler(event, context):
+    report = materialize_registry(f"s3://{os.environ['CANVAS_BUCKET']}")
+    if "failed" in report.values():
+        raise RuntimeError(f"failed to materialize {report}")
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description="Convert the registered Canvas CSV datasets to Parquet")
+    parser.add_argument("root", help="s3://<canvas bucket> or a local directory with the same layout")
+    args = parser.parse_args()
+    print(json.dumps(materialize_registry(args.root), indent=2))
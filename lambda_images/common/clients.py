@@ -0,0 +1,26 @@
+# Shared by the handlers that import it, pasted in place of their import of this module when they are
+# deployed inline, see studio_constructs/lambda_profile.py
+
+# botocore is imported and clients are built on first use, which keeps them out of the init phase,
+# unless SnapStart is snapshotting the init phase, where they are built ahead of the first invocation.
+# boto3 is not imported, its session only wraps a botocore session, which the clients share.
+_session = None
+_clients = {}
+
+
+# Handlers calling a client from many threads size its connection pool to their number of workers.
+def client(service_name, region_name=None, max_pool_connections=10):
+    global _session
+    key = (service_name, region_name, max_pool_connections)
+    if key not in _clients:
+        import botocore.session
+        from botocore.config import Config
+        if _session is None:
+            _session = botocore.session.get_session()
+        config = Config(
+            region_name=region_name,
+            retries={'max_attempts': 10, 'mode': 'standard'},
+            max_pool_connections=max_pool_connections,
+        )
+        _clients[key] = _session.create_client(service_name, config=config)
+    return _clients[key]
@@ -0,0 +1,217 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from clients import client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+MANIFEST_NAME = "_staging_manifest.json"
+CHUNK_SIZE = 64 * 1024 * 1024
+# Checksums S3 can hold for a source object, CRC64NVME is the one it adds to every new object by default
+SOURCE_CHECKSUMS = ("CRC64NVME", "CRC32C", "CRC32", "SHA256", "SHA1")
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+
+
+def list_sources(s3, source):
+    # Yields (source, relative key, size, version tag) for an s3://bucket/prefix or a local directory
+    if source.startswith("s3://"):
+        bucket, _, prefix = source[len("s3://"):].partition("/")
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/"):
+                    continue
+                relative = obj["Key"][len(prefix):].lstrip("/") or os.path.basename(obj["Key"])
+                yield {"Bucket": bucket, "Key": obj["Key"]}, relative, obj["Size"], obj["ETag"]
+    else:
+        for root, _, files in os.walk(source):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                yield path, os.path.relpath(path, source), stat.st_size, f"{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def transfer_config(**kwargs):
+    # s3transfer, which boto3's managed transfers are built on, is imported on first use as the clients are
+    from s3transfer.manager import TransferConfig
+    return TransferConfig(**kwargs)
+
+
+def managed_transfer(s3, config, operation, *args, extra_args):
+    # Multipart transfers with the parts sent in parallel, as boto3's copy and upload_file make them
+    from s3transfer.manager import TransferManager
+    with TransferManager(s3, config) as manager:
+        getattr(manager, operation)(*args, extra_args=extra_args).result()
+
+
+def error_code(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code")
+
+
+def local_checksum(path, size):
+    # Same SHA256 S3 computes: the full object digest, or the digest of the part digests for multipart uploads
+    from s3transfer.utils import ChunksizeAdjuster
+    chunk_size = ChunksizeAdjuster().adjust_chunksize(CHUNK_SIZE, size)
+    digests = []
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digests.append(hashlib.sha256(chunk).digest())
+    if size < CHUNK_SIZE:
+        return base64.b64encode(digests[0] if digests else hashlib.sha256(b"").digest()).decode()
+    return f"{base64.b64encode(hashlib.sha256(b''.join(digests)).digest()).decode()}-{len(digests)}"
+
+
+def source_checksum(s3, source):
+    head = s3.head_object(Bucket=source["Bucket"], Key=source["Key"], ChecksumMode="ENABLED")
+    for algorithm in SOURCE_CHECKSUMS:
+        if head.get(f"Checksum{algorithm}"):
+            return algorithm, head[f"Checksum{algorithm}"]
+    return None, None
+
+
+def copy_config(s3, config, source, algorithm, checksum, size):
+    # Copy layout that makes S3 compute the same checksum as the source's, None when no layout can
+    if checksum.partition("-")[2].isdigit():
+        # Composite checksums are digests of the part digests, the copy reuses the source's part size
+        part_size = s3.head_object(Bucket=source["Bucket"], Key=source["Key"], PartNumber=1)["ContentLength"]
+        return transfer_config(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_request_concurrency=config.max_request_concurrency,
+        )
+    if algorithm == "CRC64NVME":
+        # Always a full object checksum, whatever the part size
+        return config
+    if size <= MAX_COPY_OBJECT_SIZE:
+        # Other full object checksums are only reproduced by a single CopyObject
+        return transfer_config(multipart_threshold=size + 1, max_request_concurrency=config.max_request_concurrency)
+    return None
+
+
+def load_manifest(s3, bucket, prefix):
+    try:
+        body = s3.get_object(Bucket=bucket, Key=f"{prefix}{MANIFEST_NAME}")["Body"].read()
+        return json.loads(body)
+    except Exception as e:
+        if error_code(e) in ("NoSuchKey", "404"):
+            return {}
+        raise
+
+
+def save_manifest(s3, bucket, prefix, manifest):
+    s3.put_object(
+        Bucket=bucket,
+        Key=f"{prefix}{MANIFEST_NAME}",
+        Body=json.dumps(manifest, indent=2, sort_keys=True).encode(),
+        ContentType="application/json",
+    )
+
+
+def transfer(s3, default_config, source, bucket, key, size):
+    # Returns the checksum of the staged object and whether it was checked against the source
+    if isinstance(source, dict):
+        algorithm, expected = source_checksum(s3, source)
+        config = copy_config(s3, default_config, source, algorithm, expected, size) if expected else None
+        if config is None:
+            # Nothing to compare the copy with, it is still staged but reported as unverified
+            algorithm, expected, config = "SHA256", None, default_config
+        # Server-side copy, parts are copied in parallel with UploadPartCopy without going through this host
+        managed_transfer(s3, config, "copy", source, bucket, key, extra_args={"ChecksumAlgorithm": algorithm})
+    else:
+        algorithm = "SHA256"
+        managed_transfer(s3, default_config, "upload", source, bucket, key, extra_args={"ChecksumAlgorithm": algorithm})
+        expected = local_checksum(source, size)
+
+    head = s3.head_object(Bucket=bucket, Key=key, ChecksumMode="ENABLED")
+    if head["ContentLength"] != size:
+        raise ValueError(f"s3://{bucket}/{key} has {head['ContentLength']} bytes, expected {size}")
+    checksum = head.get(f"Checksum{algorithm}")
+    # Composite checksums may or may not carry the -<parts> suffix depending on the API returning them
+    if expected and (checksum or "").split("-")[0] != expected.split("-")[0]:
+        raise ValueError(f"s3://{bucket}/{key} checksum {checksum} does not match {expected} of {source}")
+    return checksum, expected is not None
+
+
+def stage(sources, bucket, prefix, s3=None, max_workers=8, max_concurrency=16):
+    s3 = s3 or client("s3", max_pool_connections=max_workers * max_concurrency)
+    prefix = f"{prefix.rstrip('/')}/" if prefix else ""
+    default_config = transfer_config(
+        multipart_threshold=CHUNK_SIZE,
+        multipart_chunksize=CHUNK_SIZE,
+        max_request_concurrency=max_concurrency,
+    )
+
+    manifest = load_manifest(s3, bucket, prefix)
+    report = {"staged": [], "skipped": [], "failed": [], "unverified": []}
+    try:
+        # Objects are transferred in parallel, and the parts of each object too
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for source in sources:
+                for source_object, relative, size, version in list_sources(s3, source):
+                    key = f"{prefix}{relative}"
+                    entry = manifest.get(key)
+                    if entry and entry["version"] == version and entry["size"] == size:
+                        report["skipped"].append(key)
+                        continue
+                    future = executor.submit(transfer, s3, default_config, source_object, bucket, key, size)
+                    futures[future] = (key, source, size, version)
+
+            for future in as_completed(futures):
+                key, source, size, version = futures[future]
+                try:
+                    checksum, verified = future.result()
+                except Exception as e:
+                    logger.error(f"failed to stage {key}: {e}")
+                    report["failed"].append(key)
+                    continue
+                if not verified:
+                    logger.warning(f"staged {key} unverified, its source has no checksum to compare with")
+                    report["unverified"].append(key)
+                manifest[key] = {
+                    "source": source, "version": version, "size": size, "checksum": checksum, "verified": verified
+                }
+                report["staged"].append(key)
+    finally:
+        # Saved even after a failure so that a rerun only transfers what is missing
+        save_manifest(s3, bucket, prefix, manifest)
+
+    logger.info(
+        f"staged {len(report['staged'])} ({len(report['unverified'])} unverified), skipped {len(report['skipped'])}, "
+        f"failed {len(report['failed'])} objects"
+    )
+    return report
+
+
+def lambda_handler(event, context):
+    report = stage(
+        event["sources"],
+        os.environ["CANVAS_BUCKET"],
+        event.get("prefix", "datasets/"),
+        max_workers=int(os.environ.get("MAX_WORKERS", "8")),
+    )
+    if report["failed"]:
+        raise RuntimeError(f"failed to stage {report['failed']}")
+    return report
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("s3", max_pool_connections=int(os.environ.get("MAX_WORKERS", "8")) * 16)
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description="Stage datasets into the Canvas bucket")
+    parser.add_argument("sources", nargs="+", help="s3://bucket/prefix or local directory")
+    parser.add_argument("--bucket", required=True, help="Canvas bucket")
+    parser.add_argument("--prefix", default="datasets/")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(stage(args.sources, args.bucket, args.prefix, max_workers=args.workers), indent=2))
@@ -0,0 +1,49 @@
+import time
+import cfnresponse
+from clients import client
+
+
+def wait_available(file_system_id, timeout=120):
+    # A file system in the updating state rejects the next update, e.g. when the parameters change again
+    deadline = time.time() + timeout
+    while True:
+        file_system = client('efs').describe_file_systems(FileSystemId=file_system_id)['FileSystems'][0]
+        if file_system['LifeCycleState'] == 'available':
+            return file_system
+        if time.time() > deadline:
+            raise TimeoutError(
+                f"EFS file system {file_system_id} is still {file_system['LifeCycleState']} after {timeout} seconds"
+            )
+        time.sleep(5)
+
+
+def lambda_handler(event, context):
+    response_status = cfnresponse.SUCCESS
+    data = {}
+    reason = None
+    try:
+        file_system_id = event['ResourceProperties']['FileSystemId']
+        throughput_mode = event['ResourceProperties']['ThroughputMode']
+        provisioned_mibps = float(event['ResourceProperties']['ProvisionedThroughputInMibps'])
+
+        # The home volume belongs to the domain, it keeps its throughput mode when the resource is deleted
+        if event['RequestType'] in ('Create', 'Update'):
+            file_system = wait_available(file_system_id)
+            current_mibps = file_system.get('ProvisionedThroughputInMibps')
+            if file_system['ThroughputMode'] != throughput_mode or (
+                throughput_mode == 'provisioned' and current_mibps != provisioned_mibps
+            ):
+                # EFS only allows decreasing the throughput or leaving provisioned once every 24 hours
+                parameters = {'FileSystemId': file_system_id, 'ThroughputMode': throughput_mode}
+                if throughput_mode == 'provisioned':
+                    parameters['ProvisionedThroughputInMibps'] = provisioned_mibps
+                client('efs').update_file_system(**parameters)
+                wait_available(file_system_id)
+            data['ThroughputMode'] = throughput_mode
+    except Exception as e:
+        print(str(e))
+        response_status = cfnresponse.FAILED
+        reason = str(e)
+    cfnresponse.send(
+        event, context, response_status, data, event.get('PhysicalResourceId', context.log_stream_name), reason=reason
+    )
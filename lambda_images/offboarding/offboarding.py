@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from clients import client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Polling starts fast and backs off, apps usually take a minute or two to be deleted
+POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 30
+# The waits share the time left in the invocation, this much of it is kept to return the report
+REPORT_MARGIN = 30
+# Time given to the command line, which has no invocation deadline
+COMMAND_LINE_TIME_BUDGET = 60 * 60
+MAX_POOL_CONNECTIONS = 50
+ARCHIVE_PREFIX = "archive"
+ARCHIVE_STORAGE_CLASS = "GLACIER_IR"
+DELETE_BATCH_SIZE = 1000
+# copy_object copies objects of up to 5 GB, larger ones are copied in parts
+MAX_COPY_SIZE = 5 * 1024 ** 3
+COPY_PART_SIZE = 1024 ** 3
+# Set by Service Catalog on the resources of a provisioned product
+PROVISIONED_PRODUCT_TAG = "aws:servicecatalog:provisionedProductArn"
+
+
+async def call(operation, **kwargs):
+    # Clients block, each call runs in a worker thread so the users and their apps are processed concurrently
+    sagemaker = client("sagemaker", max_pool_connections=MAX_POOL_CONNECTIONS)
+    return await asyncio.to_thread(getattr(sagemaker, operation), **kwargs)
+
+
+async def wait_until(description, check, deadline):
+    loop = asyncio.get_running_loop()
+    interval = POLL_INTERVAL
+    while not await check():
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise TimeoutError(f"timed out waiting for {description}")
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+def not_found(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code") == "ResourceNotFound"
+
+
+async def delete(operation, **kwargs):
+    # A resource deleted since it was listed, or by an earlier invocation, is already gone
+    try:
+        await call(operation, **kwargs)
+    except Exception as e:
+        if not not_found(e):
+            raise
+
+
+async def status(operation, **kwargs):
+    # None once the resource is gone
+    try:
+        return (await call(operation, **kwargs))["Status"]
+    except Exception as e:
+        if not_found(e):
+            return None
+        raise
+
+
+async def list_all(operation, key, **kwargs):
+    def collect():
+        sagemaker = client("sagemaker", max_pool_connections=MAX_POOL_CONNECTIONS)
+        return [item for page in sagemaker.get_paginator(operation).paginate(**kwargs) for item in page[key]]
+    return await asyncio.to_thread(collect)
+
+
+async def delete_app(domain_id, app, deadline):
+    owner = {"SpaceName": app["SpaceName"]} if app.get("SpaceName") else {"UserProfileName": app["UserProfileName"]}
+    app_id = {"DomainId": domain_id, "AppType": app["AppType"], "AppName": app["AppName"], **owner}
+    if app["Status"] != "Deleting":
+        logger.info(f"deleting {app['AppType']} app {app['AppName']} of {owner}")
+        await delete("delete_app", **app_id)
+
+    async def deleted():
+        app_status = await status("describe_app", **app_id)
+        if app_status == "Failed":
+            raise RuntimeError(f"{app['AppType']} app {app['AppName']} failed to delete")
+        return app_status in (None, "Deleted")
+    await wait_until(f"{app['AppType']} app {app['AppName']}", deleted, deadline)
+
+
+async def delete_space(domain_id, space_name, deadline):
+    logger.info(f"deleting space {space_name}")
+    await delete("delete_space", DomainId=domain_id, SpaceName=space_name)
+
+    async def deleted():
+        space_status = await status("describe_space", DomainId=domain_id, SpaceName=space_name)
+        if space_status == "Delete_Failed":
+            raise RuntimeError(f"space {space_name} failed to delete")
+        return space_status is None
+    await wait_until(f"space {space_name}", deleted, deadline)
+
+
+async def delete_user_profile(domain_id, user_profile_name, deadline):
+    logger.info(f"deleting user profile {user_profile_name}")
+    await delete("delete_user_profile", DomainId=domain_id, UserProfileName=user_profile_name)
+
+    async def deleted():
+        profile_status = await status("describe_user_profile", DomainId=domain_id, UserProfileName=user_profile_name)
+        if profile_status == "Delete_Failed":
+            raise RuntimeError(f"user profile {user_profile_name} failed to delete")
+        return profile_status is None
+    await wait_until(f"user profile {user_profile_name}", deleted, deadline)
+
+
+async def provisioned_product(domain_id, user_profile_name):
+    # Id of the provisioned product the user profile was created by, if any
+    try:
+        profile = await call("describe_user_profile", DomainId=domain_id, UserProfileName=user_profile_name)
+    except Exception as e:
+        if not_found(e):
+            return None
+        raise
+    tags = await call("list_tags", ResourceArn=profile["UserProfileArn"])
+    for tag in tags.get("Tags", []):
+        if tag["Key"] == PROVISIONED_PRODUCT_TAG:
+            return tag["Value"].split("/")[-1]
+    return None
+
+
+def workspace_prefixes(user_profile_name):
+    # Default Canvas layout and the per-user workspace of the Canvas User product
+    workspace_hash = hashlib.sha256(user_profile_name.lower().encode()).hexdigest()[:4]
+    return [f"Canvas/{user_profile_name}/", f"{workspace_hash}/{user_profile_name}/"]
+
+
+def archive_object(s3, bucket, obj, destination):
+    source = {"Bucket": bucket, "Key": obj["Key"]}
+    target = {"Bucket": bucket, "Key": f"{destination}{obj['Key']}"}
+    if obj["Size"] <= MAX_COPY_SIZE:
+        s3.copy_object(CopySource=source, StorageClass=ARCHIVE_STORAGE_CLASS, **target)
+        return
+    upload_id = s3.create_multipart_upload(StorageClass=ARCHIVE_STORAGE_CLASS, **target)["UploadId"]
+    try:
+        parts = []
+        for number, start in enumerate(range(0, obj["Size"], COPY_PART_SIZE), start=1):
+            end = min(start + COPY_PART_SIZE, obj["Size"]) - 1
+            part = s3.upload_part_copy(
+                CopySource=source, CopySourceRange=f"bytes={start}-{end}", UploadId=upload_id, PartNumber=number, **target
+            )
+            parts.append({"PartNumber": number, "ETag": part["CopyPartResult"]["ETag"]})
+        s3.complete_multipart_upload(UploadId=upload_id, MultipartUpload={"Parts": parts}, **target)
+    except Exception:
+        s3.abort_multipart_upload(UploadId=upload_id, **target)
+        raise
+
+
+def archive_prefixes(bucket, user_profile_name, max_workers=16):
+    # Moves the user's artifacts under archive/<user>/<date>/ in a cheaper storage class
+    s3 = client("s3", max_pool_connections=max_workers)
+    destination = f"{ARCHIVE_PREFIX}/{user_profile_name}/{datetime.date.today().isoformat()}/"
+    archived = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for prefix in workspace_prefixes(user_profile_name):
+            # Each page of keys is copied across the workers, then removed with a single delete_objects call
+            for page in s3.get_paginator("list_objects_v2").paginate(
+                Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": DELETE_BATCH_SIZE}
+            ):
+                objects = page.get("Contents", [])
+                if not objects:
+                    continue
+                list(executor.map(lambda obj: archive_object(s3, bucket, obj, destination), objects))
+                response = s3.delete_objects(
+                    Bucket=bucket, Delete={"Objects": [{"Key": obj["Key"]} for obj in objects], "Quiet": True}
+                )
+                if response.get("Errors"):
+                    raise RuntimeError(f"failed to delete {len(response['Errors'])} archived objects under {prefix}")
+                archived += len(objects)
+    return archived
+
+
+async def offboard_user(domain_id, user_profile_name, deadline, archive_bucket=None):
+    result = {"domain_id": domain_id, "user": user_profile_name, "apps": 0, "spaces": 0, "archived": 0}
+    try:
+        if asyncio.get_running_loop().time() >= deadline:
+            raise TimeoutError("not started before the deadline")
+        spaces = [
+            space["SpaceName"]
+            for space in await list_all("list_spaces", "Spaces", DomainIdEquals=domain_id)
+            if space.get("OwnershipSettingsSummary", {}).get("OwnerUserProfileName") == user_profile_name
+        ]
+
+        # Apps of the user and of its private spaces, Canvas included, are deleted concurrently
+        apps = await list_all("list_apps", "Apps", DomainIdEquals=domain_id, UserProfileNameEquals=user_profile_name)
+        for space_name in spaces:
+            apps += await list_all("list_apps", "Apps", DomainIdEquals=domain_id, SpaceNameEquals=space_name)
+        apps = list({
+            (app["AppType"], app["AppName"], app.get("SpaceName")): app
+            for app in apps if app["Status"] not in ("Deleted", "Failed")
+        }.values())
+        await asyncio.gather(*(delete_app(domain_id, app, deadline) for app in apps))
+        result["apps"] = len(apps)
+
+        await asyncio.gather(*(delete_space(domain_id, space_name, deadline) for space_name in spaces))
+        result["spaces"] = len(spaces)
+
+        if archive_bucket:
+            result["archived"] = await asyncio.to_thread(archive_prefixes, archive_bucket, user_profile_name)
+
+        # Deleting a profile created by a Canvas User product would leave the provisioned product behind,
+        # terminating the provisioned product deletes the profile instead
+        product_id = await provisioned_product(domain_id, user_profile_name)
+        if product_id:
+            result["provisioned_product"] = product_id
+            result["status"] = "terminate-product"
+        else:
+            await delete_user_profile(domain_id, user_profile_name, deadline)
+            result["status"] = "offboarded"
+    except TimeoutError as e:
+        # Left for a later invocation, which picks up the deletions already in progress
+        logger.warning(f"unfinished offboarding of {user_profile_name}: {e}")
+        result["status"] = "unfinished"
+        result["error"] = str(e)
+    except Exception as e:
+        logger.error(f"failed to offboard {user_profile_name}: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+    return result
+
+
+async def offboard(users, domain_id, archive_bucket=None, max_parallel_users=4, time_budget=COMMAND_LINE_TIME_BUDGET):
+    # users are user profile names of the domain, or <domain id>/<user profile name>
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_budget
+    semaphore = asyncio.Semaphore(max_parallel_users)
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_parallel_users * 8))
+
+    async def bounded(user):
+        user_domain_id, _, user_profile_name = user.rpartition("/")
+        async with semaphore:
+            return await offboard_user(user_domain_id or domain_id, user_profile_name, deadline, archive_bucket)
+
+    return await asyncio.gather(*(bounded(user) for user in users))
+
+
+def lambda_handler(event, context):
+    report = asyncio.run(offboard(
+        event["users"],
+        os.environ["DOMAIN_ID"],
+        archive_bucket=os.environ["CANVAS_BUCKET"] if event.get("archive", False) else None,
+        max_parallel_users=int(os.environ.get("MAX_PARALLEL_USERS", "4")),
+        time_budget=context.get_remaining_time_in_millis() / 1000 - REPORT_MARGIN,
+    ))
+    logger.info(json.dumps(report))
+    unfinished = [result["user"] for result in report if result["status"] == "unfinished"]
+    if unfinished:
+        logger.warning(f"invoke again with {unfinished} to finish their offboarding")
+    if any(result["status"] == "failed" for result in report):
+        raise RuntimeError(f"failed to offboard {[result['user'] for result in report if result['status'] == 'failed']}")
+    return report
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("sagemaker", max_pool_connections=MAX_POOL_CONNECTIONS)
+    client("s3", max_pool_connections=16)
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description="Delete the apps, spaces and user profiles of offboarded Canvas users")
+    parser.add_argument("users", nargs="+", help="User profile names, or <domain id>/<user profile name>")
+    parser.add_argument("--domain-id", help="Domain of the users given without one")
+    parser.add_argument("--archive-bucket", help="Canvas bucket, archives the users' artifacts when given")
+    parser.add_argument("--parallel-users", type=int, default=4)
+    parser.add_argument("--time-budget", type=int, default=COMMAND_LINE_TIME_BUDGET,
+                        help="Seconds after which the users left are reported as unfinished")
+    args = parser.parse_args()
+    print(json.dumps(
+        asyncio.run(offboard(args.users, args.domain_id, args.archive_bucket, args.parallel_users, args.time_budget)),
+        indent=2,
+    ))
@@ -0,0 +1,24 @@
+import cfnresponse
+from clients import client
+
+TIMEZONE_TAG = 'canvas:timezone'
+# User profile ARNs are lower case, the scheduled shutdown reads the name as created from this tag
+NAME_TAG = 'canvas:user-profile-name'
+
+
+def lambda_handler(event, context):
+    response_status = cfnresponse.SUCCESS
+    try:
+        # Tagged through the API, a tag change on the user profile resource would replace the profile
+        if event['RequestType'] in ('Create', 'Update'):
+            client('sagemaker').add_tags(
+                ResourceArn=event['ResourceProperties']['UserProfileArn'],
+                Tags=[
+                    {'Key': TIMEZONE_TAG, 'Value': event['ResourceProperties']['Timezone']},
+                    {'Key': NAME_TAG, 'Value': event['ResourceProperties']['UserProfileName']},
+                ],
+            )
+    except Exception as e:
+        print(str(e))
+        response_status = cfnresponse.FAILED
+    cfnresponse.send(event, context, response_status, {}, event.get('PhysicalResourceId', context.log_stream_name))
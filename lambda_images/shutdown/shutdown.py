@@ -1,13 +1,89 @@
-import boto3
+import datetime
+import functools
 import logging
-from botocore.config import Config
+import os
+from zoneinfo import ZoneInfo, available_timezones
+from clients import client
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-config = Config(retries={"max_attempts": 10, "mode": "standard"})
-sagemaker = boto3.client("sagemaker", config=config)
-paginator = sagemaker.get_paginator("list_apps")
+TIMEZONE_TAG = "canvas:timezone"
+# Set with the timezone tag, user profile ARNs are lower case
+NAME_TAG = "canvas:user-profile-name"
+# GetResources accepts at most 20 values per tag filter
+MAX_TAG_VALUES = 20
+
+
+@functools.lru_cache(maxsize=None)
+def zone(timezone):
+    # None for a tag value that is not a timezone of the runtime's tz database
+    try:
+        return ZoneInfo(timezone)
+    except Exception:
+        return None
+
+
+def known_timezones():
+    return available_timezones() | {"UTC"}
+
+
+def due_timezones(timezones, now, end_of_day_hour):
+    # The sweep runs hourly, so a timezone is due when its local end of day passed within the last hour
+    return sorted(timezone for timezone in timezones if now.astimezone(zone(timezone)).hour == end_of_day_hour)
+
+
+def tagged_profiles(timezones=None):
+    # The timezone tags are the schedule index: GetResources only returns the user profiles tagged with a due timezone,
+    # or every tagged user profile when no timezone is given
+    values = sorted(timezones) if timezones is not None else [None]
+    profiles = {}
+    for start in range(0, len(values), MAX_TAG_VALUES):
+        tag_filter = {"Key": TIMEZONE_TAG}
+        if values[start] is not None:
+            tag_filter["Values"] = values[start:start + MAX_TAG_VALUES]
+        for page in client("resourcegroupstaggingapi").get_paginator("get_resources").paginate(
+            ResourceTypeFilters=["sagemaker:user-profile"],
+            TagFilters=[tag_filter],
+        ):
+            for resource in page["ResourceTagMappingList"]:
+                tags = {tag["Key"]: tag["Value"] for tag in resource["Tags"]}
+                domain_id, user_profile_name = resource["ResourceARN"].split("/")[-2:]
+                profiles[(domain_id, tags.get(NAME_TAG, user_profile_name))] = tags[TIMEZONE_TAG]
+    return profiles
+
+
+def profile_apps(domain_id, user_profile_name):
+    apps = []
+    for page in client("sagemaker").get_paginator("list_apps").paginate(
+        DomainIdEquals=domain_id, UserProfileNameEquals=user_profile_name
+    ):
+        apps.extend(app for app in page["Apps"] if app["AppType"] == "Canvas" and app["Status"] != "Deleted")
+    return apps
+
+
+def running_apps():
+    apps = {}
+    for page in client("sagemaker").get_paginator("list_apps").paginate(PaginationConfig={"PageSize": 100}):
+        for app in page["Apps"]:
+            if app["AppType"] == "Canvas" and app["Status"] != "Deleted":
+                key = f"{app['DomainId']}/{app['UserProfileName']}".lower()
+                apps.setdefault(key, []).append(app)
+    return apps
+
+
+def unscheduled_apps(apps, profiles):
+    # Apps of the user profiles without a timezone tag, or whose tag is not a timezone of the runtime's tz database
+    timezones = {f"{domain_id}/{user_profile_name}".lower(): timezone for (domain_id, user_profile_name), timezone in profiles.items()}
+    unscheduled = []
+    for key, profile_apps in apps.items():
+        timezone = timezones.get(key)
+        if timezone is not None and zone(timezone) is not None:
+            continue
+        if timezone is not None:
+            logger.warning(f"unknown timezone {timezone} for {key}, using the default timezone")
+        unscheduled.extend(profile_apps)
+    return unscheduled
 
 
 def delete_app(domain_id, user_profile_name, app_type, app_name):
@@ -15,7 +91,7 @@ def delete_app(domain_id, user_profile_name, app_type, app_name):
         f"deleting {app_type}: {app_name} for user: {user_profile_name} in Domain: {domain_id}"
     )
 
-    sagemaker.delete_app(
+    client("sagemaker").delete_app(
         DomainId=domain_id,
         UserProfileName=user_profile_name,
         AppType=app_type,
@@ -25,19 +101,34 @@ def delete_app(domain_id, user_profile_name, app_type, app_name):
 
 def lambda_handler(event, context):
     try:
-        app_page_iterator = paginator.paginate(PaginationConfig={"PageSize": 50})
-
-        for app_page in app_page_iterator:
-            for app in app_page["Apps"]:
-                if app["AppType"] == "Canvas" and app["Status"] != "Deleted":
-                    delete_app(
-                        app["DomainId"],
-                        app["UserProfileName"],
-                        app["AppType"],
-                        app["AppName"],
-                    )
+        default_timezone = os.environ.get("DEFAULT_TIMEZONE", "UTC")
+        if zone(default_timezone) is None:
+            logger.warning(f"unknown default timezone {default_timezone}, using UTC")
+            default_timezone = "UTC"
+        now = datetime.datetime.now(datetime.timezone.utc)
+        timezones = due_timezones(known_timezones(), now, int(os.environ.get("END_OF_DAY_HOUR", "19")))
+        logger.info(f"timezones at end of day: {timezones}")
+
+        # Only the user profiles at their end of day are read, each hour touches a small slice of the users
+        apps = [app for key in tagged_profiles(timezones) for app in profile_apps(*key)]
+        if default_timezone in timezones:
+            # Once a day, the default timezone also sweeps the profiles the index has no valid timezone for
+            apps.extend(unscheduled_apps(running_apps(), tagged_profiles()))
+
+        for app in apps:
+            delete_app(
+                app["DomainId"],
+                app["UserProfileName"],
+                app["AppType"],
+                app["AppName"],
+            )
 
     except Exception as e:
         logger.error(e)
 
     logger.info("Canvas apps deleted")
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("sagemaker")
+    client("resourcegroupstaggingapi")
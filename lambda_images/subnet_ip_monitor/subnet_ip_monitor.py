@@ -0,0 +1,29 @@
+import logging
+import os
+from clients import client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def lambda_handler(event, context):
+    subnet_ids = os.environ["SUBNET_IDS"].split(",")
+    subnets = client("ec2").describe_subnets(SubnetIds=subnet_ids)["Subnets"]
+
+    metric_data = []
+    for subnet in subnets:
+        logger.info(
+            f"subnet {subnet['SubnetId']} in {subnet['AvailabilityZone']} has {subnet['AvailableIpAddressCount']} free IPs"
+        )
+        metric_data.append({
+            "MetricName": "AvailableIpAddressCount",
+            "Dimensions": [{"Name": "SubnetId", "Value": subnet["SubnetId"]}],
+            "Value": subnet["AvailableIpAddressCount"],
+            "Unit": "Count",
+        })
+
+    client("cloudwatch").put_metric_data(Namespace=os.environ["METRIC_NAMESPACE"], MetricData=metric_data)
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+    client("ec2")
+    client("cloudwatch")
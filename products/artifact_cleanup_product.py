@@ -0,0 +1,125 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_servicecatalog as sc,
+    CfnOutput,
+    CfnParameter,
+    Duration,
+)
+from studio_constructs.lambda_profile import inline_source, invocation_target, runtime_profile
+from studio_constructs.naming import domain_name
+
+
+class ArtifactCleanupProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.dry_run_param = CfnParameter(
+            self,
+            "DryRun",
+            type="String",
+            description="Only report the orphaned Canvas artifacts in the logs, without deleting them.",
+            allowed_values=["true", "false"],
+            default="true",
+        )
+
+        self.max_workers_param = CfnParameter(
+            self,
+            "MaxWorkers",
+            type="Number",
+            description="Number of delete_objects calls of 1000 keys running in parallel.",
+            default=8,
+        )
+
+        self.schedule_param = CfnParameter(
+            self,
+            "ScheduleExpression",
+            type="String",
+            description="Schedule of the cleanup, the bucket inventory is delivered daily.",
+            default="cron(0 6 * * ? *)",
+        )
+
+        # ==================================================
+        # ============ GET CANVAS BUCKET FROM SSM ==========
+        # ==================================================
+        self.domain_name = domain_name(self)
+        self.canvas_bucket = self.domain_name.value("canvas_bucket")
+
+        # ==================================================
+        # ================= IAM ROLE =======================
+        # ==================================================
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "ArtifactCleanupPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["sagemaker:ListUserProfiles"],
+                        resources=["*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:ListBucket"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:GetObject"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}/inventory/*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:DeleteObject"],
+                        resources=[
+                            f"arn:aws:s3:::{self.canvas_bucket}/Canvas/*",
+                            f"arn:aws:s3:::{self.canvas_bucket}/????/*",
+                        ],
+                    ),
+                    # The inventory reports are encrypted with the domain KMS key
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["kms:Decrypt"],
+                        resources=["*"],
+                        conditions={"StringLike": {"kms:ViaService": "s3.*.amazonaws.com"}},
+                    ),
+                ])
+            },
+        )
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        self.cleanup_lambda = lambda_.Function(
+            self,
+            "ArtifactCleanupLambda",
+            description="Deletes the Canvas artifacts of deleted user profiles, from the S3 inventory of the Canvas bucket",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/artifact_cleanup/artifact_cleanup.py')),
+            handler="index.lambda_handler",
+            **runtime_profile(1024),
+            timeout=Duration.minutes(15),
+            role=self.role,
+            environment={
+                "CANVAS_BUCKET": self.canvas_bucket,
+                "DRY_RUN": self.dry_run_param.value_as_string,
+                "MAX_WORKERS": self.max_workers_param.value_as_string,
+            },
+        )
+
+        events.Rule(self, "ArtifactCleanupRule",
+            description="Deletes the Canvas artifacts of deleted user profiles",
+            schedule=events.Schedule.expression(self.schedule_param.value_as_string),
+            targets=[targets.LambdaFunction(invocation_target(self.cleanup_lambda))],
+        )
+
+        CfnOutput(self, "ArtifactCleanupFunction", value=self.cleanup_lambda.function_name)
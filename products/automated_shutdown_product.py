@@ -5,15 +5,25 @@ from aws_cdk import (
     aws_events as events,
     aws_events_targets as targets,
     aws_cloudwatch as cloudwatch,
-    aws_ssm as ssm,
     aws_servicecatalog as sc,
 )
 from constructs import Construct
+from studio_constructs.lambda_profile import runtime_profile, invocation_target, inline_source
+from studio_constructs.naming import domain_name
+
+# Published by the shutdown Lambda, the idle time of the apps each shard left running
+METRIC_NAMESPACE = "Canvas/AutoShutdown"
+# EventBridge rules accept at most 5 targets
+MAX_RULE_TARGETS = 5
+
 
 class AutoShutdownProduct(sc.ProductStack):
-    def __init__(self, scope: Construct, id: str, **kwargs):
+    def __init__(self, scope: Construct, id: str, shard_count: int = 1, **kwargs):
         super().__init__(scope, id, **kwargs)
 
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+
         region = Stack.of(self).region
         account = Stack.of(self).account
 
@@ -32,22 +42,43 @@ class AutoShutdownProduct(sc.ProductStack):
             default=1200
         )
 
+        self.evaluation_interval = CfnParameter(self, "EvaluationInterval",
+            type="Number",
+            description="Time (in minutes) between two evaluations of the Canvas apps of each shard of user profiles. Default value is 20 minutes.",
+            default=20,
+            min_value=2,
+        )
+
         self.user_tag_param = CfnParameter(
             self,
             "UserCostCenter",
             type="String",
         )
 
+        self.endpoint_idle_timeout = CfnParameter(self, "EndpointIdleTimeout",
+            type="Number",
+            description="Time (in seconds) that a real-time endpoint deployed from SageMaker Canvas is allowed to receive no invocations before it gets shut down. Must be a multiple of 60, at most 14 days. Default value is 24 hours.",
+            default=86400,
+            min_value=3600,
+            max_value=14 * 24 * 3600,
+        )
+
+        self.endpoint_idle_action = CfnParameter(self, "EndpointIdleAction",
+            type="String",
+            description="Action taken on idle Canvas endpoints. Delete removes the endpoint and keeps its endpoint config, ScaleDown reduces every variant to a single instance.",
+            allowed_values=["Delete", "ScaleDown"],
+            default="Delete",
+        )
+
         # ==================================================
         # ========== GET DOMAIN ID AND ROLE FROM SSM =======
         # ==================================================
-        self.domain_id = ssm.StringParameter.value_for_string_parameter(
-            self, parameter_name="/studio/domain_id"
-        )
+        self.domain_name = domain_name(self)
+        self.domain_id = self.domain_name.value("domain_id")
 
-        self.user_role = ssm.StringParameter.value_for_string_parameter(
-            self, parameter_name="/studio/user_role"
-        )
+        self.user_role = self.domain_name.value("user_role")
+
+        self.domain_arn = f"arn:aws:sagemaker:{region}:{account}:domain/{self.domain_id}"
 
         # ==================================================
         # ================= RESOURCES ======================
@@ -65,6 +96,11 @@ class AutoShutdownProduct(sc.ProductStack):
                             "logs:CreateLogStream",
                             "logs:PutLogEvents",
                             "cloudwatch:GetMetricData",
+                            "sagemaker:ListApps",
+                            "sagemaker:ListAutoMLJobs",
+                            "sagemaker:ListTrainingJobs",
+                            "sagemaker:ListProcessingJobs",
+                            "tag:GetResources",
                         ],
                         resources=["*"]
                     ),
@@ -77,118 +113,151 @@ class AutoShutdownProduct(sc.ProductStack):
                         resources=[
                             f"arn:aws:sagemaker:{region}:{account}:app/{self.domain_id}/*/canvas/default"
                         ]
-                    )
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["cloudwatch:PutMetricData"],
+                        resources=["*"],
+                        conditions={"StringEquals": {"cloudwatch:namespace": METRIC_NAMESPACE}},
+                    ),
                 ])
             }
         )
 
         # Lambda Function
         self.delete_canvas_app_function = _lambda.Function(self, "DeleteCanvasAppFunction",
-            function_name="DeleteCanvasApp",
+            function_name=f"DeleteCanvasApp{self.domain_name.suffix}",
             handler="index.lambda_handler",
-            runtime=_lambda.Runtime.PYTHON_3_12,
-            timeout=Duration.seconds(30),
-            memory_size=128,
-            reserved_concurrent_executions=1,
+            **runtime_profile(),
+            timeout=Duration.minutes(5),
+            reserved_concurrent_executions=shard_count,
             role=self.lambda_execution_role,
-            code=_lambda.Code.from_inline(
-                """
-import boto3
-from botocore.config import Config
-import os
-import datetime
-
-def lambda_handler(event, context):
-    region = event['region']
-    
-    try:
-        config = Config(region_name=region)
-        cloudwatch = boto3.client('cloudwatch', config=config)
-        sagemaker = boto3.client('sagemaker', config=config)
-        # Check which user is in timeout
-        metric_data_results = cloudwatch.get_metric_data(
-            MetricDataQueries=[
-                {
-                    "Id": "q1",
-                    "Expression": f'SELECT AVG(TimeSinceLastActive) FROM "/aws/sagemaker/Canvas/AppActivity" WHERE DomainId=\'{os.environ['DOMAIN_ID']}\' GROUP BY DomainId, UserProfileName',
-                    "Period": int(os.environ['ALARM_PERIOD'])
-                }
-            ],
-            StartTime=datetime.datetime(2023, 10, 20),
-            EndTime=datetime.datetime.now(),
-            ScanBy='TimestampAscending'
-        )
-        for metric in metric_data_results['MetricDataResults']:
-            domain_id, user_profile_name = metric['Label'].split(' ')
-            latest_value = metric['Values'][-1]
-            if latest_value >= int(os.environ['TIMEOUT_THRESHOLD']):
-                status = sagemaker.describe_app(
-                    DomainId=domain_id,
-                    UserProfileName=user_profile_name,
-                    AppType='Canvas',
-                    AppName='default'
-                )['Status'] # Possible options: 'Deleted'|'Deleting'|'Failed'|'InService'|'Pending'
-                if status == 'InService':
-                    print(f"Canvas App for {user_profile_name} in domain {domain_id} will be deleted.")
-                    response = sagemaker.delete_app(
-                        DomainId=domain_id,
-                        UserProfileName=user_profile_name,
-                        AppType='Canvas',
-                        AppName='default'
-                    )
-                else:
-                    print(f"Canvas App for {user_profile_name} in domain {domain_id} is in {status} status. Will not delete for now.")
-                    continue
-    except Exception as e:
-        print(str(e))
-        raise e
-                """
-            ),
+            code=_lambda.Code.from_inline(inline_source('lambda_images/auto_shutdown/auto_shutdown.py')),
             environment={
                 "TIMEOUT_THRESHOLD": self.idle_timeout.value_as_string,
                 "ALARM_PERIOD": self.alarm_period.value_as_string,
-                "DOMAIN_ID": self.domain_id
+                "DOMAIN_ID": self.domain_id,
+                "SHARD_COUNT": str(shard_count),
+                "METRIC_NAMESPACE": METRIC_NAMESPACE,
             }
         )
+        delete_canvas_app_target = invocation_target(self.delete_canvas_app_function)
 
-        # CloudWatch Alarm
-        self.time_since_last_active_alarm = cloudwatch.CfnAlarm(
-            self, "TimeSinceLastActiveAlarm",
-            alarm_name="TimeSinceLastActiveAlarm",
-            alarm_description="Alarm when TimeSinceLastActive exceeds 2 hours",
+
+        # Idle Canvas endpoints, checked on a schedule since they don't publish TimeSinceLastActive
+        self.endpoint_execution_role = iam.Role(self, "EndpointLambdaExecutionRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            inline_policies={
+                "LambdaPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "logs:CreateLogGroup",
+                            "logs:CreateLogStream",
+                            "logs:PutLogEvents",
+                            "cloudwatch:GetMetricData",
+                            "cloudwatch:ListMetrics",
+                            "sagemaker:ListEndpoints",
+                            "tag:GetResources",
+                        ],
+                        resources=["*"]
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "sagemaker:DescribeEndpoint",
+                            "sagemaker:DeleteEndpoint",
+                            "sagemaker:UpdateEndpointWeightsAndCapacities",
+                        ],
+                        resources=[f"arn:aws:sagemaker:{region}:{account}:endpoint/*"],
+                        conditions={
+                            "StringEquals": {
+                                "aws:ResourceTag/sagemaker:domain-arn": self.domain_arn
+                            }
+                        }
+                    )
+                ])
+            }
+        )
+
+        self.idle_endpoints_function = _lambda.Function(self, "DeleteIdleCanvasEndpointsFunction",
+            function_name=f"DeleteIdleCanvasEndpoints{self.domain_name.suffix}",
+            handler="index.lambda_handler",
+            **runtime_profile(),
+            timeout=Duration.minutes(5),
+            reserved_concurrent_executions=1,
+            role=self.endpoint_execution_role,
+            code=_lambda.Code.from_inline(inline_source('lambda_images/auto_shutdown/idle_endpoints.py')),
+            environment={
+                "ENDPOINT_IDLE_TIMEOUT": self.endpoint_idle_timeout.value_as_string,
+                "ENDPOINT_IDLE_ACTION": self.endpoint_idle_action.value_as_string,
+                "DOMAIN_ARN": self.domain_arn
+            }
+        )
+
+        self.idle_endpoints_rule = events.Rule(self, "IdleCanvasEndpointsRule",
+            rule_name=f"CanvasIdleEndpointsRule{self.domain_name.suffix}",
+            description="Rule that looks for idle Canvas endpoints every hour",
+            schedule=events.Schedule.rate(Duration.hours(1)),
+            targets=[targets.LambdaFunction(
+                invocation_target(self.idle_endpoints_function),
+                event=events.RuleTargetInput.from_object({"region": events.EventField.region}),
+            )],
+        )
+
+        # Users are assigned to shards by a hash of their profile name, each run of the Lambda evaluates one shard
+        # and publishes the idle time of the apps it left running, e.g. deferred for in-flight jobs
+        for rule_index, start in enumerate(range(0, shard_count, MAX_RULE_TARGETS)):
+            events.Rule(self, f"CanvasAutoShutdownRule{rule_index}",
+                rule_name=f"CanvasAutoShutdownRule{rule_index}{self.domain_name.suffix}",
+                description="Rule that evaluates the Canvas apps of each shard of user profiles",
+                schedule=events.Schedule.expression(f"rate({self.evaluation_interval.value_as_string} minutes)"),
+                targets=[
+                    targets.LambdaFunction(
+                        delete_canvas_app_target,
+                        event=events.RuleTargetInput.from_object({
+                            "region": events.EventField.region,
+                            "shard": index,
+                        }),
+                    )
+                    for index in range(start, min(start + MAX_RULE_TARGETS, shard_count))
+                ],
+            )
+
+        # CloudWatch Alarms, one per shard of user profiles
+        if shard_count == 1:
+            self.time_since_last_active_alarm = self._shard_alarm("TimeSinceLastActiveAlarm", f"TimeSinceLastActiveAlarm{self.domain_name.suffix}", 0)
+        else:
+            shard_alarms = [
+                self._shard_alarm(f"TimeSinceLastActiveAlarmShard{index}", f"TimeSinceLastActiveAlarm-shard-{index}{self.domain_name.suffix}", index)
+                for index in range(shard_count)
+            ]
+            # Composite Alarm giving a single domain-wide view over all the shards
+            self.time_since_last_active_alarm = cloudwatch.CfnCompositeAlarm(
+                self, "TimeSinceLastActiveAlarm",
+                alarm_name=f"TimeSinceLastActiveAlarm{self.domain_name.suffix}",
+                alarm_description="Alarm when a Canvas app stays idle past the idle timeout in any user profile shard",
+                alarm_rule=" OR ".join(f'ALARM("{alarm.alarm_name}")' for alarm in shard_alarms),
+            )
+            for alarm in shard_alarms:
+                self.time_since_last_active_alarm.add_dependency(alarm)
+
+    def _shard_alarm(self, id: str, alarm_name: str, shard: int) -> cloudwatch.CfnAlarm:
+        return cloudwatch.CfnAlarm(
+            self, id,
+            alarm_name=alarm_name,
+            alarm_description="Alarm when a Canvas app of this shard stays idle past the idle timeout, e.g. while its shutdown is deferred",
+            namespace=METRIC_NAMESPACE,
+            metric_name="MaxTimeSinceLastActive",
+            dimensions=[
+                cloudwatch.CfnAlarm.DimensionProperty(name="DomainId", value=self.domain_id),
+                cloudwatch.CfnAlarm.DimensionProperty(name="Shard", value=str(shard)),
+            ],
+            statistic="Maximum",
+            period=self.alarm_period.value_as_number,
             evaluation_periods=1,
             threshold=self.idle_timeout.value_as_number,
             comparison_operator="GreaterThanOrEqualToThreshold",
             treat_missing_data="notBreaching",
-            metrics=[
-                cloudwatch.CfnAlarm.MetricDataQueryProperty(
-                    id="q1",
-                    label="Find the highest timeout across all of the user profiles in this domain",
-                    expression=f'SELECT MAX(TimeSinceLastActive) FROM "/aws/sagemaker/Canvas/AppActivity" WHERE DomainId=\'{self.domain_id}\'',
-                    period=self.alarm_period.value_as_number
-                )
-            ],
             tags=[CfnTag(key="cost-center", value=self.user_tag_param.value_as_string)],
         )
-
-        # EventBridge Rule
-        self.event_bridge_rule = events.Rule(self, "EventBridgeToLambdaRule",
-            rule_name="CanvasAutoShutdownRule",
-            description="Rule that executes a Lambda function whenever the Alarm is triggered",
-            event_bus=events.EventBus.from_event_bus_name(self, "DefaultEventBus", "default"),
-            event_pattern=events.EventPattern(
-                source=["aws.cloudwatch"],
-                detail_type=["CloudWatch Alarm State Change"],
-                resources=[self.time_since_last_active_alarm.attr_arn]
-            ),
-            targets=[targets.LambdaFunction(self.delete_canvas_app_function)],
-        )
-
-        # Lambda Permission
-        self.lambda_permission = _lambda.CfnPermission(self, "EventBridgeLambdaPermission",
-            action="lambda:InvokeFunction",
-            function_name=self.delete_canvas_app_function.function_arn,
-            principal="events.amazonaws.com",
-            source_arn=self.event_bridge_rule.rule_arn
-            # Fn.get_att("EventBridgeToLambdaRule", "Arn").to_string()
-        )
\ No newline at end of file
@@ -0,0 +1,217 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_cloudwatch as cloudwatch,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_sagemaker as sagemaker,
+    aws_servicecatalog as sc,
+    CfnOutput,
+    CfnParameter,
+    CfnTag,
+    Duration,
+    Stack,
+)
+from studio_constructs.lambda_profile import runtime_profile, invocation_target, inline_source
+from studio_constructs.naming import domain_name
+
+METRIC_NAMESPACE = "Canvas/AppLatency"
+PROBE_USER_PROFILE = "canvas-latency-probe"
+# A start still pending after it is published as a TimeToInService sample of this length, so the alarm threshold stays under it
+START_TIMEOUT = 12 * 60
+
+
+class CanvasCanaryProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        region = Stack.of(self).region
+        account = Stack.of(self).account
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.schedule_param = CfnParameter(
+            self,
+            "ScheduleExpression",
+            type="String",
+            description="Schedule of the canary, every run starts a Canvas app for a few minutes, which is billed as a Canvas session.",
+            default="rate(6 hours)",
+        )
+
+        self.alarm_threshold_param = CfnParameter(
+            self,
+            "StartLatencyAlarmSeconds",
+            type="Number",
+            description="p90 over a day of the time the Canvas app of the probe takes to be InService, above which the alarm fires.",
+            default=600,
+            min_value=60,
+            max_value=START_TIMEOUT,
+        )
+
+        # ==================================================
+        # ========== GET DOMAIN ID AND ROLE FROM SSM =======
+        # ==================================================
+        self.domain_name = domain_name(self)
+        self.domain_id = self.domain_name.value("domain_id")
+
+        self.user_role = self.domain_name.value("user_role")
+
+        # ==================================================
+        # ================= PROBE USER =====================
+        # ==================================================
+        # Dedicated to the canary, so that no user's Canvas session is ever started or deleted
+        self.probe_profile = sagemaker.CfnUserProfile(
+            self,
+            "ProbeUserProfile",
+            domain_id=self.domain_id,
+            user_profile_name=PROBE_USER_PROFILE,
+            user_settings=sagemaker.CfnUserProfile.UserSettingsProperty(
+                execution_role=self.user_role,
+            ),
+            tags=[CfnTag(key="canvas:probe", value="start-latency")],
+        )
+
+        # ==================================================
+        # ================= IAM ROLE =======================
+        # ==================================================
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "CanvasCanaryPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["sagemaker:CreateApp", "sagemaker:DeleteApp", "sagemaker:DescribeApp"],
+                        resources=[f"arn:aws:sagemaker:{region}:{account}:app/*/{PROBE_USER_PROFILE}/canvas/*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["sagemaker:DescribeDomain"],
+                        resources=[f"arn:aws:sagemaker:{region}:{account}:domain/*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["ec2:DescribeNetworkInterfaces"],
+                        resources=["*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["cloudwatch:PutMetricData"],
+                        resources=["*"],
+                        conditions={"StringEquals": {"cloudwatch:namespace": METRIC_NAMESPACE}},
+                    ),
+                ])
+            },
+        )
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        self.canary_lambda = lambda_.Function(
+            self,
+            "CanvasCanaryLambda",
+            description="Times the start and deletion of the Canvas app of a probe user profile",
+            **runtime_profile(),
+            code=lambda_.Code.from_inline(inline_source('lambda_images/canvas_canary/canvas_canary.py')),
+            handler="index.lambda_handler",
+            timeout=Duration.minutes(15),
+            role=self.role,
+            environment={
+                "DOMAIN_ID": self.domain_id,
+                "PROBE_USER_PROFILE": PROBE_USER_PROFILE,
+                "METRIC_NAMESPACE": METRIC_NAMESPACE,
+                "START_TIMEOUT": str(START_TIMEOUT),
+            },
+        )
+        self.canary_lambda.node.add_dependency(self.probe_profile)
+
+        events.Rule(self, "CanvasCanaryRule",
+            description="Starts and deletes the Canvas app of the probe user profile",
+            schedule=events.Schedule.expression(self.schedule_param.value_as_string),
+            targets=[targets.LambdaFunction(invocation_target(self.canary_lambda))],
+        )
+
+        # ==================================================
+        # =================== DASHBOARD ====================
+        # ==================================================
+        def latency(metric_name: str, statistic: str, dimensions: str = "DomainId") -> cloudwatch.IMetric:
+            # One line per domain, or per domain and AZ, of the distributions published by the canary
+            return cloudwatch.MathExpression(
+                expression=f"SEARCH('{{{METRIC_NAMESPACE},{dimensions}}} MetricName=\"{metric_name}\"', '{statistic}', 3600)",
+                label=statistic,
+                period=Duration.hours(1),
+            )
+
+        self.dashboard = cloudwatch.Dashboard(
+            self,
+            "CanvasCanaryDashboard",
+            widgets=[[
+                cloudwatch.GraphWidget(
+                    title="Time to InService (s)",
+                    left=[latency("TimeToInService", statistic) for statistic in ("p50", "p90", "p99")],
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title="Time to InService by AZ, p90 (s)",
+                    left=[latency("TimeToInService", "p90", "DomainId,AvailabilityZone")],
+                    width=12,
+                ),
+            ], [
+                cloudwatch.GraphWidget(
+                    title="CreateApp call and time to Deleted, p90 (s)",
+                    left=[latency("CreateAppCall", "p90"), latency("TimeToDeleted", "p90")],
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title="Start failures",
+                    left=[latency("StartFailures", "Sum")],
+                    width=12,
+                ),
+            ]],
+        )
+
+        # ==================================================
+        # ==================== ALARMS ======================
+        # ==================================================
+        # Over a day, so a single slow start does not page, a regression after an endpoint, NAT or EFS change does
+        cloudwatch.Alarm(
+            self,
+            "StartLatencyAlarm",
+            alarm_description="Canvas apps take longer to start, check recent changes to the VPC endpoints, NAT and home EFS volume",
+            metric=cloudwatch.Metric(
+                namespace=METRIC_NAMESPACE,
+                metric_name="TimeToInService",
+                dimensions_map={"DomainId": self.domain_id},
+                statistic="p90",
+                period=Duration.days(1),
+            ),
+            threshold=self.alarm_threshold_param.value_as_number,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.MISSING,
+        )
+
+        cloudwatch.Alarm(
+            self,
+            "StartFailureAlarm",
+            alarm_description="The Canvas app of the probe user profile failed to start",
+            metric=cloudwatch.Metric(
+                namespace=METRIC_NAMESPACE,
+                metric_name="StartFailures",
+                dimensions_map={"DomainId": self.domain_id},
+                statistic="Sum",
+                period=Duration.hours(6),
+            ),
+            threshold=1,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+
+        CfnOutput(self, "CanvasCanaryFunction", value=self.canary_lambda.function_name)
@@ -1,11 +1,20 @@
 from constructs import Construct
 from aws_cdk import (
-    aws_ssm as ssm,
+    aws_iam as iam,
+    aws_lambda as lambda_,
     aws_servicecatalog as sc,
     aws_sagemaker as sagemaker,
+    Aws,
+    CfnCondition,
     CfnParameter,
     CfnTag,
+    CustomResource,
+    Duration,
+    Fn,
 )
+from studio_constructs.lambda_profile import runtime_profile, inline_source
+from studio_constructs.naming import domain_name
+from products.scheduled_shutdown_product import TIMEZONE_PATTERN, TIMEZONE_CONSTRAINT
 
 
 class CanvasUserProduct(sc.ProductStack):
@@ -26,16 +35,32 @@ class CanvasUserProduct(sc.ProductStack):
             "UserCostCenter",
             type="String",
         )
+
+        self.timezone_param = CfnParameter(
+            self,
+            "Timezone",
+            type="String",
+            description="IANA timezone of the user (e.g. Europe/Paris), used by the scheduled shutdown to stop Canvas at the user's end of day.",
+            default="UTC",
+            allowed_pattern=TIMEZONE_PATTERN,
+            constraint_description=TIMEZONE_CONSTRAINT,
+        )
+
+        self.workspace_layout_param = CfnParameter(
+            self,
+            "WorkspaceLayout",
+            type="String",
+            description="Where Canvas stores the user's datasets, models and predictions: shared uses the domain default S3 path, per-user gives the user its own hashed prefix in the Canvas bucket.",
+            allowed_values=["shared", "per-user"],
+            default="shared",
+        )
         # ==================================================
         # ========== GET DOMAIN ID AND ROLE FROM SSM =======
         # ==================================================
-        self.domain_id = ssm.StringParameter.value_for_string_parameter(
-            self, parameter_name="/studio/domain_id"
-        )
+        self.domain_name = domain_name(self)
+        self.domain_id = self.domain_name.value("domain_id")
 
-        self.user_role = ssm.StringParameter.value_for_string_parameter(
-            self, parameter_name="/studio/user_role"
-        )
+        self.user_role = self.domain_name.value("user_role")
 
         # ==================================================
         # ================== STUDIO USER ===================
@@ -48,5 +73,99 @@ class CanvasUserProduct(sc.ProductStack):
             user_settings=sagemaker.CfnUserProfile.UserSettingsProperty(
                 execution_role=self.user_role,
             ),
-            tags=[CfnTag(key="cost-center", value=self.user_tag_param.value_as_string)],
+            tags=[
+                CfnTag(key="cost-center", value=self.user_tag_param.value_as_string),
+            ],
+        )
+
+        # ==================================================
+        # ================ PROFILE TIMEZONE ================
+        # ==================================================
+        # Tags of AWS::SageMaker::UserProfile require a replacement, which a fixed profile name does not allow,
+        # the timezone tag is set through the API so that it can change in place
+        self.profile_timezone_role = iam.Role(self, "ProfileTimezoneRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "SageMakerProfileTimezonePolicy": iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            effect=iam.Effect.ALLOW,
+                            actions=["sagemaker:AddTags"],
+                            resources=[self.user_profile.attr_user_profile_arn]
+                        ),
+                    ]
+                ),
+            }
+        )
+        self.profile_timezone_lambda = lambda_.Function(self, "ProfileTimezoneLambda",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/profile_timezone/profile_timezone.py')),
+            description="Tag the SageMaker user profile with the user's timezone",
+            handler="index.lambda_handler",
+            **runtime_profile(),
+            timeout=Duration.seconds(30),
+            role=self.profile_timezone_role
         )
+        self.profile_timezone = CustomResource(self, "ProfileTimezone",
+            service_token=self.profile_timezone_lambda.function_arn,
+            properties={
+                "UserProfileArn": self.user_profile.attr_user_profile_arn,
+                "UserProfileName": self.user_profile.user_profile_name,
+                "Timezone": self.timezone_param.value_as_string,
+            }
+        )
+
+        # ==================================================
+        # ============= CANVAS WORKSPACE LAYOUT ============
+        # ==================================================
+        # SageMaker Canvas user settings not available via CloudFormation
+        self.per_user_workspace = CfnCondition(
+            self,
+            "PerUserWorkspace",
+            expression=Fn.condition_equals(self.workspace_layout_param.value_as_string, "per-user"),
+        )
+        # Only resolved for the per-user layout, domains provisioned before the bucket was published to SSM
+        # still take shared users, and publish it once they are updated
+        self.canvas_bucket = Fn.condition_if(
+            self.per_user_workspace.logical_id, self.domain_name.value("canvas_bucket"), Aws.NO_VALUE
+        ).to_string()
+
+        self.canvas_workspace_role = iam.Role(self, "CanvasWorkspaceRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "SageMakerCanvasWorkspacePolicy": iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            effect=iam.Effect.ALLOW,
+                            actions=["sagemaker:DescribeUserProfile", "sagemaker:UpdateUserProfile"],
+                            resources=[self.user_profile.attr_user_profile_arn]
+                        ),
+                    ]
+                ),
+            }
+        )
+        self.canvas_workspace_lambda = lambda_.Function(self, "CanvasWorkspaceLambda",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/canvas_workspace/canvas_workspace.py')),
+            description="Set the per-user SageMaker Canvas workspace path",
+            handler="index.lambda_handler",
+            **runtime_profile(),
+            timeout=Duration.seconds(30),
+            role=self.canvas_workspace_role
+        )
+        self.canvas_workspace = CustomResource(self, "CanvasWorkspace",
+            service_token=self.canvas_workspace_lambda.function_arn,
+            properties={
+                "SageMakerDomainId": self.domain_id,
+                "UserProfileName": self.user_profile.user_profile_name,
+                "CanvasBucketName": self.canvas_bucket,
+            }
+        )
+        self.canvas_workspace.node.add_dependency(self.user_profile)
+
+        for resource in [self.canvas_workspace_role, self.canvas_workspace_lambda, self.canvas_workspace]:
+            resource.node.default_child.cfn_options.condition = self.per_user_workspace
@@ -0,0 +1,115 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_servicecatalog as sc,
+    CfnOutput,
+    CfnParameter,
+    Duration,
+    Stack,
+)
+from studio_constructs.lambda_profile import ARCHITECTURE, runtime_profile, invocation_target, inline_source
+from studio_constructs.naming import domain_name
+
+
+class ColumnarDatasetProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.schedule_param = CfnParameter(
+            self,
+            "ScheduleExpression",
+            type="String",
+            description="How often the registered datasets are checked and converted when their CSV changed.",
+            default="rate(1 hour)",
+        )
+
+        # Layer versions differ across regions, there is no default that holds everywhere
+        self.pandas_layer_name = "AWSSDKPandas-Python312" + ("-Arm64" if ARCHITECTURE.name == "arm64" else "")
+        self.pandas_layer_version_param = CfnParameter(
+            self,
+            "PandasLayerVersion",
+            type="Number",
+            description=f"Version of the AWS SDK for pandas layer ({self.pandas_layer_name}) providing pyarrow in this region, see https://aws-sdk-pandas.readthedocs.io/en/stable/layers.html.",
+            min_value=1,
+        )
+
+        # ==================================================
+        # ============ GET CANVAS BUCKET FROM SSM ==========
+        # ==================================================
+        self.domain_name = domain_name(self)
+        self.canvas_bucket = self.domain_name.value("canvas_bucket")
+
+        # ==================================================
+        # ================= IAM ROLE =======================
+        # ==================================================
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "ColumnarDatasetPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:ListBucket"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:GetObject", "s3:PutObject", "s3:DeleteObject", "s3:AbortMultipartUpload"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}/*"],
+                    ),
+                    # The Canvas bucket is encrypted with the domain KMS key
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["kms:GenerateDataKey", "kms:Decrypt"],
+                        resources=["*"],
+                        conditions={"StringLike": {"kms:ViaService": "s3.*.amazonaws.com"}},
+                    ),
+                ])
+            },
+        )
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        pandas_layer = lambda_.LayerVersion.from_layer_version_arn(
+            self,
+            "PandasLayer",
+            f"arn:aws:lambda:{Stack.of(self).region}:336392948345:layer:{self.pandas_layer_name}:"
+            f"{self.pandas_layer_version_param.value_as_string}",
+        )
+
+        self.columnar_lambda = lambda_.Function(
+            self,
+            "ColumnarDatasetLambda",
+            description="Converts the CSV datasets registered in the Canvas bucket to partitioned Parquet",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/columnar/columnar.py')),
+            handler="index.lambda_handler",
+            layers=[pandas_layer],
+            # CSV is read in 64 MB blocks and the writer keeps at most 16 open files, memory stays flat
+            # whatever the size of the dataset and its number of partitions
+            **runtime_profile(3008),
+            timeout=Duration.minutes(15),
+            role=self.role,
+            environment={
+                "CANVAS_BUCKET": self.canvas_bucket,
+            },
+        )
+
+        events.Rule(self, "ColumnarDatasetRule",
+            description="Converts the registered Canvas datasets whose CSV changed",
+            schedule=events.Schedule.expression(self.schedule_param.value_as_string),
+            targets=[targets.LambdaFunction(invocation_target(self.columnar_lambda))],
+        )
+
+        CfnOutput(self, "ColumnarDatasetFunction", value=self.columnar_lambda.function_name)
+        CfnOutput(self, "DatasetRegistry", value=f"s3://{self.canvas_bucket}/columnar/registry.json")
@@ -0,0 +1,110 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_servicecatalog as sc,
+    CfnOutput,
+    CfnParameter,
+    Duration,
+    Fn,
+)
+from studio_constructs.lambda_profile import inline_source, runtime_profile
+from studio_constructs.naming import domain_name
+
+
+class DatasetStagingProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.source_buckets_param = CfnParameter(
+            self,
+            "SourceBucketNames",
+            type="CommaDelimitedList",
+            description="Buckets the datasets are staged from.",
+        )
+
+        self.max_workers_param = CfnParameter(
+            self,
+            "MaxWorkers",
+            type="Number",
+            description="Number of objects transferred in parallel, each one with up to 16 parallel parts.",
+            default=8,
+        )
+
+        # ==================================================
+        # ============ GET CANVAS BUCKET FROM SSM ==========
+        # ==================================================
+        self.domain_name = domain_name(self)
+        self.canvas_bucket = self.domain_name.value("canvas_bucket")
+
+        # ==================================================
+        # ================= IAM ROLE =======================
+        # ==================================================
+        # Turns the list of bucket names into lists of bucket and object ARNs
+        source_buckets = self.source_buckets_param.value_as_list
+        source_bucket_arns = Fn.split(",", Fn.join("", ["arn:aws:s3:::", Fn.join(",arn:aws:s3:::", source_buckets)]))
+        source_object_arns = Fn.split(",", Fn.join("", ["arn:aws:s3:::", Fn.join("/*,arn:aws:s3:::", source_buckets), "/*"]))
+
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "DatasetStagingPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:ListBucket"],
+                        resources=source_bucket_arns,
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:GetObject", "s3:GetObjectVersion", "s3:GetObjectTagging"],
+                        resources=source_object_arns,
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:ListBucket"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:GetObject", "s3:PutObject", "s3:AbortMultipartUpload"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}/*"],
+                    ),
+                    # The Canvas bucket is encrypted with the domain KMS key
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["kms:GenerateDataKey", "kms:Decrypt"],
+                        resources=["*"],
+                        conditions={"StringLike": {"kms:ViaService": "s3.*.amazonaws.com"}},
+                    ),
+                ])
+            },
+        )
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        self.staging_lambda = lambda_.Function(
+            self,
+            "DatasetStagingLambda",
+            description="Stages datasets into the SageMaker Canvas bucket with parallel multipart transfers",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/dataset_staging/staging.py')),
+            handler="index.lambda_handler",
+            # More memory also means more network bandwidth for the transfers
+            **runtime_profile(2048),
+            timeout=Duration.minutes(15),
+            role=self.role,
+            environment={
+                "CANVAS_BUCKET": self.canvas_bucket,
+                "MAX_WORKERS": self.max_workers_param.value_as_string,
+            },
+        )
+
+        CfnOutput(self, "DatasetStagingFunction", value=self.staging_lambda.function_name)
@@ -1,38 +1,81 @@
 from constructs import Construct
 from aws_cdk import (
-    Duration, CustomResource, CfnResource, Stack,
+    Duration, CustomResource, CfnParameter, CfnResource, Stack,
     aws_servicecatalog as sc, 
     aws_sagemaker as sagemaker, 
-    aws_ssm as ssm,
     aws_iam as iam,
     aws_lambda as lambda_,
 )
 from studio_constructs.s3 import S3Bucket
 from studio_constructs.iam_role import IAMRole
-from studio_constructs.networking import Networking
+from studio_constructs.networking import Networking, SharedNetwork, endpoint_parameters
 from studio_constructs.kms_key import KMSKey
+from studio_constructs.efs_throughput import HomeEfsThroughput, THROUGHPUT_MODES
+from studio_constructs.lambda_profile import runtime_profile, inline_source
+from studio_constructs.naming import domain_name, network_name
 import os
 
 
 class DomainProduct(sc.ProductStack):
-    def __init__(self, scope: Construct, id: str):
+    def __init__(self, scope: Construct, id: str, shared_network: bool = False):
         super().__init__(scope, id)
 
         # self.account_id = os.environ["CDK_DEFAULT_ACCOUNT"]
         # self.aws_region = os.environ["CDK_DEFAULT_REGION"]
         self.account_id = Stack.of(self).account
         self.aws_region = Stack.of(self).region
-        self.bucket_name = f"sagemaker-{self.aws_region}-{self.account_id}" # If you change this, apply it to the Domain
+        encryption_profile = self.node.try_get_context("canvas:encryption_profile") or "standard"
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        # Several domains, each under its own name, can attach to the same shared network
+        self.domain_name = domain_name(self)
+        self.bucket_name = f"sagemaker-{self.aws_region}-{self.account_id}{self.domain_name.suffix}" # If you change this, apply it to the Domain
+
+        if shared_network:
+            self.network_name = network_name(self)
+        else:
+            self.endpoint_profile_param, self.custom_endpoints_param = endpoint_parameters(self)
+
+        self.efs_throughput_mode_param = CfnParameter(
+            self,
+            "HomeEfsThroughputMode",
+            type="String",
+            description="Throughput mode of the domain's home EFS volume: bursting depends on burst credits that run out when many users start Canvas at once, elastic scales with the load, provisioned uses HomeEfsProvisionedThroughput.",
+            allowed_values=THROUGHPUT_MODES,
+            default="bursting",
+        )
+
+        self.efs_provisioned_throughput_param = CfnParameter(
+            self,
+            "HomeEfsProvisionedThroughput",
+            type="Number",
+            description="Throughput of the home EFS volume in MiB/s, only used by the provisioned throughput mode.",
+            min_value=1,
+            default=128,
+        )
 
         # ==================================================
         # ================== IAM ROLE ======================
         # ==================================================
-        user_role = IAMRole(self, "user_role")
+        user_role = IAMRole(self, "user_role", parameter_name=self.domain_name.path("user_role"))
 
         # ==================================================
         # ================== NETWORKING ====================
         # ==================================================
-        network = Networking(self, "vpc")
+        if shared_network:
+            # Attach to the network of the shared network product instead of creating one
+            network = SharedNetwork(self, self.network_name)
+        else:
+            network = Networking(
+                self,
+                "vpc",
+                endpoint_profile=self.endpoint_profile_param.value_as_string,
+                custom_endpoints=self.custom_endpoints_param.value_as_list,
+                egress_mode=self.node.try_get_context("canvas:egress_mode") or "single-nat",
+                expected_concurrent_apps=self.node.try_get_context("canvas:expected_concurrent_apps"),
+            )
 
         # ==================================================
         # =================== KMS KEY ======================
@@ -42,14 +85,16 @@ class DomainProduct(sc.ProductStack):
         # ==================================================
         # =================== S3 BUCKET ====================
         # ==================================================
-        bucket = S3Bucket(self, "bucket", bucket_name=self.bucket_name, kms_key=kms_key.encryption_key)
+        bucket = S3Bucket(
+            self, "bucket", bucket_name=self.bucket_name, kms_key=kms_key.encryption_key, encryption_profile=encryption_profile
+        )
 
         # ==================================================
         # ================= STUDIO DOMAIN ==================
         # ==================================================
         self.studio_domain = sagemaker.CfnDomain(
             self, "sagemaker-domain",
-            domain_name="domain",
+            domain_name=self.domain_name.select("domain", self.domain_name.name),
             auth_mode="IAM",
             app_network_access_type="VpcOnly",
             vpc_id=network.vpc_id,
@@ -58,6 +103,7 @@ class DomainProduct(sc.ProductStack):
             default_user_settings=sagemaker.CfnDomain.UserSettingsProperty(
                 execution_role=user_role.role.role_arn, security_groups=[network.sg_id],
                 studio_web_portal="ENABLED", default_landing_uri="studio::",
+                # Shared outputs land in the Canvas bucket, so they also get its Bucket Key under the reduced-requests profile
                 sharing_settings=sagemaker.CfnDomain.SharingSettingsProperty(
                     notebook_output_option="Allowed",
                     s3_output_path=f"s3://{bucket.bucket.bucket_name}/shared-notebooks/",
@@ -93,48 +139,11 @@ class DomainProduct(sc.ProductStack):
             }
         )
         self.enable_canvas_settings_lambda = lambda_.Function(self, "EnableCanvasSettingsLambda",
-            function_name="CFEnableSagemakerCanvasSettings",
-            code=lambda_.InlineCode("""\
-import json
-import boto3
-import cfnresponse
-
-client = boto3.client('sagemaker')
-
-def lambda_handler(event, context):
-    response_status = cfnresponse.SUCCESS
-    sagemaker_domain_id = event['ResourceProperties']['SageMakerDomainId']
-    sagemaker_execution_role = event['ResourceProperties']['SageMakerExecutionRoleARN']
-    canvas_bucket_artifacts = event['ResourceProperties']['CanvasBucketName']
-
-    if 'RequestType' in event and event['RequestType'] == 'Create':
-        client.update_domain(
-            DomainId=sagemaker_domain_id,
-            DefaultUserSettings={
-                'CanvasAppSettings': {
-                    'WorkspaceSettings': {'S3ArtifactPath': f's3://{canvas_bucket_artifacts}/'},
-                    'TimeSeriesForecastingSettings': {'Status': 'ENABLED'},
-                    'ModelRegisterSettings': {'Status': 'ENABLED'},
-                    'DirectDeploySettings': {'Status': 'ENABLED'},
-                    'KendraSettings': {'Status': 'DISABLED'}, # Change to ENABLED when you want to use Kendra for RAG
-                    'GenerativeAiSettings': {'AmazonBedrockRoleArn':sagemaker_execution_role},
-                    # Uncomment and modify the below if you need to add OAuth for Salesforce or Snowflake
-                    # 'IdentityProviderOAuthSettings': [
-                    #     {
-                    #         'DataSourceName': 'SalesforceGenie'|'Snowflake',
-                    #         'Status': 'ENABLED'|'DISABLED',
-                    #         'SecretArn': 'string'
-                    #     },
-                    # ],
-                }
-            }
-        )
-    cfnresponse.send(event, context, response_status, {}, '')"""
-            ),
+            function_name=f"CFEnableSagemakerCanvasSettings{self.domain_name.suffix}",
+            code=lambda_.Code.from_inline(inline_source('lambda_images/canvas_settings/canvas_settings.py')),
             description="Enable SageMaker Canvas Settings",
             handler="index.lambda_handler",
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            memory_size=128,
+            **runtime_profile(),
             timeout=Duration.seconds(30),
             role=self.custom_settings_canvas_role
         )
@@ -147,13 +156,20 @@ def lambda_handler(event, context):
             }
         )
 
-
         # ==================================================
-        # ================ SSM PARAMETERS ==================
+        # ============ HOME EFS THROUGHPUT ==================
         # ==================================================
-        ssm.StringParameter(
+        HomeEfsThroughput(
             self,
-            "StudioDomainID",
-            parameter_name="/studio/domain_id",
-            string_value=self.studio_domain.attr_domain_id,
+            "HomeEfs",
+            file_system_id=self.studio_domain.attr_home_efs_file_system_id,
+            throughput_mode=self.efs_throughput_mode_param.value_as_string,
+            provisioned_mibps=self.efs_provisioned_throughput_param.value_as_string,
         )
+
+
+        # ==================================================
+        # ================ SSM PARAMETERS ==================
+        # ==================================================
+        self.domain_name.publish(self, "StudioDomainID", "domain_id", self.studio_domain.attr_domain_id)
+        self.domain_name.publish(self, "CanvasBucketName", "canvas_bucket", bucket.bucket.bucket_name)
@@ -0,0 +1,32 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_servicecatalog as sc,
+)
+from studio_constructs.naming import network_name
+from studio_constructs.networking import Networking, endpoint_parameters
+
+
+class NetworkProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.network_name = network_name(self)
+        self.endpoint_profile_param, self.custom_endpoints_param = endpoint_parameters(self)
+
+        # ==================================================
+        # ================== NETWORKING ====================
+        # ==================================================
+        self.network = Networking(
+            self,
+            "vpc",
+            endpoint_profile=self.endpoint_profile_param.value_as_string,
+            custom_endpoints=self.custom_endpoints_param.value_as_list,
+            egress_mode=self.node.try_get_context("canvas:egress_mode") or "single-nat",
+            expected_concurrent_apps=self.node.try_get_context("canvas:expected_concurrent_apps"),
+        )
+
+        # VPC, subnet and security group IDs are published to SSM for the domains to attach to
+        self.network.publish(self.network_name)
@@ -0,0 +1,116 @@
+from constructs import Construct
+from aws_cdk import (
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_servicecatalog as sc,
+    CfnOutput,
+    CfnParameter,
+    Duration,
+    Stack,
+)
+from studio_constructs.lambda_profile import inline_source, runtime_profile
+from studio_constructs.naming import domain_name
+
+
+class OffboardingProduct(sc.ProductStack):
+    def __init__(self, scope: Construct, id: str):
+        super().__init__(scope, id)
+
+        region = Stack.of(self).region
+        account = Stack.of(self).account
+
+        # ==================================================
+        # ================== PARAMETERS ====================
+        # ==================================================
+        self.max_parallel_users_param = CfnParameter(
+            self,
+            "MaxParallelUsers",
+            type="Number",
+            description="Number of users offboarded at the same time, the apps of each user are deleted concurrently.",
+            default=4,
+            min_value=1,
+        )
+
+        # ==================================================
+        # ======= GET DOMAIN ID AND BUCKET FROM SSM ========
+        # ==================================================
+        self.domain_name = domain_name(self)
+        self.domain_id = self.domain_name.value("domain_id")
+
+        self.canvas_bucket = self.domain_name.value("canvas_bucket")
+
+        # ==================================================
+        # ================= IAM ROLE =======================
+        # ==================================================
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "OffboardingPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["sagemaker:ListApps", "sagemaker:ListSpaces"],
+                        resources=["*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=[
+                            "sagemaker:DeleteApp",
+                            "sagemaker:DescribeApp",
+                            "sagemaker:DeleteSpace",
+                            "sagemaker:DescribeSpace",
+                            "sagemaker:DeleteUserProfile",
+                            "sagemaker:DescribeUserProfile",
+                            "sagemaker:ListTags",
+                        ],
+                        resources=[
+                            f"arn:aws:sagemaker:{region}:{account}:app/{self.domain_id}/*",
+                            f"arn:aws:sagemaker:{region}:{account}:space/{self.domain_id}/*",
+                            f"arn:aws:sagemaker:{region}:{account}:user-profile/{self.domain_id}/*",
+                        ],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:ListBucket"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["s3:GetObject", "s3:PutObject", "s3:DeleteObject"],
+                        resources=[f"arn:aws:s3:::{self.canvas_bucket}/*"],
+                    ),
+                    # The Canvas bucket is encrypted with the domain KMS key
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["kms:GenerateDataKey", "kms:Decrypt"],
+                        resources=["*"],
+                        conditions={"StringLike": {"kms:ViaService": "s3.*.amazonaws.com"}},
+                    ),
+                ])
+            },
+        )
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        self.offboarding_lambda = lambda_.Function(
+            self,
+            "OffboardingLambda",
+            description="Deletes the apps, spaces and user profiles of offboarded Canvas users",
+            **runtime_profile(),
+            code=lambda_.Code.from_inline(inline_source('lambda_images/offboarding/offboarding.py')),
+            handler="index.lambda_handler",
+            timeout=Duration.minutes(15),
+            role=self.role,
+            environment={
+                "DOMAIN_ID": self.domain_id,
+                "CANVAS_BUCKET": self.canvas_bucket,
+                "MAX_PARALLEL_USERS": self.max_parallel_users_param.value_as_string,
+            },
+        )
+
+        CfnOutput(self, "OffboardingFunction", value=self.offboarding_lambda.function_name)
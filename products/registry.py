@@ -0,0 +1,267 @@
+import importlib
+import os
+import sys
+import time
+from constructs import Construct
+from aws_cdk import (
+    aws_servicecatalog as sc,
+    Annotations,
+)
+from products.synth_cache import SynthCache
+
+# Products of the portfolio, each product class is only imported and built when the product is selected.
+# Selected with the canvas:products context, e.g. cdk synth -c canvas:products=domain,canvas-user
+PRODUCTS = {
+    "network": {
+        "id": "SCProductNetwork",
+        "name": "0 - Shared Network",
+        "description": "VPC, NAT and VPC endpoints shared by several Studio Domains",
+        "versions": [
+            {"name": "v1", "class": "products.network_product.NetworkProduct", "id": "NetworkProduct"},
+        ],
+    },
+    "domain": {
+        "id": "SCProductDomain",
+        "name": "1 - Studio Domain",
+        "description": "SageMaker Studio Domain for Canvas",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.domain_product.DomainProduct",
+                "id": "DomainProduct",
+                # Exported over the template of cfn-templates/ it replaces by tools/export_templates.py
+                "cfn_template": "sagemaker-domain-with-vpc.yaml",
+            },
+            {
+                "name": "v1-shared-network",
+                "description": "Attaches the domain to the network of the 0 - Shared Network product",
+                "class": "products.domain_product.DomainProduct",
+                "id": "DomainProductSharedNetwork",
+                "kwargs": {"shared_network": True},
+            },
+        ],
+    },
+    "canvas-user": {
+        "id": "SCProductCanvasUser",
+        "name": "2 - Canvas User",
+        "description": "SageMaker Studio User Profile for Canvas",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.canvas_user_product.CanvasUserProduct",
+                "id": "CanvasUserProduct",
+                "cfn_template": "citizen-data-scientist-user-profile.yaml",
+            },
+        ],
+    },
+    "scheduled-shutdown": {
+        "id": "SCProductCanvasScheduledShutdown",
+        "name": "Canvas Scheduled Shutdown",
+        "description": "Scheduled Lambda shutting down Canvas automatically",
+        # Replaced by the automated shutdown, only built when selected explicitly
+        "default": False,
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.scheduled_shutdown_product.ScheduledShutdownProduct",
+                "id": "CanvasScheduledShutdownProduct",
+            },
+        ],
+    },
+    "automated-shutdown": {
+        "id": "SCProductCanvasAutomatedShutdown",
+        "name": "3 - Canvas Automated Shutdown",
+        "description": "Automated Lambda shutting down Canvas automatically",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.automated_shutdown_product.AutoShutdownProduct",
+                "id": "CanvasAutomatedShutdownProduct",
+                "kwargs": {"shard_count": 4},
+                "cfn_template": "canvas-auto-shutdown.yaml",
+            },
+        ],
+    },
+    "dataset-staging": {
+        "id": "SCProductCanvasDatasetStaging",
+        "name": "4 - Canvas Dataset Staging",
+        "description": "Lambda staging datasets into the Canvas bucket with parallel multipart transfers",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.dataset_staging_product.DatasetStagingProduct",
+                "id": "CanvasDatasetStagingProduct",
+            },
+        ],
+    },
+    "columnar-datasets": {
+        "id": "SCProductCanvasColumnarDatasets",
+        "name": "5 - Canvas Columnar Datasets",
+        "description": "Scheduled Lambda converting the registered Canvas CSV datasets to partitioned Parquet",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.columnar_dataset_product.ColumnarDatasetProduct",
+                "id": "CanvasColumnarDatasetProduct",
+            },
+        ],
+    },
+    "artifact-cleanup": {
+        "id": "SCProductCanvasArtifactCleanup",
+        "name": "6 - Canvas Artifact Cleanup",
+        "description": "Scheduled Lambda deleting the Canvas artifacts of offboarded users from the bucket inventory",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.artifact_cleanup_product.ArtifactCleanupProduct",
+                "id": "CanvasArtifactCleanupProduct",
+            },
+        ],
+    },
+    "user-offboarding": {
+        "id": "SCProductCanvasUserOffboarding",
+        "name": "7 - Canvas User Offboarding",
+        "description": "Lambda deleting the apps, spaces and user profiles of offboarded Canvas users",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.offboarding_product.OffboardingProduct",
+                "id": "CanvasUserOffboardingProduct",
+            },
+        ],
+    },
+    "start-latency-canary": {
+        "id": "SCProductCanvasStartLatencyCanary",
+        "name": "8 - Canvas Start Latency Canary",
+        "description": "Scheduled Lambda timing the start of a probe Canvas app, with latency dashboard and alarms",
+        "versions": [
+            {
+                "name": "v1",
+                "class": "products.canvas_canary_product.CanvasCanaryProduct",
+                "id": "CanvasStartLatencyCanaryProduct",
+            },
+        ],
+    },
+}
+
+
+def selected_products(scope: Construct) -> list:
+    selection = scope.node.try_get_context("canvas:products")
+    if not selection:
+        return [key for key, product in PRODUCTS.items() if product.get("default", True)]
+    if isinstance(selection, str):
+        selection = [key.strip() for key in selection.split(",") if key.strip()]
+    unknown = [key for key in selection if key not in PRODUCTS]
+    if unknown:
+        raise ValueError(f"Unknown products {unknown}, expected some of {list(PRODUCTS)}")
+    # Registry order, so the portfolio does not depend on the order of the selection
+    return [key for key in PRODUCTS if key in selection]
+
+
+def context_flag(scope: Construct, name: str) -> bool:
+    # -c on the command line passes "true" and "false" as strings
+    return str(scope.node.try_get_context(name)).lower() == "true"
+
+
+def load_class(path: str):
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+class ProductRegistry:
+    def __init__(self, scope: Construct):
+        self.scope = scope
+        self.selection = selected_products(scope)
+        self.benchmark = context_flag(scope, "canvas:benchmark")
+        self.cache = SynthCache(scope) if context_flag(scope, "canvas:synth_cache") else None
+        # (product key, version name, cache hit or miss, template file, construction seconds)
+        self.timings = []
+
+        defaults = [key for key, product in PRODUCTS.items() if product.get("default", True)]
+        if [key for key in defaults if key not in self.selection]:
+            Annotations.of(scope).add_warning(
+                f"Only {self.selection} are synthesized, deploying this portfolio removes the other products from it"
+            )
+
+    def build(self, portfolio: sc.Portfolio) -> dict:
+        versions = [(key, version) for key in self.selection for version in PRODUCTS[key]["versions"]]
+        templates = self.build_templates(versions)
+
+        products = {}
+        for key in self.selection:
+            product = PRODUCTS[key]
+            products[key] = sc.CloudFormationProduct(
+                self.scope,
+                product["id"],
+                product_name=product["name"],
+                owner="CCOE",
+                description=product["description"],
+                distributor="CCOE",
+                product_versions=[
+                    sc.CloudFormationProductVersion(
+                        product_version_name=version["name"],
+                        description=version.get("description"),
+                        cloud_formation_template=templates[(key, version["name"])],
+                    )
+                    for version in product["versions"]
+                ],
+            )
+            portfolio.add_product(products[key])
+        return products
+
+    def build_templates(self, versions: list) -> dict:
+        timings = {}
+
+        def builder(key, version):
+            def build(scope):
+                start = time.perf_counter()
+                product_stack = load_class(version["class"])(scope, version["id"], **version.get("kwargs", {}))
+                timings[(key, version["name"])] = time.perf_counter() - start
+                return product_stack
+            return build
+
+        templates = {}
+        uncached = versions
+        if self.cache:
+            # Cache hits are neither imported nor built, the cached templates are published as assets
+            cached = self.cache.templates([(key, version, builder(key, version)) for key, version in versions])
+            uncached = []
+            for (key, version), (template_file, hit, annotations) in zip(versions, cached):
+                if template_file is None:
+                    uncached.append((key, version))
+                    continue
+                self.annotate(annotations)
+                templates[(key, version["name"])] = sc.CloudFormationTemplate.from_asset(template_file)
+                self.timings.append(
+                    (key, version["name"], "hit" if hit else "miss", template_file, timings.get((key, version["name"]), 0))
+                )
+        # Products with assets need the portfolio stack to deploy them and are always built
+        for key, version in uncached:
+            product_stack = builder(key, version)(self.scope)
+            templates[(key, version["name"])] = sc.CloudFormationTemplate.from_product_stack(product_stack)
+            self.timings.append((key, version["name"], "-", product_stack.template_file, timings[(key, version["name"])]))
+        return templates
+
+    def annotate(self, annotations: list):
+        # Annotations of cached products were added in the app that built them, they are reported again on each synth
+        for annotation in annotations:
+            message = f"[{annotation['path']}] {annotation['message']}"
+            if annotation["level"] == "error":
+                Annotations.of(self.scope).add_error(message)
+            elif annotation["level"] == "warning":
+                Annotations.of(self.scope).add_warning(message)
+            else:
+                Annotations.of(self.scope).add_info(message)
+
+    def report_benchmark(self, outdir: str):
+        # Run after app.synth(), the product templates are only written to the cloud assembly at synth time
+        if not self.benchmark:
+            return
+        lines = [f"{'product':<22}{'version':<20}{'cache':>6}{'construct (s)':>14}{'template (KB)':>15}"]
+        for key, version_name, cache, template_file, seconds in self.timings:
+            template = os.path.join(outdir, template_file)
+            size = os.path.getsize(template) / 1024 if os.path.exists(template) else float("nan")
+            lines.append(f"{key:<22}{version_name:<20}{cache:>6}{seconds:>14.2f}{size:>15.1f}")
+        total = sum(timing[-1] for timing in self.timings)
+        lines.append(f"{'total':<48}{total:>14.2f}")
+        print("\n".join(lines), file=sys.stderr)
@@ -7,6 +7,7 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_servicecatalog as sc,
 )
+from studio_constructs.lambda_profile import inline_source, runtime_profile
 
 
 class BucketProduct(sc.ProductStack):
@@ -54,40 +55,10 @@ class BucketProduct(sc.ProductStack):
         self.cors_lambda = _lambda.Function(
             self, "CorsLambda",
             function_name="ApplyCorsConfiguration",
-            runtime=_lambda.Runtime.PYTHON_3_12,
-            handler="index.handler",
+            **runtime_profile(),
+            handler="index.lambda_handler",
             role=self.lambda_role,
-            code=_lambda.Code.from_inline(
-                """\
-import json
-import boto3
-
-def handler(event, context):
-    s3 = boto3.client('s3')
-    bucket_name = event['BucketName']
-    cors_configuration = {
-        'CORSRules': [{
-            'AllowedMethods': ['POST', 'PUT', 'GET', 'HEAD', 'DELETE'],
-            'AllowedOrigins': ['https://*.sagemaker.aws'],
-            'AllowedHeaders': ['*'],
-            'ExposeHeaders': ['ETag', 'x-amz-delete-marker', 'x-amz-id-2', 'x-amz-request-id', 'x-amz-server-side-encryption', 'x-amz-version-id']
-        }]
-    }
-    try:
-        s3.head_bucket(Bucket=bucket_name)
-        print(f"Bucket {bucket_name} exists. Applying CORS configuration.")
-    except s3.exceptions.ClientError:
-        print(f"Bucket {bucket_name} does not exist. Creating bucket and applying CORS configuration.")
-        s3.create_bucket(Bucket=bucket_name)
-    
-    s3.put_bucket_cors(
-        Bucket=bucket_name,
-        CORSConfiguration=cors_configuration
-    )
-    return {
-        'statusCode': 200,
-        'body': json.dumps(f"CORS configuration applied to {bucket_name}")
-    }"""),
+            code=_lambda.Code.from_inline(inline_source('lambda_images/bucket_cors/bucket_cors.py')),
             timeout=Duration.seconds(30)
         )
 
@@ -9,6 +9,11 @@ from aws_cdk import (
     CfnParameter,
     Duration,
 )
+from studio_constructs.lambda_profile import runtime_profile, invocation_target, inline_source
+
+# UTC or an IANA area/location name, a name missing from the Lambda runtime's tz database falls back to the default timezone
+TIMEZONE_PATTERN = r"^(UTC|(Africa|America|Antarctica|Arctic|Asia|Atlantic|Australia|Europe|Indian|Pacific|Etc)(/[A-Za-z0-9_+-]+){1,2})$"
+TIMEZONE_CONSTRAINT = "Must be UTC or an IANA timezone name such as Europe/Paris or America/Argentina/Buenos_Aires."
 
 
 class ScheduledShutdownProduct(sc.ProductStack):
@@ -22,7 +27,28 @@ class ScheduledShutdownProduct(sc.ProductStack):
             self,
             "CronSchedulingExpression",
             type="String",
-            default="cron(0 19 ? * FRI *)",
+            description="Schedule of the shutdown sweep. It must run hourly for every timezone to be swept at its own end of day.",
+            default="cron(0 * * * ? *)",
+        )
+
+        self.end_of_day_hour = CfnParameter(
+            self,
+            "EndOfDayHour",
+            type="Number",
+            description="Local hour (0-23) at which the Canvas apps of a user are shut down, in the timezone of the user profile.",
+            default=19,
+            min_value=0,
+            max_value=23,
+        )
+
+        self.default_timezone = CfnParameter(
+            self,
+            "DefaultTimezone",
+            type="String",
+            description="IANA timezone used for the user profiles without a valid canvas:timezone tag.",
+            default="UTC",
+            allowed_pattern=TIMEZONE_PATTERN,
+            constraint_description=TIMEZONE_CONSTRAINT,
         )
 
         # ==================================================
@@ -46,6 +72,7 @@ class ScheduledShutdownProduct(sc.ProductStack):
                     actions=[
                         "sagemaker:DeleteApp",
                         "sagemaker:ListApps",
+                        "tag:GetResources",
                     ],
                     resources=["*"],
                 )
@@ -60,12 +87,15 @@ class ScheduledShutdownProduct(sc.ProductStack):
             self,
             "ShutDownCanvasLambda",
             function_name="canvas-scheduled-shutdown",
-            runtime=lambda_.Runtime.PYTHON_3_9,
-            code=lambda_.Code.from_inline(open('lambda_images/shutdown/shutdown.py').read()),
+            **runtime_profile(),
+            code=lambda_.Code.from_inline(inline_source('lambda_images/shutdown/shutdown.py')),
             handler="index.lambda_handler",
-            memory_size=128,
             role=self.role,
             timeout=Duration.seconds(300),
+            environment={
+                "END_OF_DAY_HOUR": self.end_of_day_hour.value_as_string,
+                "DEFAULT_TIMEZONE": self.default_timezone.value_as_string,
+            },
         )
         # ==================================================
         # ================== SCHEDULING ====================
@@ -79,4 +109,4 @@ class ScheduledShutdownProduct(sc.ProductStack):
             ),
         )
 
-        self.cron_rule.add_target(target=targets.LambdaFunction(self.lambda_function))
+        self.cron_rule.add_target(target=targets.LambdaFunction(invocation_target(self.lambda_function)))
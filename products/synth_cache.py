@@ -0,0 +1,153 @@
+import ast
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from aws_cdk import (
+    aws_ecr_assets as ecr_assets,
+    aws_s3_assets as s3_assets,
+    App, Environment, Stack, Token,
+)
+
+CACHE_DIRECTORY = ".synth-cache"
+INDEX_FILE = "index.json"
+LOCAL_PACKAGES = ("products", "studio_constructs")
+# Context selecting and reporting products, it does not change the templates
+IGNORED_CONTEXT = ("canvas:products", "canvas:benchmark", "canvas:synth_cache")
+ANNOTATION_TYPES = ("aws:cdk:info", "aws:cdk:warning", "aws:cdk:error")
+
+
+def module_sources(module_name: str, sources: set = None) -> set:
+    # Files a product is built from: its module, the local modules it imports and the Lambda code they read
+    sources = set() if sources is None else sources
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.origin is None or spec.origin in sources:
+        return sources
+    sources.add(spec.origin)
+
+    with open(spec.origin) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.module.split(".")[0] in LOCAL_PACKAGES:
+            module_sources(node.module, sources)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split(".")[0] in LOCAL_PACKAGES:
+                    module_sources(alias.name, sources)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.startswith("lambda_images/"):
+            if os.path.isfile(node.value):
+                sources.add(os.path.abspath(node.value))
+    return sources
+
+
+def stack_annotations(product_stack: Stack) -> list:
+    # Messages added with Annotations while the product was built, with the path of the construct they were added to
+    return [
+        {"path": construct.node.path, "level": entry.type.rpartition(":")[2], "message": str(entry.data)}
+        for construct in product_stack.node.find_all()
+        for entry in construct.node.metadata
+        if entry.type in ANNOTATION_TYPES
+    ]
+
+
+def has_assets(product_stack: Stack) -> bool:
+    # Assets of a product stack are deployed by constructs of the portfolio stack, which a cached template leaves out
+    return any(
+        isinstance(construct, (s3_assets.Asset, ecr_assets.DockerImageAsset))
+        for construct in product_stack.node.find_all()
+    )
+
+
+class SynthCache:
+    # Content-addressed cache of the product templates, a product version is only synthesized again
+    # when its sources, arguments, the context or the CDK version change
+    def __init__(self, scope: Stack, directory: str = CACHE_DIRECTORY):
+        self.scope = scope
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+        self.context = {
+            key: value for key, value in scope.node.get_all_context().items()
+            if not key.startswith("aws:cdk:") and key not in IGNORED_CONTEXT
+        }
+        self.env = {
+            "account": None if Token.is_unresolved(scope.account) else scope.account,
+            "region": None if Token.is_unresolved(scope.region) else scope.region,
+        }
+
+    def key(self, version: dict) -> str:
+        digest = hashlib.sha256()
+        root = os.getcwd()
+        for path in sorted(module_sources(version["class"].rpartition(".")[0])):
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        digest.update(json.dumps({
+            "class": version["class"],
+            "id": version["id"],
+            "kwargs": version.get("kwargs", {}),
+            "context": self.context,
+            "env": self.env,
+            "stack": self.scope.node.path,
+            "cdk": importlib.metadata.version("aws-cdk-lib"),
+        }, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def templates(self, versions: list) -> list:
+        # versions are (product key, version, build), returns the (template file, cache hit, annotations) of each
+        # version, the template file is None for products with assets, which are built in the portfolio instead
+        keys = [self.key(version) for _, version, _ in versions]
+        paths = [os.path.join(self.directory, f"{key}.template.json") for key in keys]
+        metadata_paths = [os.path.join(self.directory, f"{key}.metadata.json") for key in keys]
+        hits = [os.path.exists(path) for path in metadata_paths]
+        misses = [
+            (build, path, metadata_path)
+            for (_, _, build), path, metadata_path, hit in zip(versions, paths, metadata_paths, hits) if not hit
+        ]
+        if misses:
+            self.synthesize(misses)
+
+        templates = []
+        for (product_key, version, _), key, path, metadata_path, hit in zip(versions, keys, paths, metadata_paths, hits):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if metadata["assets"]:
+                templates.append((None, hit, metadata["annotations"]))
+                continue
+            self.index[f"{product_key}/{version['name']}"] = {
+                "key": key, "class": version["class"], "template": os.path.basename(path),
+            }
+            templates.append((path, hit, metadata["annotations"]))
+        with open(self.index_path, "w") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        return templates
+
+    def synthesize(self, misses: list):
+        # Builds the missing products in one app, under a stack with the same path and environment as the
+        # portfolio stack so that the templates are the ones the portfolio would have synthesized
+        outdir = tempfile.mkdtemp(prefix="synth-cache-")
+        try:
+            app = App(outdir=outdir, context=self.context)
+            stack = Stack(app, self.scope.node.id, env=Environment(**self.env))
+            product_stacks = [(build(stack), path, metadata_path) for build, path, metadata_path in misses]
+            app.synth()
+            for product_stack, path, metadata_path in product_stacks:
+                # Written next to the final name and renamed, so an interrupted synth never leaves a partial template.
+                # The metadata is written last and marks the entry as complete.
+                metadata = {"annotations": stack_annotations(product_stack), "assets": has_assets(product_stack)}
+                if not metadata["assets"]:
+                    shutil.copyfile(os.path.join(outdir, product_stack.template_file), f"{path}.tmp")
+                    os.replace(f"{path}.tmp", path)
+                with open(f"{metadata_path}.tmp", "w") as f:
+                    json.dump(metadata, f, indent=2)
+                os.replace(f"{metadata_path}.tmp", metadata_path)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
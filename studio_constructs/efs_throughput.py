@@ -0,0 +1,137 @@
+from constructs import Construct
+from aws_cdk import (
+    CfnCondition, CustomResource, Duration, Fn, Stack,
+    aws_cloudwatch as cloudwatch,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+)
+from studio_constructs.lambda_profile import runtime_profile, inline_source
+
+THROUGHPUT_MODES = ["bursting", "elastic", "provisioned"]
+# An hour of bursting at 100 MiB/s, time enough to switch the volume to elastic before apps slow down to the baseline
+BURST_CREDIT_ALARM_BYTES = 100 * 1024 * 1024 * 3600
+
+
+class HomeEfsThroughput(Construct):
+    def __init__(self, scope: Construct, id: str, file_system_id: str, throughput_mode: str, provisioned_mibps: str):
+        super().__init__(scope, id)
+        stack = Stack.of(self)
+        file_system_arn = f"arn:{stack.partition}:elasticfilesystem:{stack.region}:{stack.account}:file-system/{file_system_id}"
+
+        # ==================================================
+        # ================ CUSTOM RESOURCE =================
+        # ==================================================
+        # SageMaker creates the home EFS volume of the domain, its throughput is not available via CloudFormation
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "HomeEfsThroughputPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["elasticfilesystem:DescribeFileSystems", "elasticfilesystem:UpdateFileSystem"],
+                        resources=[file_system_arn],
+                    ),
+                ])
+            },
+        )
+
+        self.function = lambda_.Function(
+            self,
+            "HomeEfsThroughputFunction",
+            description="Sets the throughput mode of the SageMaker Studio home EFS volume",
+            **runtime_profile(),
+            code=lambda_.Code.from_inline(inline_source('lambda_images/efs_throughput/efs_throughput.py')),
+            handler="index.lambda_handler",
+            timeout=Duration.minutes(5),
+            role=self.role,
+        )
+
+        self.throughput = CustomResource(
+            self,
+            "HomeEfsThroughputMode",
+            service_token=self.function.function_arn,
+            properties={
+                "FileSystemId": file_system_id,
+                "ThroughputMode": throughput_mode,
+                "ProvisionedThroughputInMibps": provisioned_mibps,
+            },
+        )
+
+        # ==================================================
+        # =================== DASHBOARD ====================
+        # ==================================================
+        def metric(metric_name: str, statistic: str) -> cloudwatch.Metric:
+            return cloudwatch.Metric(
+                namespace="AWS/EFS",
+                metric_name=metric_name,
+                dimensions_map={"FileSystemId": file_system_id},
+                statistic=statistic,
+                period=Duration.minutes(1),
+            )
+
+        self.burst_credits = metric("BurstCreditBalance", "Minimum")
+        self.dashboard = cloudwatch.Dashboard(
+            self,
+            "HomeEfsDashboard",
+            widgets=[[
+                cloudwatch.GraphWidget(
+                    title="Burst credit balance (bytes)",
+                    left=[self.burst_credits],
+                    left_annotations=[cloudwatch.HorizontalAnnotation(value=BURST_CREDIT_ALARM_BYTES, label="Alarm")],
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title="Throughput (MiB/s)",
+                    left=[
+                        cloudwatch.MathExpression(
+                            expression="total / 1048576 / PERIOD(total)",
+                            using_metrics={"total": metric("TotalIOBytes", "Sum")},
+                            label="Total",
+                            period=Duration.minutes(1),
+                        ),
+                        cloudwatch.MathExpression(
+                            expression="metered / 1048576 / PERIOD(metered)",
+                            using_metrics={"metered": metric("MeteredIOBytes", "Sum")},
+                            label="Metered",
+                            period=Duration.minutes(1),
+                        ),
+                        cloudwatch.MathExpression(
+                            expression="permitted / 1048576",
+                            using_metrics={"permitted": metric("PermittedThroughput", "Average")},
+                            label="Permitted",
+                            period=Duration.minutes(1),
+                        ),
+                    ],
+                    width=12,
+                ),
+            ], [
+                cloudwatch.GraphWidget(title="Client connections", left=[metric("ClientConnections", "Sum")], width=12),
+                cloudwatch.GraphWidget(title="I/O limit (%)", left=[metric("PercentIOLimit", "Maximum")], width=12),
+            ]],
+        )
+
+        # ==================================================
+        # ==================== ALARMS ======================
+        # ==================================================
+        # Burst credits only limit the bursting mode, fires while an hour of bursting is left
+        self.bursting = CfnCondition(
+            self,
+            "BurstingThroughput",
+            expression=Fn.condition_equals(throughput_mode, "bursting"),
+        )
+        self.alarm = cloudwatch.Alarm(
+            self,
+            "LowBurstCreditAlarm",
+            alarm_description="Burst credits of the SageMaker Studio home EFS volume are running low, Canvas apps will soon slow down to the baseline throughput",
+            metric=self.burst_credits.with_(period=Duration.minutes(5)),
+            threshold=BURST_CREDIT_ALARM_BYTES,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.MISSING,
+        )
+        self.alarm.node.default_child.cfn_options.condition = self.bursting
@@ -8,7 +8,7 @@ import os
 
 
 class IAMRole(Construct):
-    def __init__(self, scope: Construct, id: str):
+    def __init__(self, scope: Construct, id: str, parameter_name: str = "/studio/user_role"):
         super().__init__(scope, id)
 
         # Get Region and Account ID from stack
@@ -153,6 +153,7 @@ class IAMRole(Construct):
         ssm.StringParameter(
             self,
             "StudioUserRole",
-            parameter_name="/studio/user_role",
+            parameter_name=parameter_name,
             string_value=self.role.role_arn,
+            simple_name=False,
         )
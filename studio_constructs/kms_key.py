@@ -1,9 +1,36 @@
+import math
 from constructs import Construct
 from aws_cdk import (
     aws_kms as kms, aws_iam as iam,
     Stack
 )
 
+# standard: one KMS request per object operation, reduced-requests: S3 Bucket Keys
+ENCRYPTION_PROFILES = ["standard", "reduced-requests"]
+
+MULTIPART_CHUNK_MB = 8
+
+
+def estimate_kms_requests_per_gb(
+    profile: str, object_size_mb: float = 8, reads_per_write: float = 1, principals: int = 1, gb_per_key_period: float = 1
+) -> float:
+    # KMS requests per GB written, with reads_per_write GB read back for every GB written
+    objects_per_gb = 1024 / object_size_mb
+    # A write is one GenerateDataKey, plus one Decrypt per part for multipart uploads
+    parts = math.ceil(object_size_mb / MULTIPART_CHUNK_MB) if object_size_mb > MULTIPART_CHUNK_MB else 0
+    writes = objects_per_gb * (1 + parts)
+    # A read is one Decrypt
+    reads = objects_per_gb * reads_per_write
+    standard = writes + reads
+    if profile != "reduced-requests":
+        return round(standard, 1)
+    # S3 gets a bucket-level key from KMS for a limited period and caches it per requesting principal. The
+    # gb_per_key_period written to the bucket within a period is spread over the principals, each of them makes a
+    # GenerateDataKey per period it writes in and a Decrypt per period it reads in, reads spanning reads_per_write
+    # times as many periods. Principals moving fewer objects than that within a period fall back to per-object requests.
+    bucket_key = principals * (1 + reads_per_write) / gb_per_key_period
+    return round(min(bucket_key, standard), 1)
+
 
 class KMSKey(Construct):
     def __init__(self, scope: Construct, id: str, role_arn: str):
@@ -50,3 +77,4 @@ class KMSKey(Construct):
             description="key used to encrypt the SageMaker Studio EFS volume",
             policy=self.custom_policy,
         )
+
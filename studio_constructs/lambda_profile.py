@@ -0,0 +1,41 @@
+from aws_cdk import (
+    aws_lambda as lambda_,
+)
+
+# The portfolio's functions run rarely, so most invocations are cold starts
+RUNTIME = lambda_.Runtime.PYTHON_3_12
+ARCHITECTURE = lambda_.Architecture.ARM_64
+# 128 MB gets a small share of a vCPU, which makes importing boto3 and loading its service models several times slower
+MIN_MEMORY_SIZE = 256
+# Client helper shared by the handlers, inline functions are a single index.py so it is pasted into each of them
+CLIENTS_MODULE = "lambda_images/common/clients.py"
+CLIENTS_IMPORT = "from clients import client\n"
+
+
+def runtime_profile(memory_size: int = MIN_MEMORY_SIZE) -> dict:
+    return {
+        "runtime": RUNTIME,
+        "architecture": ARCHITECTURE,
+        "memory_size": max(memory_size, MIN_MEMORY_SIZE),
+    }
+
+
+def inline_source(path: str) -> str:
+    with open(path) as f:
+        source = f.read()
+    if CLIENTS_IMPORT in source:
+        with open(CLIENTS_MODULE) as f:
+            source = source.replace(CLIENTS_IMPORT, f.read(), 1)
+    return source
+
+
+def invocation_target(function: lambda_.Function) -> lambda_.IFunction:
+    # With canvas:lambda_snap_start, published versions resume from a snapshot taken after the init phase.
+    # Only versions are snapshotted, so rules and custom resources invoke the live alias instead of $LATEST.
+    if str(function.node.try_get_context("canvas:lambda_snap_start")).lower() != "true":
+        return function
+    alias = function.node.try_find_child("LiveAlias")
+    if alias is None:
+        function.node.default_child.add_property_override("SnapStart", {"ApplyOn": "PublishedVersions"})
+        alias = lambda_.Alias(function, "LiveAlias", alias_name="live", version=function.current_version)
+    return alias
@@ -0,0 +1,68 @@
+from constructs import Construct
+from aws_cdk import (
+    CfnCondition, CfnParameter, Fn,
+    aws_ssm as ssm,
+)
+
+# The default name keeps the SSM paths and resource names of a single domain or network per account and region
+DEFAULT_NAME = "default"
+# Short enough for the Canvas bucket name, sagemaker-<region>-<account>-<name>, to stay within 63 characters
+NAME_PATTERN = r"^[a-z0-9]([a-z0-9-]{0,18}[a-z0-9])?$"
+
+
+class StudioName:
+    # Name a domain or a network is published under in SSM, e.g. /studio/domain_id or /studio/<name>/domain_id
+    def __init__(self, scope: Construct, id: str, prefix: str, description: str):
+        self.scope = scope
+        self.prefix = prefix
+        self.param = CfnParameter(
+            scope,
+            id,
+            type="String",
+            description=description,
+            default=DEFAULT_NAME,
+            allowed_pattern=NAME_PATTERN,
+            constraint_description="Must be 1 to 20 lower case letters, digits or hyphens.",
+        )
+        self.name = self.param.value_as_string
+        self.is_default = CfnCondition(scope, f"{id}IsDefault", expression=Fn.condition_equals(self.name, DEFAULT_NAME))
+
+    def select(self, default: str, named: str) -> str:
+        return Fn.condition_if(self.is_default.logical_id, default, named).to_string()
+
+    @property
+    def suffix(self) -> str:
+        # Appended to account-wide resource names, empty for the default name
+        return self.select("", f"-{self.name}")
+
+    def path(self, key: str) -> str:
+        return self.select(f"{self.prefix}/{key}", f"{self.prefix}/{self.name}/{key}")
+
+    def publish(self, scope: Construct, id: str, key: str, value: str) -> ssm.StringParameter:
+        return ssm.StringParameter(scope, id, parameter_name=self.path(key), string_value=value, simple_name=False)
+
+    def value(self, key: str) -> str:
+        # The path depends on a parameter, so it is resolved as a dynamic reference rather than an SSM parameter type
+        id = f"{self.param.node.id}{''.join(part.capitalize() for part in key.split('_'))}"
+        parameter = self.scope.node.try_find_child(id) or ssm.StringParameter.from_string_parameter_attributes(
+            self.scope, id, parameter_name=self.path(key), simple_name=False, force_dynamic_reference=True
+        )
+        return parameter.string_value
+
+
+def domain_name(scope: Construct) -> StudioName:
+    return StudioName(
+        scope,
+        "DomainName",
+        prefix="/studio",
+        description="Name of the Studio domain, several domains can share an account and region under different names. default is the domain published under /studio/ in SSM.",
+    )
+
+
+def network_name(scope: Construct) -> StudioName:
+    return StudioName(
+        scope,
+        "NetworkName",
+        prefix="/studio/network",
+        description="Name of the shared network, several networks can share an account and region under different names. default is the network published under /studio/network/ in SSM.",
+    )
@@ -1,21 +1,157 @@
+import math
 import os
 from constructs import Construct
 from aws_cdk import (
-    Stack,
-    aws_ec2 as ec2
+    Annotations, Aws, CfnCondition, CfnParameter, Fn, Stack, Token,
+    aws_cloudformation as cloudformation,
+    aws_ec2 as ec2,
 )
+from studio_constructs.naming import StudioName
+from studio_constructs.subnet_ip_monitor import SubnetIpMonitor
+from typing import List
+
+# Interface endpoints that can be created in the VPC: key -> (construct id, service, profiles including it)
+INTERFACE_ENDPOINTS = {
+    "sagemaker-api": ("SMAPIEndpoint", ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_API, ["minimal", "data-sources", "genai", "full"]),
+    "sagemaker-runtime": ("SMRuntimeEndpoint", ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_RUNTIME, ["minimal", "data-sources", "genai", "full"]),
+    "sagemaker-studio": ("SMStudioeEndpoint", ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_STUDIO, ["minimal", "data-sources", "genai", "full"]),
+    "sagemaker-notebook": ("SMNotebookEndpoint", ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_NOTEBOOK, ["minimal", "data-sources", "genai", "full"]),
+    "sts": ("STSEndpoint", ec2.InterfaceVpcEndpointAwsService.STS, ["minimal", "data-sources", "genai", "full"]),
+    "logs": ("CWLogsEndpoint", ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS, ["minimal", "data-sources", "genai", "full"]),
+    "monitoring": ("CWEndpoint", ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH, ["minimal", "data-sources", "genai", "full"]),
+    "kms": ("KMSEndpoint", ec2.InterfaceVpcEndpointAwsService.KMS, ["minimal", "data-sources", "genai", "full"]),
+    "ecr": ("ECREndpoint", ec2.InterfaceVpcEndpointAwsService.ECR, ["full"]),
+    "ecr-docker": ("ECRDockerEndpoint", ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER, ["full"]),
+    "ec2": ("EC2Endpoint", ec2.InterfaceVpcEndpointAwsService.EC2, ["minimal", "data-sources", "genai", "full"]),
+    "application-autoscaling": ("ApplicationAutoScalingEndpoint", ec2.InterfaceVpcEndpointAwsService.APPLICATION_AUTOSCALING, ["minimal", "data-sources", "genai", "full"]),
+    "ssm": ("SSMEndpoint", ec2.InterfaceVpcEndpointAwsService.SSM, ["full"]),
+    "secretsmanager": ("SecretsEndpoint", ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER, ["data-sources", "full"]),
+    "athena": ("AthenaEndpoint", ec2.InterfaceVpcEndpointAwsService.ATHENA, ["data-sources", "full"]),
+    "redshift": ("RedshiftEndpoint", ec2.InterfaceVpcEndpointAwsService.REDSHIFT, ["data-sources", "full"]),
+    "redshift-data": ("RedshiftDataEndpoint", ec2.InterfaceVpcEndpointAwsService.REDSHIFT_DATA, ["data-sources", "full"]),
+    "glue": ("GlueEndpoint", ec2.InterfaceVpcEndpointAwsService.GLUE, ["data-sources", "full"]),
+    "rds": ("RDSEndpoint", ec2.InterfaceVpcEndpointAwsService.RDS, ["data-sources", "full"]),
+    "comprehend": ("ComprehendEndpoint", ec2.InterfaceVpcEndpointAwsService.COMPREHEND, ["genai", "full"]),
+    "rekognition": ("RekognitionEndpoint", ec2.InterfaceVpcEndpointAwsService.REKOGNITION, ["genai", "full"]),
+    "textract": ("TextractEndpoint", ec2.InterfaceVpcEndpointAwsService.TEXTRACT, ["genai", "full"]),
+    "bedrock": ("BedrockEndpoint", ec2.InterfaceVpcEndpointAwsService.BEDROCK, ["genai", "full"]),
+    "bedrock-runtime": ("BedrockRuntimeEndpoint", ec2.InterfaceVpcEndpointAwsService.BEDROCK_RUNTIME, ["genai", "full"]),
+    "kendra": ("KendraEndpoint", ec2.InterfaceVpcEndpointAwsService.KENDRA, ["genai", "full"]),
+}
+ENDPOINT_PROFILES = ["minimal", "data-sources", "genai", "full"]
+# Fn::Or takes at most 10 conditions, one per item of the custom list
+MAX_CUSTOM_ENDPOINTS = 10
+
+# Canvas data paths and the endpoint serving them, None when the traffic can only leave through NAT
+CANVAS_DATA_PATHS = {
+    "S3 datasets and artifacts": "s3",
+    "Athena imports": "athena",
+    "Redshift imports": "redshift-data",
+    "Glue Data Catalog": "glue",
+    "Data source credentials (Secrets Manager)": "secretsmanager",
+    "Bedrock and foundation models": "bedrock-runtime",
+    "Kendra document querying": "kendra",
+    "Ready-to-use models (Textract, Rekognition, Comprehend)": "textract",
+    "Snowflake imports": None,
+    "Salesforce Data Cloud imports": None,
+    "Databricks and other JDBC sources": None,
+    "Package and container pulls from the internet": None,
+}
+EGRESS_MODES = ["single-nat", "per-az-nat"]
+
+# Each Canvas app attaches one ENI to the domain subnets, sized with headroom for app restarts
+ENIS_PER_APP = 1
+SUBNET_HEADROOM = 1.5
+# AWS reserves 5 IP addresses in every subnet
+RESERVED_IPS = 5
+
+# us-east-1 list prices of an interface endpoint, per AZ
+ENDPOINT_HOURLY_COST = 0.01
+NAT_GATEWAY_HOURLY_COST = 0.045
+HOURS_PER_MONTH = 730
+
+
+def private_subnet_mask(expected_concurrent_apps: int, az_count: int) -> int:
+    # Every interface endpoint also takes one IP per subnet, count them all since the profile is a deploy-time choice
+    needed = (
+        math.ceil(expected_concurrent_apps / az_count) * ENIS_PER_APP * SUBNET_HEADROOM
+        + len(INTERFACE_ENDPOINTS)
+        + RESERVED_IPS
+    )
+    # Never smaller than the original /24, never larger than what three AZs can fit in the /16
+    return min(24, max(18, 32 - math.ceil(math.log2(needed))))
+
+
+def endpoint_parameters(scope: Construct):
+    endpoint_profile_param = CfnParameter(
+        scope,
+        "VpcEndpointProfile",
+        type="String",
+        description="Set of VPC interface endpoints created for the domain: minimal (Canvas only), data-sources (adds Athena, Redshift, Glue, RDS), genai (adds Bedrock, Kendra and AI services) or full.",
+        allowed_values=ENDPOINT_PROFILES,
+        default="full",
+    )
+
+    custom_endpoints_param = CfnParameter(
+        scope,
+        "CustomVpcEndpoints",
+        type="CommaDelimitedList",
+        description=f"Up to {MAX_CUSTOM_ENDPOINTS} additional VPC interface endpoints created on top of the profile, among: {', '.join(INTERFACE_ENDPOINTS)}.",
+        default="",
+    )
+    return endpoint_profile_param, custom_endpoints_param
+
+
+def custom_endpoint_condition(custom_endpoints: List[str], key: str):
+    # Fn::Contains is only allowed in Rules, the list is matched item by item instead. It is padded with empty items
+    # so that Fn::Select stays within a list shorter than MAX_CUSTOM_ENDPOINTS.
+    padded = Fn.split(",", Fn.join("", [Fn.join(",", custom_endpoints), "," * MAX_CUSTOM_ENDPOINTS]))
+    return Fn.condition_or(*[
+        Fn.condition_equals(Fn.select(index, padded), key) for index in range(MAX_CUSTOM_ENDPOINTS)
+    ])
+
+
+def availability_zone_count(scope: Construct) -> int:
+    return min(3, len(Stack.of(scope).availability_zones))
+
+
+class SharedNetwork:
+    # Network published by the shared network product, looked up from SSM instead of being created
+    def __init__(self, scope: Construct, network: StudioName):
+        self.vpc_id = network.value("vpc_id")
+        # Dynamic references are resolved after Fn::Split, so each subnet is read from its own parameter
+        self.subnet_ids = [network.value(f"subnet_id_{index}") for index in range(availability_zone_count(scope))]
+        self.sg_id = network.value("security_group_id")
 
 
 class Networking(Construct):
-    def __init__(self, scope: Construct, id: str):
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        endpoint_profile: str = "full",
+        custom_endpoints: List[str] = None,
+        endpoint_batch_size: int = 5,
+        egress_mode: str = "single-nat",
+        expected_concurrent_apps: int = None,
+    ):
         super().__init__(scope, id)
 
+        if egress_mode not in EGRESS_MODES:
+            raise ValueError(f"Unknown egress mode {egress_mode}, expected one of {EGRESS_MODES}")
+
         # ==================================================
         # ===================== VPC ========================
         # ==================================================
         self.account_id = Stack.of(self).account
         self.aws_region = Stack.of(self).region
 
+        az_count = availability_zone_count(self)
+        private_mask = 24 if expected_concurrent_apps is None else private_subnet_mask(int(expected_concurrent_apps), az_count)
+        Annotations.of(self).add_info(
+            f"Private subnets sized /{private_mask}: {2 ** (32 - private_mask) - RESERVED_IPS} usable IPs in each of {az_count} AZs"
+        )
+
         self.vpc = ec2.Vpc(
             self,
             "DomainVPC",
@@ -25,7 +161,7 @@ class Networking(Construct):
                 ec2.SubnetConfiguration(
                     name="Private",
                     subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS,
-                    cidr_mask=24,
+                    cidr_mask=private_mask,
                 ),
                 ec2.SubnetConfiguration(
                     name="Public", subnet_type=ec2.SubnetType.PUBLIC, cidr_mask=26
@@ -33,105 +169,29 @@ class Networking(Construct):
             ],
             enable_dns_hostnames=True,
             enable_dns_support=True,
-            nat_gateways=1,
+            # With one NAT per AZ, each private subnet routes through the NAT of its own AZ
+            nat_gateways=1 if egress_mode == "single-nat" else None,
         )
 
         self.vpc.add_gateway_endpoint(
             "S3Endpoint", service=ec2.GatewayVpcEndpointAwsService.S3
         )
-        self.vpc.add_interface_endpoint(
-            "SMAPIEndpoint", service=ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_API
-        )
-        self.vpc.add_interface_endpoint(
-            "SMRuntimeEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_RUNTIME,
-        )
-        self.vpc.add_interface_endpoint(
-            "SMStudioeEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_STUDIO,
-        )
-        self.vpc.add_interface_endpoint(
-            "SMNotebookEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_NOTEBOOK,
-        )
-        self.vpc.add_interface_endpoint(
-            "STSEndpoint", service=ec2.InterfaceVpcEndpointAwsService.STS
-        )
-        self.vpc.add_interface_endpoint(
-            "CWLogsEndpoint", service=ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS
-        )
-        self.vpc.add_interface_endpoint(
-            "CWEndpoint", service=ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH
-        )
-        self.vpc.add_interface_endpoint(
-            "ECREndpoint", service=ec2.InterfaceVpcEndpointAwsService.ECR
-        )
-        self.vpc.add_interface_endpoint(
-            "ECRDockerEndpoint", service=ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER
-        )
-        self.vpc.add_interface_endpoint(
-            "KMSEndpoint", service=ec2.InterfaceVpcEndpointAwsService.KMS
-        )
-        self.vpc.add_interface_endpoint(
-            "EC2Endpoint", service=ec2.InterfaceVpcEndpointAwsService.EC2
-        )
-        self.vpc.add_interface_endpoint(
-            "ApplicationAutoScalingEndpoint", service=ec2.InterfaceVpcEndpointAwsService.APPLICATION_AUTOSCALING
-        )
-        self.vpc.add_interface_endpoint(
-            "AthenaEndpoint", service=ec2.InterfaceVpcEndpointAwsService.ATHENA
-        )
-        self.vpc.add_interface_endpoint(
-            "SSMEndpoint", service=ec2.InterfaceVpcEndpointAwsService.SSM
-        )
-        self.vpc.add_interface_endpoint(
-            "SecretsEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,
-        )
-        self.vpc.add_interface_endpoint(
-            "RedshiftEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.REDSHIFT
-        )
-        self.vpc.add_interface_endpoint(
-            "RedshiftDataEndpoint",
-            service=ec2.InterfaceVpcEndpointAwsService.REDSHIFT_DATA
-        )
-        self.vpc.add_interface_endpoint(
-            "GlueEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.GLUE
-        )
-        self.vpc.add_interface_endpoint(
-            "RDSEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.RDS
-        )
-        self.vpc.add_interface_endpoint(
-            "ComprehendEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.COMPREHEND
-        )
-        self.vpc.add_interface_endpoint(
-            "RekognitionEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.REKOGNITION
-        )
-        self.vpc.add_interface_endpoint(
-            "TextractEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.TEXTRACT
-        )
-        self.vpc.add_interface_endpoint(
-            "BedrockEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.BEDROCK
-        )
-        self.vpc.add_interface_endpoint(
-            "BedrockRuntimeEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.BEDROCK_RUNTIME
-        )
-        self.vpc.add_interface_endpoint(
-            "KendraEndpoint", 
-            service=ec2.InterfaceVpcEndpointAwsService.KENDRA
-        )
+        self.add_interface_endpoints(endpoint_profile, custom_endpoints or [], endpoint_batch_size)
+        self.egress_report = self.report_egress(egress_mode, endpoint_profile, custom_endpoints or [])
 
         self.vpc_id = self.vpc.vpc_id
         self.subnet_ids = [subnet.subnet_id for subnet in self.vpc.private_subnets]
 
+        # ==================================================
+        # ============== SUBNET IP MONITORING ==============
+        # ==================================================
+        self.ip_monitor = SubnetIpMonitor(
+            self,
+            "SubnetIpMonitor",
+            subnets=self.vpc.private_subnets,
+            alarm_threshold=max(16, (2 ** (32 - private_mask) - RESERVED_IPS) // 10),
+        )
+
         # ==================================================
         # ================ SECURITY GROUP ==================
         # ==================================================
@@ -147,3 +207,118 @@ class Networking(Construct):
         )
 
         self.sg_id = self.security_group.security_group_id
+
+    def publish(self, network: StudioName):
+        # ==================================================
+        # ================ SSM PARAMETERS ==================
+        # ==================================================
+        network.publish(self, "VpcID", "vpc_id", self.vpc_id)
+        network.publish(self, "SubnetIDs", "subnet_ids", Fn.join(",", self.subnet_ids))
+        for index, subnet_id in enumerate(self.subnet_ids):
+            network.publish(self, f"SubnetID{index}", f"subnet_id_{index}", subnet_id)
+        network.publish(self, "SecurityGroupID", "security_group_id", self.sg_id)
+
+    def add_interface_endpoints(self, endpoint_profile: str, custom_endpoints: List[str], batch_size: int):
+        # A profile known at synth time keeps the template small, a parameter token becomes a condition per endpoint
+        conditional = Token.is_unresolved(endpoint_profile) or Token.is_unresolved(custom_endpoints)
+        if not conditional and endpoint_profile not in ENDPOINT_PROFILES:
+            raise ValueError(f"Unknown endpoint profile {endpoint_profile}, expected one of {ENDPOINT_PROFILES}")
+
+        # All the endpoints share one security group instead of one each
+        self.endpoint_security_group = ec2.SecurityGroup(
+            self,
+            "EndpointSecurityGroup",
+            vpc=self.vpc,
+            description="Security Group for the VPC interface endpoints",
+        )
+
+        self.interface_endpoints = {}
+        # Endpoints are created in batches, each batch in parallel once the previous one is done,
+        # to stay below the ENI creation and EC2 API rate limits
+        previous_batch, current_batch, batch_index = [], [], 0
+        for key, (endpoint_id, service, profiles) in INTERFACE_ENDPOINTS.items():
+            if not conditional and endpoint_profile not in profiles and key not in custom_endpoints:
+                continue
+
+            endpoint = self.vpc.add_interface_endpoint(
+                endpoint_id, service=service, security_groups=[self.endpoint_security_group]
+            )
+            cfn_endpoint = endpoint.node.default_child
+            if conditional:
+                cfn_endpoint.cfn_options.condition = CfnCondition(
+                    self,
+                    f"{endpoint_id}Condition",
+                    expression=Fn.condition_or(
+                        *[Fn.condition_equals(endpoint_profile, profile) for profile in profiles],
+                        custom_endpoint_condition(custom_endpoints, key),
+                    ),
+                )
+
+            for dependency in previous_batch:
+                cfn_endpoint.add_dependency(dependency)
+            current_batch.append(cfn_endpoint)
+            if len(current_batch) == batch_size:
+                previous_batch, current_batch = self.endpoint_batch(batch_index, current_batch, conditional), []
+                batch_index += 1
+
+            self.interface_endpoints[key] = endpoint
+
+        self.endpoint_report = self.report_endpoints(endpoint_profile if not conditional else None, custom_endpoints)
+
+    def endpoint_batch(self, index: int, endpoints: List[ec2.CfnVPCEndpoint], conditional: bool) -> list:
+        # The resources the next batch depends on. A DependsOn on an endpoint whose condition is false fails the stack,
+        # conditional endpoints are waited for through an unconditional handle that only refers to the created ones.
+        if not conditional:
+            return endpoints
+        handle = cloudformation.CfnWaitConditionHandle(self, f"EndpointBatch{index}")
+        handle.add_metadata("Endpoints", [
+            Fn.condition_if(endpoint.cfn_options.condition.logical_id, endpoint.ref, Aws.NO_VALUE)
+            for endpoint in endpoints
+        ])
+        return [handle]
+
+    def report_endpoints(self, endpoint_profile: str, custom_endpoints: List[str]):
+        az_count = len(self.vpc.availability_zones)
+        profiles = [endpoint_profile] if endpoint_profile else ENDPOINT_PROFILES
+        report = {}
+        for profile in profiles:
+            endpoints = [
+                key for key, (_, _, endpoint_profiles) in INTERFACE_ENDPOINTS.items()
+                if profile in endpoint_profiles or (not Token.is_unresolved(custom_endpoints) and key in custom_endpoints)
+            ]
+            report[profile] = {
+                "endpoints": len(endpoints),
+                "enis": len(endpoints) * az_count,
+                "monthly_cost": round(len(endpoints) * az_count * ENDPOINT_HOURLY_COST * HOURS_PER_MONTH, 2),
+            }
+            Annotations.of(self).add_info(
+                f"VPC endpoint profile {profile}: {len(endpoints)} interface endpoints, "
+                f"{len(endpoints) * az_count} ENIs across {az_count} AZs, "
+                f"~${report[profile]['monthly_cost']}/month (plus data processing)"
+            )
+        return report
+
+    def report_egress(self, egress_mode: str, endpoint_profile: str, custom_endpoints: List[str]):
+        nat_count = 1 if egress_mode == "single-nat" else len(self.vpc.availability_zones)
+        Annotations.of(self).add_info(
+            f"Egress mode {egress_mode}: {nat_count} NAT gateways, "
+            f"~${round(nat_count * NAT_GATEWAY_HOURLY_COST * HOURS_PER_MONTH, 2)}/month (plus data processing)"
+        )
+
+        profiles = ENDPOINT_PROFILES if Token.is_unresolved(endpoint_profile) else [endpoint_profile]
+        report = {}
+        for profile in profiles:
+            report[profile] = {}
+            for path, key in CANVAS_DATA_PATHS.items():
+                via_endpoint = key == "s3" or (
+                    key is not None and (
+                        profile in INTERFACE_ENDPOINTS[key][2]
+                        or (not Token.is_unresolved(custom_endpoints) and key in custom_endpoints)
+                    )
+                )
+                report[profile][path] = "endpoint" if via_endpoint else "nat"
+            nat_paths = [path for path, route in report[profile].items() if route == "nat"]
+            Annotations.of(self).add_info(
+                f"VPC endpoint profile {profile}: data paths through NAT: {', '.join(nat_paths)}"
+            )
+        return report
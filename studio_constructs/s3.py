@@ -2,14 +2,21 @@ from constructs import Construct
 from aws_cdk import (
     aws_s3 as s3,
     aws_kms as kms,
+    aws_iam as iam,
+    Annotations, Aws, Duration, Stack,
 )
 import os
+from studio_constructs.kms_key import ENCRYPTION_PROFILES, estimate_kms_requests_per_gb
 
 
 class S3Bucket(Construct):
-    def __init__(self, scope: Construct, id: str, bucket_name: str, kms_key: kms.Key):
+    def __init__(self, scope: Construct, id: str, bucket_name: str, kms_key: kms.Key, encryption_profile: str = "standard"):
         super().__init__(scope, id)
 
+        if encryption_profile not in ENCRYPTION_PROFILES:
+            raise ValueError(f"Unknown encryption profile {encryption_profile}, expected one of {ENCRYPTION_PROFILES}")
+        self.encryption_profile = encryption_profile
+
         # ==================================================
         # ================== CORS BUCKET ===================
         # ==================================================
@@ -37,4 +44,43 @@ class S3Bucket(Construct):
             self, "Bucket", bucket_name=bucket_name, cors=[self.cors_rule],
             encryption=s3.BucketEncryption.KMS,
             encryption_key=kms_key,
-        )
\ No newline at end of file
+            # S3 derives object keys from a bucket-level key instead of calling KMS for every object
+            bucket_key_enabled=encryption_profile == "reduced-requests",
+        )
+
+        # Daily inventory of the bucket, streamed by the artifact cleanup instead of listing millions of keys
+        self.bucket.add_inventory(
+            inventory_id="CanvasArtifacts",
+            destination=s3.InventoryDestination(bucket=self.bucket, prefix="inventory"),
+            format=s3.InventoryFormat.CSV,
+            frequency=s3.InventoryFrequency.DAILY,
+            include_object_versions=s3.InventoryObjectVersion.CURRENT,
+        )
+        # CloudFormation rejects a bucket referring to its own Arn, the destination ARN is built from the name instead
+        self.bucket.node.default_child.add_property_override(
+            "InventoryConfigurations.0.Destination.BucketArn", f"arn:{Aws.PARTITION}:s3:::{bucket_name}"
+        )
+        self.bucket.add_lifecycle_rule(id="ExpireInventory", prefix="inventory/", expiration=Duration.days(7))
+        # S3 encrypts the inventory reports it delivers with the bucket key
+        kms_key.add_to_resource_policy(iam.PolicyStatement(
+            actions=["kms:GenerateDataKey"],
+            principals=[iam.ServicePrincipal("s3.amazonaws.com")],
+            resources=["*"],
+            conditions={"StringEquals": {"aws:SourceAccount": Stack.of(self).account}},
+        ))
+
+        self.report_kms_requests(
+            float(self.node.try_get_context("canvas:avg_object_size_mb") or 8),
+            int(self.node.try_get_context("canvas:expected_concurrent_apps") or 1),
+            float(self.node.try_get_context("canvas:gb_per_key_period") or 1),
+        )
+
+    def report_kms_requests(self, object_size_mb: float, principals: int, gb_per_key_period: float):
+        # Each Canvas user writes with its own role session, so every concurrent app is a principal of its own
+        for profile in ENCRYPTION_PROFILES:
+            selected = " (selected)" if profile == self.encryption_profile else ""
+            requests = estimate_kms_requests_per_gb(profile, object_size_mb, 1, principals, gb_per_key_period)
+            Annotations.of(self).add_info(
+                f"Encryption profile {profile}{selected}: ~{requests} KMS requests per GB written and read back "
+                f"with {object_size_mb} MB objects, {principals} principals and {gb_per_key_period} GB per bucket key period"
+            )
@@ -0,0 +1,95 @@
+from constructs import Construct
+from aws_cdk import (
+    Duration, Fn,
+    aws_cloudwatch as cloudwatch,
+    aws_ec2 as ec2,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+)
+from typing import List
+from studio_constructs.lambda_profile import runtime_profile, invocation_target, inline_source
+
+METRIC_NAMESPACE = "Canvas/Networking"
+
+
+class SubnetIpMonitor(Construct):
+    def __init__(self, scope: Construct, id: str, subnets: List[ec2.ISubnet], alarm_threshold: int):
+        super().__init__(scope, id)
+
+        # ==================================================
+        # ================ LAMBDA FUNCTION =================
+        # ==================================================
+        self.role = iam.Role(
+            self,
+            "LambdaRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole")
+            ],
+            inline_policies={
+                "SubnetIpMonitorPolicy": iam.PolicyDocument(statements=[
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["ec2:DescribeSubnets"],
+                        resources=["*"],
+                    ),
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        actions=["cloudwatch:PutMetricData"],
+                        resources=["*"],
+                        conditions={"StringEquals": {"cloudwatch:namespace": METRIC_NAMESPACE}},
+                    ),
+                ])
+            },
+        )
+
+        self.function = lambda_.Function(
+            self,
+            "SubnetIpMonitorFunction",
+            description="Publishes the free IP addresses of the SageMaker Studio subnets",
+            **runtime_profile(),
+            code=lambda_.Code.from_inline(inline_source('lambda_images/subnet_ip_monitor/subnet_ip_monitor.py')),
+            handler="index.lambda_handler",
+            timeout=Duration.seconds(30),
+            role=self.role,
+            environment={
+                "SUBNET_IDS": Fn.join(",", [subnet.subnet_id for subnet in subnets]),
+                "METRIC_NAMESPACE": METRIC_NAMESPACE,
+            },
+        )
+
+        # ==================================================
+        # ================== SCHEDULING ====================
+        # ==================================================
+        self.rule = events.Rule(
+            self,
+            "ScheduleRule",
+            schedule=events.Schedule.rate(Duration.minutes(5)),
+            targets=[targets.LambdaFunction(invocation_target(self.function))],
+        )
+
+        # ==================================================
+        # ==================== ALARMS ======================
+        # ==================================================
+        # Fires while apps can still start, before CreateApp fails on a full subnet
+        self.alarms = [
+            cloudwatch.Alarm(
+                self,
+                f"LowFreeIpAlarm{index}",
+                alarm_description="Free IP addresses of a SageMaker Studio subnet are running low, new Canvas apps will soon fail to start",
+                metric=cloudwatch.Metric(
+                    namespace=METRIC_NAMESPACE,
+                    metric_name="AvailableIpAddressCount",
+                    dimensions_map={"SubnetId": subnet.subnet_id},
+                    statistic="Minimum",
+                    period=Duration.minutes(5),
+                ),
+                threshold=alarm_threshold,
+                evaluation_periods=1,
+                comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_OR_EQUAL_TO_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.MISSING,
+            )
+            for index, subnet in enumerate(subnets)
+        ]
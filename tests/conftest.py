@@ -0,0 +1,22 @@
+import sys
+import types
+
+import pytest
+
+from studio_constructs.lambda_profile import inline_source
+
+
+@pytest.fixture
+def load_lambda(monkeypatch):
+    # Lambda handlers are deployed inline as index.py, they are loaded from the same source the function gets
+    def load(path: str):
+        # cfnresponse is provided by the Lambda runtime to inline functions only
+        stand_in = types.ModuleType("cfnresponse")
+        stand_in.SUCCESS, stand_in.FAILED = "SUCCESS", "FAILED"
+        stand_in.send = lambda *args, **kwargs: None
+        monkeypatch.setitem(sys.modules, "cfnresponse", stand_in)
+        module = types.ModuleType("index")
+        module.__file__ = path
+        exec(compile(inline_source(path), path, "exec"), module.__dict__)
+        return module
+    return load
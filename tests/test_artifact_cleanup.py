@@ -0,0 +1,89 @@
+import csv
+import gzip
+import hashlib
+import json
+
+import pytest
+
+BUCKET = "sagemaker-eu-west-1-123456789012"
+
+
+@pytest.fixture
+def artifact_cleanup(load_lambda):
+    return load_lambda("lambda_images/artifact_cleanup/artifact_cleanup.py")
+
+
+def workspace(user):
+    return f"{hashlib.sha256(user.encode()).hexdigest()[:4]}/{user}/"
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    # Objects of two users and an unrelated folder, with the inventory report listing them
+    keys = [f"Canvas/alice/model-{i}.json" for i in range(5)]
+    keys += [f"Canvas/bob/model-{i}.json" for i in range(7)]
+    keys += [f"{workspace('carol')}data-{i}.csv" for i in range(3)]
+    keys += ["abcd/carol/unrelated.csv", "datasets/sales.csv"]
+    for key in keys:
+        (tmp_path / key).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / key).write_text("")
+
+    report = tmp_path / "inventory" / BUCKET / "daily" / "data" / "report.csv.gz"
+    report.parent.mkdir(parents=True)
+    with gzip.open(report, "wt", newline="") as f:
+        csv.writer(f).writerows([BUCKET, key.replace("/", "%2F")] for key in keys)
+    manifest = tmp_path / "inventory" / BUCKET / "daily" / "2026-10-18T01-00Z" / "manifest.json"
+    manifest.parent.mkdir(parents=True)
+    manifest.write_text(json.dumps({
+        "fileFormat": "CSV",
+        "fileSchema": "Bucket, Key",
+        "files": [{"key": f"inventory/{BUCKET}/daily/data/report.csv.gz"}],
+    }))
+    return tmp_path
+
+
+class RecordingStore:
+    def __init__(self, store):
+        self.store = store
+        self.batches = []
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def delete(self, keys):
+        self.batches.append(list(keys))
+        return self.store.delete(keys)
+
+
+def test_latest_manifest(artifact_cleanup, bucket):
+    store = artifact_cleanup.LocalStore(str(bucket))
+    assert artifact_cleanup.latest_manifest(store, BUCKET) == f"inventory/{BUCKET}/daily/2026-10-18T01-00Z/manifest.json"
+
+
+def test_orphaned_keys_are_deleted_in_batches(artifact_cleanup, bucket, monkeypatch):
+    monkeypatch.setattr(artifact_cleanup, "DELETE_BATCH_SIZE", 4)
+    store = RecordingStore(artifact_cleanup.LocalStore(str(bucket)))
+    manifest = artifact_cleanup.latest_manifest(store, BUCKET)
+
+    report = artifact_cleanup.cleanup(store, manifest, {"alice"}, dry_run=False, max_workers=2)
+
+    assert report["scanned"] == 17
+    assert report["orphaned"] == {"Canvas/bob/": 7, workspace("carol"): 3}
+    assert report["deleted"] == 10 and report["failed"] == []
+    assert sorted(len(batch) for batch in store.batches) == [2, 4, 4]
+    assert not any((bucket / "Canvas" / "bob").iterdir())
+    assert (bucket / "Canvas" / "alice" / "model-0.json").exists()
+    assert (bucket / "abcd" / "carol" / "unrelated.csv").exists()
+
+
+def test_dry_run_deletes_nothing(artifact_cleanup, bucket):
+    store = RecordingStore(artifact_cleanup.LocalStore(str(bucket)))
+    report = artifact_cleanup.cleanup(store, artifact_cleanup.latest_manifest(store, BUCKET), {"alice"})
+    assert report["deleted"] == 0 and sum(report["orphaned"].values()) == 10
+    assert store.batches == []
+
+
+def test_no_active_user_refuses_to_clean(artifact_cleanup, bucket):
+    store = artifact_cleanup.LocalStore(str(bucket))
+    with pytest.raises(RuntimeError):
+        artifact_cleanup.cleanup(store, artifact_cleanup.latest_manifest(store, BUCKET), set(), dry_run=False)
@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+
+
+@pytest.fixture
+def auto_shutdown(load_lambda):
+    return load_lambda("lambda_images/auto_shutdown/auto_shutdown.py")
+
+
+def test_shard_of_is_stable_and_in_range(auto_shutdown):
+    assert auto_shutdown.shard_of("canvas-user-1", 4) == auto_shutdown.shard_of("canvas-user-1", 4)
+    assert all(0 <= auto_shutdown.shard_of(f"canvas-user-{index}", 7) < 7 for index in range(100))
+    assert auto_shutdown.shard_of("anyone", 1) == 0
+
+
+def test_shard_of_spreads_names_sharing_a_prefix(auto_shutdown):
+    counts = [0] * 4
+    for index in range(4000):
+        counts[auto_shutdown.shard_of(f"canvas-user-{index}", 4)] += 1
+    assert min(counts) > 900
+
+
+class FakePaginated:
+    def __init__(self, pages):
+        self.pages, self.calls = pages, []
+
+    def get_paginator(self, operation):
+        fake = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                fake.calls.append((operation, kwargs))
+                return fake.pages[operation]
+        return Paginator()
+
+
+def test_running_jobs_index_joins_the_tagging_sweep(auto_shutdown):
+    owner = "arn:aws:sagemaker:us-east-1:123456789012:user-profile/d-abc/Alice"
+    tagging = FakePaginated({"get_resources": [{"ResourceTagMappingList": [
+        {"ResourceARN": "arn:aws:sagemaker:us-east-1:123456789012:training-job/canvas-1",
+         "Tags": [{"Key": "sagemaker:user-profile-arn", "Value": owner}]},
+        {"ResourceARN": "arn:aws:sagemaker:us-east-1:123456789012:automl-job/canvas-done",
+         "Tags": [{"Key": "sagemaker:user-profile-arn", "Value": owner}]},
+    ]}]})
+    sagemaker = FakePaginated({
+        "list_auto_ml_jobs": [{"AutoMLJobSummaries": []}],
+        "list_training_jobs": [{"TrainingJobSummaries": [
+            {"TrainingJobArn": "arn:aws:sagemaker:us-east-1:123456789012:training-job/Canvas-1"},
+            {"TrainingJobArn": "arn:aws:sagemaker:us-east-1:123456789012:training-job/untagged"},
+        ]}],
+        "list_processing_jobs": [{"ProcessingJobSummaries": []}],
+    })
+
+    index = auto_shutdown.running_jobs_index(sagemaker, tagging)
+
+    assert index == {("d-abc", "alice"): ["arn:aws:sagemaker:us-east-1:123456789012:training-job/Canvas-1"]}
+    assert tagging.calls == [("get_resources", {
+        "ResourceTypeFilters": ["sagemaker:automl-job", "sagemaker:training-job", "sagemaker:processing-job"],
+        "TagFilters": [{"Key": "sagemaker:user-profile-arn"}],
+    })]
+    assert all(kwargs == {"StatusEquals": "InProgress"} for operation, kwargs in sagemaker.calls)
+
+
+def test_running_canvas_users_keeps_the_shard_apps_in_service(auto_shutdown):
+    apps = [
+        {"UserProfileName": f"user-{index}", "AppType": app_type, "Status": status}
+        for index in range(20)
+        for app_type, status in [("Canvas", "InService"), ("Canvas", "Deleted"), ("JupyterServer", "InService")]
+    ]
+    sagemaker = FakePaginated({"list_apps": [{"Apps": apps[:30]}, {"Apps": apps[30:]}]})
+    shards = [auto_shutdown.running_canvas_users(sagemaker, "d-abc", shard, 3) for shard in range(3)]
+    assert sorted(user for shard in shards for user in shard) == sorted(f"user-{index}" for index in range(20))
+    assert all(auto_shutdown.shard_of(user, 3) == shard for shard, users in enumerate(shards) for user in users)
+    assert sagemaker.calls[0] == ("list_apps", {"DomainIdEquals": "d-abc"})
+
+
+class FakeCloudWatch:
+    def __init__(self, values):
+        self.values, self.calls = values, []
+
+    def get_paginator(self, operation):
+        fake = self
+
+        class Paginator:
+            def paginate(self, MetricDataQueries, **kwargs):
+                fake.calls.append(len(MetricDataQueries))
+                results = [
+                    {"Id": query["Id"], "Values": fake.values.get(
+                        next(d["Value"] for d in query["MetricStat"]["Metric"]["Dimensions"] if d["Name"] == "UserProfileName"), [])}
+                    for query in MetricDataQueries
+                ]
+                # The second page holds older datapoints of the same queries
+                return [{"MetricDataResults": results}, {"MetricDataResults": [
+                    {"Id": result["Id"], "Values": [0.0]} for result in results
+                ]}]
+        return Paginator()
+
+
+def test_time_since_last_active_batches_every_user(auto_shutdown):
+    users = [f"user-{index}" for index in range(1200)]
+    cloudwatch = FakeCloudWatch({"user-3": [9000.0, 8000.0], "user-1100": [60.0]})
+    latest = auto_shutdown.time_since_last_active(cloudwatch, "d-abc", users, 1200, datetime.datetime.now(datetime.timezone.utc))
+    assert cloudwatch.calls == [500, 500, 200]
+    assert latest["user-3"] == 9000.0
+    assert latest["user-1100"] == 60.0
+    assert latest["user-0"] == 0.0
+    assert len(latest) == 1200
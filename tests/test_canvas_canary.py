@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+
+class FakeSageMaker:
+    def __init__(self, start_status):
+        self.start_status = start_status
+        self.status = "Deleted"
+        self.calls = []
+
+    def describe_app(self, **app_id):
+        return {"Status": self.status}
+
+    def describe_domain(self, DomainId):
+        return {"SubnetIds": ["subnet-1", "subnet-2"]}
+
+    def create_app(self, **app_id):
+        self.calls.append("create_app")
+        self.status = self.start_status
+
+    def delete_app(self, **app_id):
+        self.calls.append("delete_app")
+        self.status = "Deleted"
+
+
+class FakeEc2:
+    def __init__(self, network_interfaces):
+        self.network_interfaces = list(network_interfaces)
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Filters):
+        return [{"NetworkInterfaces": self.network_interfaces.pop(0)}]
+
+
+def eni(eni_id, az, description="[DO NOT DELETE] ENI managed by SageMaker for Studio Domain(d-1)"):
+    return {"NetworkInterfaceId": eni_id, "AvailabilityZone": az, "Description": description}
+
+
+@pytest.fixture
+def canary(load_lambda, monkeypatch):
+    module = load_lambda("lambda_images/canvas_canary/canvas_canary.py")
+    monkeypatch.setattr(module, "POLL_INTERVAL", 0)
+    return module
+
+
+def result(status="succeeded", az="eu-west-1a", **phases):
+    return {"domain_id": "d-1", "user": "probe", "az": az, "phases": phases, "status": status}
+
+
+def test_metric_data_publishes_each_phase_per_domain_and_per_az(canary):
+    data = canary.metric_data(result(CreateAppCall=1.5, TimeToInService=300.0))
+    by_domain = [{"Name": "DomainId", "Value": "d-1"}]
+    by_az = by_domain + [{"Name": "AvailabilityZone", "Value": "eu-west-1a"}]
+    assert data == [
+        {"MetricName": "CreateAppCall", "Dimensions": by_domain, "Values": [1.5], "Counts": [1], "Unit": "Seconds"},
+        {"MetricName": "TimeToInService", "Dimensions": by_domain, "Values": [300.0], "Counts": [1], "Unit": "Seconds"},
+        {"MetricName": "StartFailures", "Dimensions": by_domain, "Value": 0, "Unit": "Count"},
+        {"MetricName": "CreateAppCall", "Dimensions": by_az, "Values": [1.5], "Counts": [1], "Unit": "Seconds"},
+        {"MetricName": "TimeToInService", "Dimensions": by_az, "Values": [300.0], "Counts": [1], "Unit": "Seconds"},
+        {"MetricName": "StartFailures", "Dimensions": by_az, "Value": 0, "Unit": "Count"},
+    ]
+
+
+def test_metric_data_counts_failed_starts(canary):
+    data = canary.metric_data(result(status="failed", az="unknown"))
+    assert [(d["MetricName"], d["Value"], d["Dimensions"][-1]["Value"]) for d in data] == [
+        ("StartFailures", 1, "d-1"), ("StartFailures", 1, "unknown"),
+    ]
+
+
+def test_app_zone_is_the_az_of_the_new_interfaces_of_the_domain(canary):
+    before = {"eni-1": ("eu-west-1b", "Domain(d-1)")}
+    after = {**before, "eni-2": ("eu-west-1a", "Domain(d-1)"), "eni-3": ("eu-west-1c", "Domain(d-2)")}
+    assert canary.app_zone("d-1", before, after) == "eu-west-1a"
+
+
+def test_app_zone_is_unknown_when_the_new_interfaces_span_several_azs(canary):
+    after = {"eni-1": ("eu-west-1a", "Domain(d-1)"), "eni-2": ("eu-west-1b", "Domain(d-1)")}
+    assert canary.app_zone("d-1", {}, after) == "unknown"
+    assert canary.app_zone("d-1", after, after) == "unknown"
+
+
+def test_probe_measures_the_start_and_deletes_the_app(canary, monkeypatch):
+    sagemaker = FakeSageMaker("InService")
+    ec2 = FakeEc2([[], [eni("eni-1", "eu-west-1a")]])
+    monkeypatch.setattr(canary, "client", {"sagemaker": sagemaker, "ec2": ec2}.get)
+    report = asyncio.run(canary.probe("d-1", "probe", 60))
+    assert report["status"] == "succeeded"
+    assert report["az"] == "eu-west-1a"
+    assert set(report["phases"]) == {"CreateAppCall", "TimeToInService", "TimeToDeleted"}
+    assert sagemaker.calls == ["create_app", "delete_app"]
+
+
+def test_probe_deletes_the_app_still_starting_and_publishes_the_timeout(canary, monkeypatch):
+    sagemaker = FakeSageMaker("Pending")
+    ec2 = FakeEc2([[], []])
+    monkeypatch.setattr(canary, "client", {"sagemaker": sagemaker, "ec2": ec2}.get)
+    monkeypatch.setattr(canary, "START_TIMEOUT", 0.05)
+    report = asyncio.run(canary.probe("d-1", "probe", 60))
+    assert report["status"] == "failed"
+    assert report["error"] == "the app is still starting"
+    assert report["phases"]["TimeToInService"] >= 0.05
+    assert sagemaker.calls == ["create_app", "delete_app"]
+
+
+def test_probe_deletes_the_app_when_polling_fails(canary, monkeypatch):
+    sagemaker = FakeSageMaker("Pending")
+    monkeypatch.setattr(canary, "client", {"sagemaker": sagemaker, "ec2": FakeEc2([[]])}.get)
+
+    async def wait_status(app_id, statuses, timeout):
+        if "InService" in statuses:
+            raise RuntimeError("throttled")
+        return "Deleted"
+    monkeypatch.setattr(canary, "wait_status", wait_status)
+    with pytest.raises(RuntimeError, match="throttled"):
+        asyncio.run(canary.probe("d-1", "probe", 60))
+    assert sagemaker.calls == ["create_app", "delete_app"]
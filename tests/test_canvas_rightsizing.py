@@ -0,0 +1,80 @@
+import argparse
+import importlib.util
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def rightsizing():
+    spec = importlib.util.spec_from_file_location("canvas_rightsizing", "tools/canvas_rightsizing.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeCloudWatch:
+    def __init__(self, series):
+        self.series = series
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, **kwargs):
+        if "MetricName" in kwargs:
+            yield {"Metrics": [
+                {"Namespace": kwargs["Namespace"], "MetricName": kwargs["MetricName"], "Dimensions": [
+                    {"Name": "DomainId", "Value": "d-1"}, {"Name": "UserProfileName", "Value": user},
+                ]}
+                for user in self.series.get(kwargs["MetricName"], {})
+            ]}
+        else:
+            yield {"MetricDataResults": [
+                {"Id": query["Id"], "Values": self.series[query["MetricStat"]["Metric"]["MetricName"]][
+                    query["MetricStat"]["Metric"]["Dimensions"][1]["Value"]
+                ]}
+                for query in kwargs["MetricDataQueries"]
+            ]}
+
+
+class FakeSageMaker:
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, **kwargs):
+        yield {"Apps": [
+            {"AppType": "Canvas", "UserProfileName": "alice", "ResourceSpec": {"InstanceType": "ml.m5.large"}},
+            {"AppType": "Canvas", "UserProfileName": "alice", "ResourceSpec": {"InstanceType": "ml.m5.2xlarge"}},
+            {"AppType": "JupyterServer", "UserProfileName": "bob", "ResourceSpec": {"InstanceType": "system"}},
+        ]}
+
+
+def test_percentile_interpolates(rightsizing):
+    assert rightsizing.percentile([], 95) is None
+    assert rightsizing.percentile([7], 95) == 7
+    assert rightsizing.percentile([4, 1, 3, 2], 50) == 2.5
+    assert rightsizing.percentile(list(range(101)), 95) == 95
+
+
+def test_recommend_keeps_usage_under_targets(rightsizing):
+    # 8 vCPUs at 20% and 32 GiB at 50% need 2.3 vCPUs and 20 GiB
+    assert rightsizing.recommend(20, 50, "ml.m5.2xlarge", 0.7, 0.8) == "ml.r5.xlarge"
+    assert rightsizing.recommend(100, 100, "ml.r5.8xlarge", 0.7, 0.8) == "ml.r5.8xlarge"
+    assert rightsizing.recommend(20, 50, "system", 0.7, 0.8) is None
+
+
+def test_recommendations_use_each_user_instance_type(rightsizing):
+    cloudwatch = FakeCloudWatch({
+        "TimeSinceLastActive": {"alice": [0, 600, 0], "bob": [0]},
+        "cpu": {"alice": [20.0] * 4, "bob": [20.0] * 4},
+        "memory": {"alice": [50.0] * 4, "bob": [50.0] * 4},
+    })
+    args = argparse.Namespace(
+        days=14, period=300, percentile=95, namespace="CWAgent", cpu_metric="cpu", memory_metric="memory",
+        current_instance_type=None, cpu_target=70, memory_target=80, min_datapoints=4,
+    )
+    results = {result["user"]: result for result in rightsizing.recommendations(cloudwatch, FakeSageMaker(), "d-1", args)}
+    assert results["alice"]["current"] == "ml.m5.2xlarge"
+    assert results["alice"]["recommended"] == "ml.r5.xlarge"
+    assert results["alice"]["active_hours"] == round(2 * 300 / 3600, 1)
+    # No Canvas app listed and no --current-instance-type
+    assert results["bob"]["current"] is None and results["bob"]["recommended"] is None
@@ -0,0 +1,65 @@
+import asyncio
+import importlib.util
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def rollout():
+    spec = importlib.util.spec_from_file_location("canvas_settings_rollout", "tools/canvas_settings_rollout.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeSageMaker:
+    def __init__(self, domains):
+        self.domains = domains
+
+    def describe_domain(self, DomainId):
+        if DomainId not in self.domains:
+            raise RuntimeError(f"AccessDeniedException on {DomainId}")
+        return {"Status": "InService", "DefaultUserSettings": self.domains[DomainId]}
+
+
+CANVAS = {"CanvasAppSettings": {"TimeSeriesForecastingSettings": {"Status": "ENABLED"}}}
+
+
+def test_diff_reports_the_desired_paths_that_differ(rollout):
+    current = {"CanvasAppSettings": {
+        "TimeSeriesForecastingSettings": {"Status": "DISABLED"},
+        "ModelRegisterSettings": {"Status": "ENABLED"},
+    }}
+    assert rollout.diff(current, CANVAS) == [{
+        "path": "CanvasAppSettings.TimeSeriesForecastingSettings.Status", "current": "DISABLED", "desired": "ENABLED",
+    }]
+    assert rollout.diff({}, CANVAS) == [{"path": "CanvasAppSettings", "current": None, "desired": CANVAS["CanvasAppSettings"]}]
+    assert rollout.diff(CANVAS, CANVAS) == []
+
+
+def test_merge_keeps_the_current_settings_the_document_leaves_out(rollout):
+    current = {"TimeSeriesForecastingSettings": {"Status": "DISABLED", "AmazonForecastRoleArn": "arn:role"},
+               "ModelRegisterSettings": {"Status": "ENABLED"}}
+    merged = rollout.merge(current, CANVAS["CanvasAppSettings"])
+    assert merged == {"TimeSeriesForecastingSettings": {"Status": "ENABLED", "AmazonForecastRoleArn": "arn:role"},
+                      "ModelRegisterSettings": {"Status": "ENABLED"}}
+    assert current["TimeSeriesForecastingSettings"]["Status"] == "DISABLED"
+    assert rollout.merge(current, ["replaced"]) == ["replaced"]
+
+
+def test_plan_target_reports_a_target_that_cannot_be_assumed(rollout, monkeypatch):
+    def sagemaker_client(target):
+        raise RuntimeError("AccessDenied on sts:AssumeRole")
+    monkeypatch.setattr(rollout, "sagemaker_client", sagemaker_client)
+    entry, = asyncio.run(rollout.plan_target({"name": "prod", "domains": ["d-1"]}, CANVAS))
+    assert (entry["target"], entry["domain_id"], entry["status"]) == ("prod", None, "failed")
+    assert entry["error"] == "AccessDenied on sts:AssumeRole"
+
+
+def test_plan_target_reports_the_domains_that_cannot_be_described(rollout, monkeypatch):
+    monkeypatch.setattr(rollout, "sagemaker_client", lambda target: FakeSageMaker({"d-1": {}, "d-2": CANVAS}))
+    report = asyncio.run(rollout.plan_target({"domains": ["d-1", "d-2", "d-3"]}, CANVAS))
+    assert [(entry["domain_id"], entry["status"]) for entry in report] == [
+        ("d-1", "planned"), ("d-2", "unchanged"), ("d-3", "failed"),
+    ]
+    assert report[2]["error"] == "AccessDeniedException on d-3"
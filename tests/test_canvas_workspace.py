@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.fixture
+def canvas_workspace(load_lambda):
+    return load_lambda("lambda_images/canvas_workspace/canvas_workspace.py")
+
+
+def test_merge_keeps_current_settings(canvas_workspace):
+    current = {
+        "TimeSeriesForecastingSettings": {"Status": "ENABLED"},
+        "WorkspaceSettings": {"S3ArtifactPath": "s3://shared/", "S3KmsKeyId": "key"},
+    }
+    merged = canvas_workspace.merge(current, {"WorkspaceSettings": {"S3ArtifactPath": "s3://bucket/ab12/alice/"}})
+    assert merged == {
+        "TimeSeriesForecastingSettings": {"Status": "ENABLED"},
+        "WorkspaceSettings": {"S3ArtifactPath": "s3://bucket/ab12/alice/", "S3KmsKeyId": "key"},
+    }
+    assert current["WorkspaceSettings"]["S3ArtifactPath"] == "s3://shared/"
+
+
+def test_workspace_prefix_is_stable_and_case_insensitive(canvas_workspace):
+    prefix = canvas_workspace.workspace_prefix("Alice")
+    assert prefix == canvas_workspace.workspace_prefix("alice")
+    assert len(prefix) == 4
+    int(prefix, 16)
+
+
+class FakeSageMaker:
+    def __init__(self, user_settings):
+        self.user_settings = user_settings
+
+    def describe_user_profile(self, DomainId, UserProfileName):
+        return {"UserSettings": self.user_settings}
+
+
+def test_canvas_settings_only_sends_the_workspace_settings(canvas_workspace, monkeypatch):
+    user_settings = {"CanvasAppSettings": {
+        "TimeSeriesForecastingSettings": {"Status": "DISABLED"},
+        "WorkspaceSettings": {"S3KmsKeyId": "key"},
+    }}
+    monkeypatch.setattr(canvas_workspace, "client", lambda service_name: FakeSageMaker(user_settings))
+    assert canvas_workspace.canvas_settings("d-1", "alice", "s3://bucket/ab12/alice/") == {
+        "WorkspaceSettings": {"S3ArtifactPath": "s3://bucket/ab12/alice/", "S3KmsKeyId": "key"},
+    }
+    monkeypatch.setattr(canvas_workspace, "client", lambda service_name: FakeSageMaker({}))
+    assert canvas_workspace.canvas_settings("d-1", "alice", "s3://bucket/ab12/alice/") == {
+        "WorkspaceSettings": {"S3ArtifactPath": "s3://bucket/ab12/alice/"},
+    }
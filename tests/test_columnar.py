@@ -0,0 +1,45 @@
+import json
+
+import pyarrow.dataset as ds
+import pytest
+
+
+@pytest.fixture
+def columnar(load_lambda):
+    return load_lambda("lambda_images/columnar/columnar.py")
+
+
+def register(root, dataset, csv):
+    (root / "datasets").mkdir()
+    (root / "datasets" / "sales.csv").write_text(csv)
+    (root / "columnar").mkdir()
+    (root / "columnar" / "registry.json").write_text(json.dumps({"datasets": [dataset]}))
+
+
+def test_late_values_widen_the_column(columnar, tmp_path, monkeypatch):
+    # One row per block, the first blocks infer an integer column and a null column
+    monkeypatch.setattr(columnar, "BLOCK_SIZE", 32)
+    rows = [f"{i},,eu" for i in range(20)] + ["abc,2.5,us"]
+    register(tmp_path, {"name": "sales", "source": "datasets/sales.csv", "partition_by": ["region"]},
+             "store,amount,region\n" + "\n".join(rows) + "\n")
+
+    assert columnar.materialize_registry(str(tmp_path)) == {"sales": "materialized"}
+    table = ds.dataset(tmp_path / "columnar" / "sales", format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 21
+    assert str(table.schema.field("store").type) == "string"
+    assert columnar.materialize_registry(str(tmp_path)) == {"sales": "skipped"}
+
+
+def test_column_types_pin_the_schema(columnar, tmp_path):
+    register(tmp_path, {"name": "sales", "source": "datasets/sales.csv", "column_types": {"store": "string"}},
+             "store,amount\n1,2\n")
+    columnar.materialize_registry(str(tmp_path))
+    table = ds.dataset(tmp_path / "columnar" / "sales", format="parquet").to_table()
+    assert str(table.schema.field("store").type) == "string"
+    assert str(table.schema.field("amount").type) == "int64"
+
+
+def test_rows_per_group_follow_the_row_size(columnar):
+    assert columnar.rows_per_group(1) == columnar.MAX_ROWS_PER_GROUP
+    assert columnar.rows_per_group(1024) == columnar.ROW_GROUP_SIZE // 1024
+    assert columnar.rows_per_group(10 ** 9) == columnar.MIN_ROWS_PER_GROUP
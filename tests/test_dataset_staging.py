@@ -0,0 +1,59 @@
+import pytest
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def head_object(self, Bucket, Key, ChecksumMode=None, PartNumber=None):
+        head = dict(self.objects[(Bucket, Key)])
+        if PartNumber:
+            head["ContentLength"] = head.pop("PartSize")
+        return head
+
+
+@pytest.fixture
+def staging(load_lambda, monkeypatch):
+    module = load_lambda("lambda_images/dataset_staging/staging.py")
+    module.copies = []
+
+    def managed_transfer(s3, config, operation, source, bucket, key, extra_args):
+        module.copies.append((extra_args, config))
+        s3.objects[(bucket, key)] = s3.objects[(source["Bucket"], source["Key"])]
+    monkeypatch.setattr(module, "managed_transfer", managed_transfer)
+    return module
+
+
+@pytest.fixture
+def transfer_config(staging):
+    return staging.transfer_config(multipart_threshold=staging.CHUNK_SIZE, multipart_chunksize=staging.CHUNK_SIZE)
+
+
+def test_composite_checksum_is_copied_with_the_source_part_size(staging, transfer_config):
+    source = {"Bucket": "raw", "Key": "data.csv"}
+    s3 = FakeS3({("raw", "data.csv"): {"ContentLength": 100, "PartSize": 40, "ChecksumSHA256": "abc-3"}})
+    assert staging.transfer(s3, transfer_config, source, "canvas", "datasets/data.csv", 100) == ("abc-3", True)
+    extra_args, config = staging.copies[0]
+    assert extra_args == {"ChecksumAlgorithm": "SHA256"}
+    assert config.multipart_chunksize == config.multipart_threshold == 40
+
+
+def test_full_object_checksum_is_copied_in_one_request(staging, transfer_config):
+    source = {"Bucket": "raw", "Key": "data.csv"}
+    s3 = FakeS3({("raw", "data.csv"): {"ContentLength": staging.CHUNK_SIZE * 2, "ChecksumCRC32": "abc"}})
+    staging.transfer(s3, transfer_config, source, "canvas", "data.csv", staging.CHUNK_SIZE * 2)
+    assert staging.copies[0][1].multipart_threshold > staging.CHUNK_SIZE * 2
+
+
+def test_mismatching_copy_fails(staging, transfer_config):
+    source = {"Bucket": "raw", "Key": "data.csv"}
+    s3 = FakeS3({("raw", "data.csv"): {"ContentLength": 10, "ChecksumCRC64NVME": "abc"}})
+    staging.managed_transfer = lambda s3, *args, **kwargs: s3.objects.update({("canvas", "data.csv"): {"ContentLength": 10, "ChecksumCRC64NVME": "def"}})
+    with pytest.raises(ValueError):
+        staging.transfer(s3, transfer_config, source, "canvas", "data.csv", 10)
+
+
+def test_source_without_checksum_is_unverified(staging, transfer_config):
+    source = {"Bucket": "raw", "Key": "data.csv"}
+    s3 = FakeS3({("raw", "data.csv"): {"ContentLength": 10}})
+    assert staging.transfer(s3, transfer_config, source, "canvas", "data.csv", 10) == (None, False)
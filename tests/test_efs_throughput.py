@@ -0,0 +1,53 @@
+import types
+
+import pytest
+
+
+class FakeEfs:
+    def __init__(self, states):
+        self.states = list(states)
+        self.updates = []
+
+    def describe_file_systems(self, FileSystemId):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return {"FileSystems": [{
+            "FileSystemId": FileSystemId, "LifeCycleState": state, "ThroughputMode": "bursting",
+        }]}
+
+    def update_file_system(self, **parameters):
+        self.updates.append(parameters)
+
+
+@pytest.fixture
+def efs_throughput(load_lambda, monkeypatch):
+    module = load_lambda("lambda_images/efs_throughput/efs_throughput.py")
+    monkeypatch.setattr(module.time, "sleep", lambda seconds: None)
+    return module
+
+
+def test_wait_available_returns_once_available(efs_throughput, monkeypatch):
+    efs = FakeEfs(["updating", "updating", "available"])
+    monkeypatch.setattr(efs_throughput, "client", lambda service_name: efs)
+    assert efs_throughput.wait_available("fs-1")["LifeCycleState"] == "available"
+
+
+def test_wait_available_times_out(efs_throughput, monkeypatch):
+    monkeypatch.setattr(efs_throughput, "client", lambda service_name: FakeEfs(["updating"]))
+    with pytest.raises(TimeoutError, match="fs-1 is still updating after 0 seconds"):
+        efs_throughput.wait_available("fs-1", timeout=0)
+
+
+def test_timeout_fails_the_custom_resource(efs_throughput, monkeypatch):
+    sent = []
+    clock = iter(range(0, 10000, 60))
+    monkeypatch.setattr(efs_throughput.time, "time", lambda: next(clock))
+    monkeypatch.setattr(efs_throughput, "client", lambda service_name: FakeEfs(["updating"]))
+    monkeypatch.setattr(efs_throughput.cfnresponse, "send", lambda *args, **kwargs: sent.append((args, kwargs)))
+    event = {
+        "RequestType": "Update", "PhysicalResourceId": "efs",
+        "ResourceProperties": {"FileSystemId": "fs-1", "ThroughputMode": "elastic", "ProvisionedThroughputInMibps": "0"},
+    }
+    efs_throughput.lambda_handler(event, types.SimpleNamespace(log_stream_name="stream"))
+    (args, kwargs), = sent
+    assert args[2] == "FAILED"
+    assert kwargs["reason"] == "EFS file system fs-1 is still updating after 120 seconds"
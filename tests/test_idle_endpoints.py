@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+
+@pytest.fixture
+def idle_endpoints(load_lambda):
+    return load_lambda("lambda_images/auto_shutdown/idle_endpoints.py")
+
+
+def metric(endpoint_name, variant_name=None):
+    dimensions = [{"Name": "EndpointName", "Value": endpoint_name}]
+    if variant_name:
+        dimensions.append({"Name": "VariantName", "Value": variant_name})
+    return {"Namespace": "AWS/SageMaker", "MetricName": "Invocations", "Dimensions": dimensions}
+
+
+class FakeCloudWatch:
+    def __init__(self, metrics, values):
+        self.metrics, self.values, self.calls = metrics, values, []
+
+    def get_paginator(self, operation):
+        fake = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                fake.calls.append((operation, kwargs))
+                if operation == "list_metrics":
+                    return [{"Metrics": fake.metrics}]
+                return [{"MetricDataResults": [
+                    {"Id": query["Id"], "Label": query["Label"],
+                     "Values": fake.values.get(query["MetricStat"]["Metric"]["Dimensions"][1]["Value"], [])}
+                    for query in kwargs["MetricDataQueries"]
+                ]}]
+        return Paginator()
+
+
+def test_queries_are_plain_metric_stats(idle_endpoints):
+    queries = idle_endpoints.invocation_queries([metric("canvas-a", "AllTraffic")], 86400)
+    assert queries == [{
+        "Id": "v0",
+        "Label": "canvas-a",
+        "MetricStat": {"Metric": metric("canvas-a", "AllTraffic"), "Period": 86400, "Stat": "Sum"},
+    }]
+    assert not any("Expression" in query for query in queries)
+
+
+def test_invocations_sum_the_variants_of_each_endpoint(idle_endpoints):
+    cloudwatch = FakeCloudWatch(
+        [
+            metric("canvas-a", "blue"), metric("canvas-a", "green"), metric("canvas-b", "AllTraffic"),
+            metric("canvas-a"), metric("other", "AllTraffic"),
+        ],
+        {"blue": [2.0], "green": [3.0], "AllTraffic": [0.0]},
+    )
+    end_time = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    endpoints = [{"EndpointName": name} for name in ("canvas-a", "canvas-b", "canvas-c")]
+
+    totals = idle_endpoints.invocations(cloudwatch, endpoints, 3600, end_time)
+
+    assert totals == {"canvas-a": 5.0, "canvas-b": 0.0}
+    # canvas-c has no metric at all, it is left out of the queries and counts as idle
+    assert totals.get("canvas-c", 0) == 0
+    queries = [kwargs["MetricDataQueries"] for operation, kwargs in cloudwatch.calls if operation == "get_metric_data"]
+    assert [len(batch) for batch in queries] == [3]
+
+
+def test_queries_are_batched(idle_endpoints):
+    metrics = [metric(f"canvas-{index}", "AllTraffic") for index in range(idle_endpoints.MAX_QUERIES + 1)]
+    cloudwatch = FakeCloudWatch(metrics, {})
+    endpoints = [{"EndpointName": f"canvas-{index}"} for index in range(idle_endpoints.MAX_QUERIES + 1)]
+    idle_endpoints.invocations(cloudwatch, endpoints, 3600, datetime.datetime.now(datetime.timezone.utc))
+    batches = [len(kwargs["MetricDataQueries"]) for operation, kwargs in cloudwatch.calls if operation == "get_metric_data"]
+    assert batches == [idle_endpoints.MAX_QUERIES, 1]
@@ -0,0 +1,46 @@
+import pytest
+from aws_cdk import App, Stack, aws_kms as kms
+
+from studio_constructs.kms_key import estimate_kms_requests_per_gb
+from studio_constructs.s3 import S3Bucket
+
+
+def test_standard_profile_calls_kms_for_every_object():
+    # 128 objects of 8 MB: a GenerateDataKey to write and a Decrypt to read each
+    assert estimate_kms_requests_per_gb("standard", 8) == 256
+    # Objects above the multipart chunk also decrypt the data key for each part
+    assert estimate_kms_requests_per_gb("standard", 64) == 16 * (1 + 8) + 16
+    assert estimate_kms_requests_per_gb("standard", 1, reads_per_write=0) == 1024
+    assert estimate_kms_requests_per_gb("standard", 8, reads_per_write=0.5) == 128 + 64
+
+
+@pytest.mark.parametrize("object_size_mb", [0.1, 8, 512])
+def test_bucket_keys_do_not_depend_on_the_object_count(object_size_mb):
+    assert estimate_kms_requests_per_gb("reduced-requests", object_size_mb) == 2
+    assert estimate_kms_requests_per_gb("reduced-requests", object_size_mb, reads_per_write=0) == 1
+
+
+def test_bucket_keys_are_cached_per_principal():
+    assert estimate_kms_requests_per_gb("reduced-requests", 8, principals=50) == 100
+    assert estimate_kms_requests_per_gb("reduced-requests", 8, principals=50, gb_per_key_period=10) == 10
+    # Reads count for the periods they span, not as an on/off switch
+    assert estimate_kms_requests_per_gb("reduced-requests", 8, reads_per_write=3, principals=10, gb_per_key_period=5) == 8
+
+
+def test_bucket_keys_never_cost_more_than_per_object_requests():
+    # 1000 principals each writing a few objects within a period get nothing from the bucket-level key
+    assert estimate_kms_requests_per_gb("reduced-requests", 64, principals=1000) == estimate_kms_requests_per_gb("standard", 64)
+
+
+@pytest.mark.parametrize("profile, enabled", [("standard", False), ("reduced-requests", True)])
+def test_profile_switches_the_bucket_key(profile, enabled):
+    stack = Stack(App(), "Stack")
+    bucket = S3Bucket(stack, "bucket", bucket_name="bucket", kms_key=kms.Key(stack, "Key"), encryption_profile=profile)
+    encryption = stack.resolve(bucket.bucket.node.default_child.bucket_encryption)
+    assert encryption["serverSideEncryptionConfiguration"][0].get("bucketKeyEnabled", False) is enabled
+
+
+def test_unknown_profile_is_rejected():
+    stack = Stack(App(), "Stack")
+    with pytest.raises(ValueError, match="Unknown encryption profile"):
+        S3Bucket(stack, "bucket", bucket_name="bucket", kms_key=kms.Key(stack, "Key"), encryption_profile="grants")
@@ -0,0 +1,24 @@
+import glob
+import sys
+
+from studio_constructs.lambda_profile import CLIENTS_IMPORT, inline_source
+
+
+def test_shared_client_helper_is_pasted_into_the_handlers():
+    handlers = [path for path in glob.glob("lambda_images/*/*.py") if CLIENTS_IMPORT in open(path).read()]
+    assert handlers
+    for path in handlers:
+        source = inline_source(path)
+        assert CLIENTS_IMPORT not in source
+        assert source.count("def client(") == 1
+        compile(source, path, "exec")
+
+
+def test_clients_are_built_once_without_boto3(load_lambda, monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delitem(sys.modules, "boto3", raising=False)
+    subnet_ip_monitor = load_lambda("lambda_images/subnet_ip_monitor/subnet_ip_monitor.py")
+    ec2 = subnet_ip_monitor.client("ec2")
+    assert subnet_ip_monitor.client("ec2") is ec2
+    assert subnet_ip_monitor.client("ec2", "eu-west-1").meta.region_name == "eu-west-1"
+    assert "boto3" not in sys.modules
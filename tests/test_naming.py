@@ -0,0 +1,48 @@
+import re
+
+import pytest
+from aws_cdk import App, Stack
+
+from studio_constructs.naming import NAME_PATTERN, domain_name, network_name
+
+
+@pytest.fixture
+def stack():
+    return Stack(App(), "Stack")
+
+
+def test_default_name_keeps_the_single_domain_paths(stack):
+    name = domain_name(stack)
+    assert stack.resolve(name.path("domain_id")) == {"Fn::If": [
+        "DomainNameIsDefault",
+        "/studio/domain_id",
+        {"Fn::Join": ["", ["/studio/", {"Ref": "DomainName"}, "/domain_id"]]},
+    ]}
+    assert stack.resolve(name.suffix) == {"Fn::If": [
+        "DomainNameIsDefault", "", {"Fn::Join": ["", ["-", {"Ref": "DomainName"}]]},
+    ]}
+
+
+def test_networks_are_published_under_their_own_prefix(stack):
+    name = network_name(stack)
+    assert stack.resolve(name.path("vpc_id"))["Fn::If"][1] == "/studio/network/vpc_id"
+
+
+def test_values_are_dynamic_references(stack):
+    name = domain_name(stack)
+    resolved = stack.resolve(name.value("canvas_bucket"))
+    assert resolved["Fn::Join"][1][0] == "{{resolve:ssm:"
+    # Reading the same key twice reuses the reference
+    assert stack.resolve(name.value("canvas_bucket")) == resolved
+
+
+@pytest.mark.parametrize("name", ["default", "team-a", "a", "x" * 20])
+def test_names_fit_the_bucket_name(name):
+    assert re.match(NAME_PATTERN, name)
+    # Longest region names, e.g. ap-southeast-3, and the 63 characters of a bucket name
+    assert len(f"sagemaker-ap-southeast-3-123456789012-{name}") <= 63
+
+
+@pytest.mark.parametrize("name", ["", "Team", "-team", "team-", "team_a", "x" * 21])
+def test_invalid_names(name):
+    assert not re.match(NAME_PATTERN, name)
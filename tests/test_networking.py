@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from aws_cdk import App, Stack
+from aws_cdk.assertions import Template
+
+from studio_constructs.networking import INTERFACE_ENDPOINTS, Networking, endpoint_parameters
+
+
+@pytest.fixture(scope="module")
+def template():
+    stack = Stack(App(), "Stack")
+    endpoint_profile, custom_endpoints = endpoint_parameters(stack)
+    Networking(stack, "vpc", endpoint_profile=endpoint_profile.value_as_string, custom_endpoints=custom_endpoints.value_as_list)
+    return Template.from_stack(stack).to_json()
+
+
+def evaluate(value, parameters, conditions):
+    # The intrinsic functions the endpoint conditions use, as CloudFormation resolves them
+    if isinstance(value, list):
+        return [evaluate(item, parameters, conditions) for item in value]
+    if not isinstance(value, dict):
+        return value
+    (function, arguments), = value.items()
+    if function == "Ref":
+        return parameters[arguments]
+    if function == "Condition":
+        return conditions[arguments]
+    arguments = [evaluate(argument, parameters, conditions) for argument in arguments]
+    if function == "Fn::Or":
+        return any(arguments)
+    if function == "Fn::Equals":
+        return arguments[0] == arguments[1]
+    if function == "Fn::Select":
+        return arguments[1][arguments[0]]
+    if function == "Fn::Split":
+        return arguments[1].split(arguments[0])
+    if function == "Fn::Join":
+        return arguments[0].join(arguments[1])
+    raise AssertionError(f"{function} is not allowed in Conditions")
+
+
+def created(template, profile, custom):
+    parameters = {"VpcEndpointProfile": profile, "CustomVpcEndpoints": custom}
+    conditions = {name: evaluate(expression, parameters, conditions={}) for name, expression in template["Conditions"].items()}
+    return {
+        name for name, resource in template["Resources"].items()
+        if resource.get("Condition") is None or conditions[resource["Condition"]]
+    }
+
+
+def test_conditions_only_use_functions_allowed_in_conditions(template):
+    assert "Fn::Contains" not in json.dumps(template["Conditions"])
+
+
+@pytest.mark.parametrize("profile, custom", [
+    ("minimal", []), ("minimal", ["ecr", "bedrock"]), ("data-sources", []), ("genai", ["ssm"]), ("full", []),
+])
+def test_dependencies_are_always_created(template, profile, custom):
+    resources = created(template, profile, custom)
+    for name in resources:
+        assert set(template["Resources"][name].get("DependsOn", [])) <= resources, name
+
+
+def test_custom_endpoints_are_added_to_the_profile(template):
+    endpoints = lambda resources: {name for name in resources if template["Resources"][name]["Type"] == "AWS::EC2::VPCEndpoint"}
+    minimal = endpoints(created(template, "minimal", []))
+    custom = endpoints(created(template, "minimal", ["ecr", "bedrock"]))
+    assert len(custom - minimal) == 2
+    assert len(endpoints(created(template, "full", []))) == len(INTERFACE_ENDPOINTS) + 1
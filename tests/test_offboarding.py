@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+
+class NotFound(Exception):
+    response = {"Error": {"Code": "ResourceNotFound"}}
+
+
+class Pages:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return self.pages(**kwargs)
+
+
+class FakeSageMaker:
+    def __init__(self, apps, spaces, tags=(), app_not_found=False):
+        self.apps, self.spaces, self.tags, self.app_not_found = apps, spaces, list(tags), app_not_found
+        self.profile_deleted = False
+        self.calls = []
+
+    def get_paginator(self, operation):
+        if operation == "list_spaces":
+            return Pages(lambda **kwargs: [{"Spaces": self.spaces}])
+        return Pages(lambda SpaceNameEquals=None, **kwargs: [{"Apps": [
+            app for app in self.apps if app.get("SpaceName") == SpaceNameEquals
+        ]}])
+
+    def delete_app(self, **app_id):
+        self.calls.append(("delete_app", app_id["AppName"]))
+        if self.app_not_found:
+            raise NotFound()
+
+    def describe_app(self, **app_id):
+        if self.app_not_found:
+            raise NotFound()
+        return {"Status": "Deleted"}
+
+    def delete_space(self, DomainId, SpaceName):
+        self.calls.append(("delete_space", SpaceName))
+
+    def describe_space(self, DomainId, SpaceName):
+        raise NotFound()
+
+    def describe_user_profile(self, DomainId, UserProfileName):
+        if self.profile_deleted:
+            raise NotFound()
+        return {"UserProfileArn": f"arn:aws:sagemaker:us-east-1:123456789012:user-profile/{DomainId}/{UserProfileName}",
+                "Status": "InService"}
+
+    def list_tags(self, ResourceArn):
+        return {"Tags": self.tags}
+
+    def delete_user_profile(self, DomainId, UserProfileName):
+        self.calls.append(("delete_user_profile", UserProfileName))
+        self.profile_deleted = True
+
+
+def app(name, status="InService", space=None):
+    return {"AppType": "Canvas" if space is None else "JupyterLab", "AppName": name, "Status": status,
+            "UserProfileName": "alice", **({"SpaceName": space} if space else {})}
+
+
+SPACES = [{"SpaceName": "alice-space", "OwnershipSettingsSummary": {"OwnerUserProfileName": "alice"}},
+          {"SpaceName": "bob-space", "OwnershipSettingsSummary": {"OwnerUserProfileName": "bob"}}]
+
+
+@pytest.fixture
+def offboarding(load_lambda, monkeypatch):
+    module = load_lambda("lambda_images/offboarding/offboarding.py")
+    monkeypatch.setattr(module, "POLL_INTERVAL", 0)
+    return module
+
+
+def run(offboarding, monkeypatch, sagemaker, time_budget=60):
+    monkeypatch.setattr(offboarding, "client", lambda service_name, **kwargs: sagemaker)
+    return asyncio.run(offboarding.offboard(["alice"], "d-1", time_budget=time_budget))
+
+
+def test_apps_then_spaces_then_the_user_profile_are_deleted(offboarding, monkeypatch):
+    sagemaker = FakeSageMaker([app("default"), app("lab", space="alice-space"), app("old", status="Deleted")], SPACES)
+    result, = run(offboarding, monkeypatch, sagemaker)
+    assert (result["status"], result["apps"], result["spaces"]) == ("offboarded", 2, 1)
+    assert sorted(sagemaker.calls[:2]) == [("delete_app", "default"), ("delete_app", "lab")]
+    assert sagemaker.calls[2:] == [("delete_space", "alice-space"), ("delete_user_profile", "alice")]
+
+
+def test_apps_and_profiles_already_gone_are_deleted(offboarding, monkeypatch):
+    sagemaker = FakeSageMaker([app("default")], [], app_not_found=True)
+    result, = run(offboarding, monkeypatch, sagemaker)
+    assert result["status"] == "offboarded"
+
+    sagemaker = FakeSageMaker([], [])
+    sagemaker.profile_deleted = True
+    result, = run(offboarding, monkeypatch, sagemaker)
+    assert result["status"] == "offboarded"
+
+
+def test_user_profiles_of_a_provisioned_product_are_left_to_its_termination(offboarding, monkeypatch):
+    tags = [{"Key": "aws:servicecatalog:provisionedProductArn",
+             "Value": "arn:aws:servicecatalog:us-east-1:123456789012:stack/alice/pp-abc123"}]
+    sagemaker = FakeSageMaker([app("default")], [], tags=tags)
+    result, = run(offboarding, monkeypatch, sagemaker)
+    assert (result["status"], result["provisioned_product"]) == ("terminate-product", "pp-abc123")
+    assert ("delete_user_profile", "alice") not in sagemaker.calls
+
+
+def test_users_left_at_the_deadline_are_reported_unfinished(offboarding, monkeypatch):
+    sagemaker = FakeSageMaker([app("default")], [])
+    result, = run(offboarding, monkeypatch, sagemaker, time_budget=0)
+    assert result["status"] == "unfinished"
+    assert sagemaker.calls == []
+
+    sagemaker.describe_app = lambda **app_id: {"Status": "Deleting"}
+    result, = run(offboarding, monkeypatch, sagemaker, time_budget=0.05)
+    assert result["status"] == "unfinished"
+    assert "timed out waiting for Canvas app default" in result["error"]
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.copied, self.deleted, self.parts = [], [], []
+
+    def get_paginator(self, operation):
+        def pages(Bucket, Prefix, PaginationConfig):
+            keys = sorted(key for key in self.objects if key.startswith(Prefix))
+            size = PaginationConfig["PageSize"]
+            return [{"Contents": [{"Key": key, "Size": self.objects[key]} for key in keys[i:i + size]]}
+                    for i in range(0, len(keys), size)]
+        return Pages(pages)
+
+    def copy_object(self, CopySource, Bucket, Key, StorageClass):
+        self.copied.append(CopySource["Key"])
+
+    def create_multipart_upload(self, Bucket, Key, StorageClass):
+        return {"UploadId": "upload"}
+
+    def upload_part_copy(self, CopySource, CopySourceRange, UploadId, PartNumber, Bucket, Key):
+        self.parts.append(CopySourceRange)
+        return {"CopyPartResult": {"ETag": f"etag-{PartNumber}"}}
+
+    def complete_multipart_upload(self, UploadId, MultipartUpload, Bucket, Key):
+        self.copied.append(Key.split("/", 3)[-1])
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        # Objects are only deleted once copied
+        assert set(keys) <= set(self.copied)
+        self.deleted.append(len(keys))
+        return {}
+
+
+def test_archive_copies_each_page_concurrently_then_deletes_it_in_one_batch(offboarding, monkeypatch):
+    prefix = offboarding.workspace_prefixes("alice")[1]
+    objects = {f"Canvas/alice/{i:05}": 10 for i in range(2500)}
+    objects[f"{prefix}model.tar.gz"] = 6 * 1024 ** 3
+    objects["Canvas/bob/data.csv"] = 10
+    s3 = FakeS3(objects)
+    monkeypatch.setattr(offboarding, "client", lambda service_name, **kwargs: s3)
+
+    assert offboarding.archive_prefixes("bucket", "alice") == 2501
+    assert s3.deleted == [1000, 1000, 500, 1]
+    assert len(s3.copied) == 2501 and "Canvas/bob/data.csv" not in s3.copied
+    assert s3.parts == ["bytes=0-1073741823", "bytes=1073741824-2147483647", "bytes=2147483648-3221225471",
+                        "bytes=3221225472-4294967295", "bytes=4294967296-5368709119", "bytes=5368709120-6442450943"]
@@ -0,0 +1,45 @@
+import types
+
+import pytest
+
+
+class FakeSageMaker:
+    def __init__(self):
+        self.tags = []
+
+    def add_tags(self, ResourceArn, Tags):
+        self.tags.append((ResourceArn, Tags))
+
+
+@pytest.fixture
+def profile_timezone(load_lambda):
+    return load_lambda("lambda_images/profile_timezone/profile_timezone.py")
+
+
+def event(request_type, timezone="Europe/Paris"):
+    return {
+        "RequestType": request_type, "PhysicalResourceId": "timezone",
+        "ResourceProperties": {
+            "UserProfileArn": "arn:aws:sagemaker:us-east-1:123456789012:user-profile/d-1/alice",
+            "UserProfileName": "Alice",
+            "Timezone": timezone,
+        },
+    }
+
+
+@pytest.mark.parametrize("request_type", ["Create", "Update"])
+def test_tags_the_profile_in_place(profile_timezone, monkeypatch, request_type):
+    sagemaker = FakeSageMaker()
+    monkeypatch.setattr(profile_timezone, "client", lambda service_name: sagemaker)
+    profile_timezone.lambda_handler(event(request_type, "Asia/Tokyo"), types.SimpleNamespace(log_stream_name="stream"))
+    assert sagemaker.tags == [("arn:aws:sagemaker:us-east-1:123456789012:user-profile/d-1/alice", [
+        {"Key": "canvas:timezone", "Value": "Asia/Tokyo"},
+        {"Key": "canvas:user-profile-name", "Value": "Alice"},
+    ])]
+
+
+def test_delete_leaves_the_profile(profile_timezone, monkeypatch):
+    sagemaker = FakeSageMaker()
+    monkeypatch.setattr(profile_timezone, "client", lambda service_name: sagemaker)
+    profile_timezone.lambda_handler(event("Delete"), types.SimpleNamespace(log_stream_name="stream"))
+    assert sagemaker.tags == []
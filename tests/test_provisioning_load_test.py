@@ -0,0 +1,45 @@
+import importlib.util
+import math
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def load_test():
+    spec = importlib.util.spec_from_file_location("provisioning_load_test", "tools/provisioning_load_test.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_percentile_interpolates(load_test):
+    assert math.isnan(load_test.percentile([], 50))
+    assert load_test.percentile([3], 99) == 3
+    assert load_test.percentile([4, 1, 3, 2], 50) == 2.5
+    assert load_test.percentile([1, 2, 3, 4], 0) == 1
+    assert load_test.percentile([1, 2, 3, 4], 100) == 4
+    assert load_test.percentile(list(range(1, 11)), 90) == pytest.approx(9.1)
+
+
+def test_references(load_test):
+    value = {
+        "Role": {"Fn::GetAtt": ["Role", "Arn"]},
+        "Name": {"Fn::Sub": ["${Prefix}-${AWS::Region}-${Bucket.Arn}", {"Prefix": {"Ref": "Name"}}]},
+        "Literal": {"Fn::Sub": "${!NotAReference}"},
+    }
+    assert load_test.references(value) == {"Role", "Prefix", "AWS::Region", "Bucket", "Name"}
+
+
+def test_stack_plan_skips_resources_whose_condition_is_false(load_test):
+    template = {
+        "Parameters": {"Layout": {"Type": "String", "Default": "shared"}},
+        "Conditions": {"PerUser": {"Fn::Equals": [{"Ref": "Layout"}, "per-user"]}},
+        "Resources": {
+            "Profile": {"Type": "AWS::SageMaker::UserProfile", "Properties": {}},
+            "Workspace": {"Type": "Custom::Workspace", "Condition": "PerUser",
+                          "Properties": {"UserProfileName": {"Ref": "Profile"}}},
+        },
+    }
+    assert set(load_test.StackPlan(template, {}).resources) == {"Profile"}
+    plan = load_test.StackPlan(template, {"Layout": "per-user"})
+    assert plan.resources["Workspace"][2] == {"Profile"}
@@ -0,0 +1,95 @@
+import datetime
+import re
+from zoneinfo import available_timezones
+
+import pytest
+
+from products.scheduled_shutdown_product import TIMEZONE_PATTERN
+
+
+@pytest.fixture
+def shutdown(load_lambda):
+    return load_lambda("lambda_images/shutdown/shutdown.py")
+
+
+def app(domain_id, user_profile_name):
+    return {"DomainId": domain_id, "UserProfileName": user_profile_name, "AppType": "Canvas", "AppName": "default"}
+
+
+@pytest.mark.parametrize("timezone", ["UTC", "Europe/Paris", "America/Argentina/Buenos_Aires", "Etc/GMT+5",
+                                      "America/Port-au-Prince"])
+def test_pattern_accepts_timezones(timezone):
+    assert re.match(TIMEZONE_PATTERN, timezone)
+
+
+@pytest.mark.parametrize("timezone", ["", "Paris", "europe/paris", "Europe/Paris; DROP", "Mars/Olympus_Mons"])
+def test_pattern_rejects_other_values(timezone):
+    assert not re.match(TIMEZONE_PATTERN, timezone)
+
+
+def test_pattern_accepts_the_area_timezones_of_the_tz_database():
+    areas = [timezone for timezone in available_timezones() if re.match(r"^(America|Asia|Europe)/", timezone)]
+    assert areas and all(re.match(TIMEZONE_PATTERN, timezone) for timezone in areas)
+
+
+class FakeTagging:
+    def __init__(self, resources):
+        self.resources, self.filters = resources, []
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, ResourceTypeFilters, TagFilters):
+        self.filters.append(TagFilters)
+        values = TagFilters[0].get("Values")
+        return [{"ResourceTagMappingList": [
+            resource for resource in self.resources
+            if values is None or next(tag["Value"] for tag in resource["Tags"] if tag["Key"] == "canvas:timezone") in values
+        ]}]
+
+
+def profile(user_profile_name, timezone, name_tag=True):
+    tags = [{"Key": "canvas:timezone", "Value": timezone}]
+    if name_tag:
+        tags.append({"Key": "canvas:user-profile-name", "Value": user_profile_name})
+    return {
+        "ResourceARN": f"arn:aws:sagemaker:us-east-1:123456789012:user-profile/d-1/{user_profile_name.lower()}",
+        "Tags": tags,
+    }
+
+
+def test_tagged_profiles_only_reads_the_due_timezones(shutdown, monkeypatch):
+    tagging = FakeTagging([profile("Alice", "Europe/Paris"), profile("bob", "Asia/Tokyo", name_tag=False)])
+    monkeypatch.setattr(shutdown, "client", lambda service_name: tagging)
+    timezones = [f"Etc/GMT+{offset}" for offset in range(12)] + ["Europe/Paris"] + [f"Etc/GMT-{offset}" for offset in range(1, 14)]
+
+    assert shutdown.tagged_profiles(timezones) == {("d-1", "Alice"): "Europe/Paris"}
+    assert [len(filters[0]["Values"]) for filters in tagging.filters] == [20, 6]
+    assert shutdown.tagged_profiles() == {("d-1", "Alice"): "Europe/Paris", ("d-1", "bob"): "Asia/Tokyo"}
+    assert shutdown.tagged_profiles([]) == {}
+
+
+def test_unscheduled_apps_are_the_untagged_and_unknown_timezones(shutdown):
+    apps = {"d-1/alice": [app("d-1", "Alice")], "d-1/bob": [app("d-1", "bob")], "d-1/carol": [app("d-1", "carol")]}
+    profiles = {("d-1", "Alice"): "Europe/Paris", ("d-1", "bob"): "Europe/Pari"}
+    assert shutdown.unscheduled_apps(apps, profiles) == [app("d-1", "bob"), app("d-1", "carol")]
+
+
+def test_due_timezones_reach_the_end_of_day_hour(shutdown):
+    timezones = ["UTC", "Europe/Paris", "Asia/Kolkata", "America/New_York"]
+    # 17:00 UTC in July is 19:00 in Paris (UTC+2) and 13:00 in New York (UTC-4)
+    now = datetime.datetime(2026, 7, 1, 17, 0, tzinfo=datetime.timezone.utc)
+    assert shutdown.due_timezones(timezones, now, 19) == ["Europe/Paris"]
+    assert shutdown.due_timezones(timezones, now, 17) == ["UTC"]
+    # Kolkata is UTC+5:30, its 19:00 starts at 13:30 UTC
+    assert shutdown.due_timezones(timezones, now.replace(hour=13, minute=45), 19) == ["Asia/Kolkata"]
+    # In January Paris is UTC+1
+    assert shutdown.due_timezones(timezones, datetime.datetime(2026, 1, 1, 18, 0, tzinfo=datetime.timezone.utc), 19) == ["Europe/Paris"]
+
+
+def test_every_hour_has_a_slice_of_the_known_timezones(shutdown):
+    now = datetime.datetime(2026, 7, 1, 17, 0, tzinfo=datetime.timezone.utc)
+    known = shutdown.known_timezones()
+    due = shutdown.due_timezones(known, now, 19)
+    assert "Europe/Paris" in due and "UTC" not in due
+    assert 0 < len(due) < len(known) / 4
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+from aws_cdk import App, Stack
+
+from products.synth_cache import SynthCache, module_sources
+
+VERSION = {"class": "products.canvas_user_product.CanvasUserProduct", "id": "CanvasUserProduct"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    def make(context=None):
+        stack = Stack(App(context=context or {}), "SCPortfolioStack")
+        return SynthCache(stack, directory=str(tmp_path))
+    return make
+
+
+def test_sources_follow_local_imports_and_lambda_code():
+    sources = {os.path.relpath(path) for path in module_sources("products.canvas_user_product")}
+    assert {
+        "products/canvas_user_product.py",
+        "studio_constructs/naming.py",
+        "lambda_images/canvas_workspace/canvas_workspace.py",
+    } <= sources
+    assert "products/domain_product.py" not in sources
+
+
+def test_key_is_stable(cache):
+    assert cache().key(VERSION) == cache().key(VERSION)
+
+
+def test_key_changes_with_arguments_and_context(cache):
+    key = cache().key(VERSION)
+    assert cache().key({**VERSION, "kwargs": {"shard_count": 2}}) != key
+    assert cache({"canvas:egress_mode": "per-az-nat"}).key(VERSION) != key
+
+
+def test_key_ignores_selection_context(cache):
+    key = cache().key(VERSION)
+    assert cache({"canvas:products": "canvas-user", "canvas:benchmark": "true"}).key(VERSION) == key
+
+
+def test_key_changes_with_the_lambda_code(cache, tmp_path, monkeypatch):
+    # Lambda code is read relative to the working directory, like cdk synth does
+    lambda_code = tmp_path / "lambda_images" / "canvas_workspace" / "canvas_workspace.py"
+    lambda_code.parent.mkdir(parents=True)
+    source = open("lambda_images/canvas_workspace/canvas_workspace.py").read()
+    monkeypatch.chdir(tmp_path)
+
+    lambda_code.write_text(source)
+    key = cache().key(VERSION)
+    assert cache().key(VERSION) == key
+    lambda_code.write_text(source + "\n# changed\n")
+    assert cache().key(VERSION) != key
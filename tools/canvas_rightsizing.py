@@ -0,0 +1,166 @@
+import argparse
+import datetime
+import json
+import sys
+
+import boto3
+
+# Canvas instance types considered, cheapest first, with their vCPUs and memory in GiB
+INSTANCE_TYPES = [
+    ("ml.m5.large", 2, 8),
+    ("ml.m5.xlarge", 4, 16),
+    ("ml.r5.xlarge", 4, 32),
+    ("ml.m5.2xlarge", 8, 32),
+    ("ml.r5.2xlarge", 8, 64),
+    ("ml.m5.4xlarge", 16, 64),
+    ("ml.r5.4xlarge", 16, 128),
+    ("ml.m5.8xlarge", 32, 128),
+    ("ml.r5.8xlarge", 32, 256),
+]
+ACTIVITY_NAMESPACE = "/aws/sagemaker/Canvas/AppActivity"
+# get_metric_data accepts up to 500 queries per call
+MAX_QUERIES = 500
+
+
+def metric_values(cloudwatch, namespace: str, metric_name: str, domain_id: str, start, end, period: int, stat: str) -> dict:
+    # Pulls the metric of every user profile of the domain in batches of 500 series, returns the datapoints of each user
+    metrics = [
+        metric
+        for page in cloudwatch.get_paginator("list_metrics").paginate(
+            Namespace=namespace, MetricName=metric_name, Dimensions=[{"Name": "DomainId", "Value": domain_id}]
+        )
+        for metric in page["Metrics"]
+    ]
+    values = {}
+    for offset in range(0, len(metrics), MAX_QUERIES):
+        batch = metrics[offset:offset + MAX_QUERIES]
+        queries = [
+            {"Id": f"m{i}", "MetricStat": {"Metric": metric, "Period": period, "Stat": stat}, "ReturnData": True}
+            for i, metric in enumerate(batch)
+        ]
+        owners = [
+            next((d["Value"] for d in metric["Dimensions"] if d["Name"] == "UserProfileName"), None) for metric in batch
+        ]
+        for page in cloudwatch.get_paginator("get_metric_data").paginate(
+            MetricDataQueries=queries, StartTime=start, EndTime=end
+        ):
+            for result in page["MetricDataResults"]:
+                owner = owners[int(result["Id"][1:])]
+                if owner is not None and result["Values"]:
+                    values.setdefault(owner, []).extend(result["Values"])
+    return values
+
+
+def percentile(values: list, percent: float):
+    # Linear interpolation between the closest ranks, None without datapoints
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = percent / 100 * (len(ordered) - 1)
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def app_instance_types(sagemaker, domain_id: str) -> dict:
+    # Instance type of the latest Canvas app of each user, deleted apps stay listed for a while after a shutdown
+    instance_types = {}
+    for page in sagemaker.get_paginator("list_apps").paginate(
+        DomainIdEquals=domain_id, SortBy="CreationTime", SortOrder="Ascending"
+    ):
+        for app in page["Apps"]:
+            instance_type = app.get("ResourceSpec", {}).get("InstanceType")
+            if app["AppType"] == "Canvas" and app.get("UserProfileName") and instance_type:
+                instance_types[app["UserProfileName"]] = instance_type
+    return instance_types
+
+
+def recommend(cpu_percent: float, memory_percent: float, current: str, cpu_target: float, memory_target: float):
+    # Cheapest instance type keeping the peak usage of the user under the targets, None for unknown instance types
+    instance = next((instance for instance in INSTANCE_TYPES if instance[0] == current), None)
+    if instance is None:
+        return None
+    _, vcpus, memory = instance
+    needed_vcpus = cpu_percent / 100 * vcpus / cpu_target
+    needed_memory = memory_percent / 100 * memory / memory_target
+    for name, candidate_vcpus, candidate_memory in INSTANCE_TYPES:
+        if candidate_vcpus >= needed_vcpus and candidate_memory >= needed_memory:
+            return name
+    return INSTANCE_TYPES[-1][0]
+
+
+def recommendations(cloudwatch, sagemaker, domain_id: str, args) -> list:
+    end = datetime.datetime.now(datetime.timezone.utc)
+    start = end - datetime.timedelta(days=args.days)
+    activity = metric_values(
+        cloudwatch, ACTIVITY_NAMESPACE, "TimeSinceLastActive", domain_id, start, end, args.period, "Minimum"
+    )
+    cpu, memory = {}, {}
+    if args.namespace:
+        cpu = metric_values(cloudwatch, args.namespace, args.cpu_metric, domain_id, start, end, args.period, "Maximum")
+        memory = metric_values(
+            cloudwatch, args.namespace, args.memory_metric, domain_id, start, end, args.period, "Maximum"
+        )
+    instance_types = app_instance_types(sagemaker, domain_id)
+
+    results = []
+    for user in sorted(set(activity) | set(cpu) | set(memory) | set(instance_types)):
+        user_cpu = percentile(cpu.get(user, []), args.percentile)
+        user_memory = percentile(memory.get(user, []), args.percentile)
+        result = {
+            "user": user,
+            "app_hours": round(len(activity.get(user, [])) * args.period / 3600, 1),
+            "active_hours": round(sum(value < args.period for value in activity.get(user, [])) * args.period / 3600, 1),
+            f"cpu_p{args.percentile:g}": None if user_cpu is None else round(user_cpu, 1),
+            f"memory_p{args.percentile:g}": None if user_memory is None else round(user_memory, 1),
+            "current": instance_types.get(user, args.current_instance_type),
+            "recommended": None,
+        }
+        # Users without enough datapoints, or whose instance type is unknown, get no recommendation
+        if len(memory.get(user, [])) >= args.min_datapoints and user_cpu is not None and user_memory is not None:
+            result["recommended"] = recommend(
+                user_cpu, user_memory, result["current"], args.cpu_target / 100, args.memory_target / 100
+            )
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recommend a Canvas instance type for each user profile from its usage",
+        epilog="Canvas publishes no CPU or memory metrics. Recommendations need utilization metrics you publish yourself, "
+               "given with --namespace, --cpu-metric and --memory-metric. Without them the recommended column stays "
+               "empty and only the app activity is reported.",
+    )
+    parser.add_argument("domain_id", help="Studio Domain id, e.g. d-xxxxxxxxxxxx")
+    parser.add_argument("--days", type=int, default=14, help="Usage history, CloudWatch keeps 5 minute datapoints 63 days")
+    parser.add_argument("--period", type=int, default=300, help="Datapoint period in seconds")
+    parser.add_argument("--percentile", type=float, default=95, help="Percentile of the usage sized for")
+    parser.add_argument("--namespace",
+                        help="Namespace of utilization metrics you publish with DomainId and UserProfileName dimensions, "
+                             "Canvas does not publish any. Without it only the app activity is reported")
+    parser.add_argument("--cpu-metric", help="CPU utilization metric of --namespace, in percent")
+    parser.add_argument("--memory-metric", help="Memory utilization metric of --namespace, in percent")
+    parser.add_argument("--current-instance-type", choices=[name for name, _, _ in INSTANCE_TYPES],
+                        help="Instance type of the users without a Canvas app listed, read from their apps otherwise")
+    parser.add_argument("--cpu-target", type=float, default=70, help="CPU utilization to size the percentile for")
+    parser.add_argument("--memory-target", type=float, default=80, help="Memory utilization to size the percentile for")
+    parser.add_argument("--min-datapoints", type=int, default=288, help="Datapoints needed before recommending")
+    parser.add_argument("--json", action="store_true", help="Print the recommendations as JSON")
+    args = parser.parse_args()
+    if args.namespace and not (args.cpu_metric and args.memory_metric):
+        parser.error("--namespace needs --cpu-metric and --memory-metric")
+
+    results = recommendations(boto3.client("cloudwatch"), boto3.client("sagemaker"), args.domain_id, args)
+    if not args.namespace:
+        print("no utilization metrics given with --namespace, only the app activity is reported and no instance type "
+              "is recommended", file=sys.stderr)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        columns = list(results[0]) if results else []
+        print("".join(f"{column:>16}" if i else f"{column:<32}" for i, column in enumerate(columns)))
+        for result in results:
+            print("".join(
+                f"{str(value):>16}" if i else f"{str(value):<32}" for i, value in enumerate(result.values())
+            ))
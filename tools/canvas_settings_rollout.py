@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import copy
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import yaml
+from botocore.config import Config
+
+config = Config(retries={"max_attempts": 10, "mode": "standard"})
+
+# Polling starts fast and backs off, a domain usually takes a minute to apply new default settings
+POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 30
+SETTLE_TIMEOUT = 15 * 60
+
+
+async def call(method, **kwargs):
+    # boto3 blocks, each call runs in a worker thread so the domains are processed concurrently
+    return await asyncio.to_thread(method, **kwargs)
+
+
+def sagemaker_client(target: dict):
+    # Targets of other accounts give the role the rollout assumes in them
+    if not target.get("role_arn"):
+        return boto3.client("sagemaker", region_name=target.get("region"), config=config)
+    credentials = boto3.client("sts").assume_role(
+        RoleArn=target["role_arn"], RoleSessionName="canvas-settings-rollout"
+    )["Credentials"]
+    return boto3.client(
+        "sagemaker",
+        region_name=target.get("region"),
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+        config=config,
+    )
+
+
+def diff(current, desired, path: str = "") -> list:
+    # Paths of the desired settings the current ones differ from, settings absent from the document are left as they are
+    if isinstance(desired, dict) and isinstance(current, dict):
+        return [
+            change
+            for key, value in desired.items()
+            for change in diff(current.get(key), value, f"{path}.{key}" if path else key)
+        ]
+    return [] if current == desired else [{"path": path, "current": current, "desired": desired}]
+
+
+def merge(current, desired):
+    # UpdateDomain replaces each settings structure it is given, the desired settings are applied on top of the current ones
+    if not isinstance(desired, dict) or not isinstance(current, dict):
+        return copy.deepcopy(desired)
+    merged = copy.deepcopy(current)
+    for key, value in desired.items():
+        merged[key] = merge(current.get(key), value)
+    return merged
+
+
+def plan_entry(target: dict, domain_id, client=None) -> dict:
+    return {
+        "target": target.get("name") or target.get("role_arn") or "default",
+        "region": target.get("region"),
+        "domain_id": domain_id,
+        "domain_status": None,
+        "status": "failed",
+        "changes": [],
+        "client": client,
+    }
+
+
+async def plan_target(target: dict, settings: dict) -> list:
+    # A target or domain that cannot be read, e.g. a role the rollout may not assume, is reported as failed
+    # and left out of the rollout, the other targets and domains are planned all the same
+    try:
+        client = await asyncio.to_thread(sagemaker_client, target)
+        domain_ids = target.get("domains")
+        if not domain_ids:
+            def list_domains():
+                return [domain["DomainId"] for page in client.get_paginator("list_domains").paginate() for domain in page["Domains"]]
+            domain_ids = await asyncio.to_thread(list_domains)
+    except Exception as e:
+        return [{**plan_entry(target, None), "error": str(e)}]
+
+    async def plan_domain(domain_id):
+        entry = plan_entry(target, domain_id, client)
+        try:
+            domain = await call(client.describe_domain, DomainId=domain_id)
+        except Exception as e:
+            entry["error"] = str(e)
+            return entry
+        entry["changes"] = diff(domain.get("DefaultUserSettings", {}), settings)
+        entry["domain_status"] = domain["Status"]
+        entry["status"] = "planned" if entry["changes"] else "unchanged"
+        return entry
+    return await asyncio.gather(*(plan_domain(domain_id) for domain_id in domain_ids))
+
+
+async def wait_settled(client, domain_id, timeout=SETTLE_TIMEOUT):
+    interval = POLL_INTERVAL
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        status = (await call(client.describe_domain, DomainId=domain_id))["Status"]
+        if status == "InService":
+            return
+        if status.endswith("Failed"):
+            raise RuntimeError(f"domain {domain_id} is {status}")
+        if asyncio.get_running_loop().time() > deadline:
+            raise TimeoutError(f"timed out waiting for domain {domain_id} to settle")
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+async def apply_domain(entry: dict, settings: dict):
+    client, domain_id = entry["client"], entry["domain_id"]
+    try:
+        # A domain still applying an earlier update rejects the next one
+        await wait_settled(client, domain_id)
+        current = (await call(client.describe_domain, DomainId=domain_id)).get("DefaultUserSettings", {})
+        await call(
+            client.update_domain,
+            DomainId=domain_id,
+            DefaultUserSettings={key: merge(current.get(key), value) for key, value in settings.items()},
+        )
+        await wait_settled(client, domain_id)
+        remaining = diff((await call(client.describe_domain, DomainId=domain_id)).get("DefaultUserSettings", {}), settings)
+        if remaining:
+            raise RuntimeError(f"settings not applied after the update: {[change['path'] for change in remaining]}")
+        entry["status"] = "updated"
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = str(e)
+
+
+async def rollout(document: dict, apply: bool, concurrency: int, first_wave: int, max_wave: int,
+                  max_error_rate: float, max_failures: int) -> list:
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(concurrency * 2, 16)))
+    settings = document["settings"]
+    plans = await asyncio.gather(*(plan_target(target, settings) for target in document.get("targets", [{}])))
+    report = [entry for plan in plans for entry in plan]
+    pending = [entry for entry in report if entry["status"] == "planned"]
+    if not apply:
+        return report
+
+    # Waves double in size from first_wave up to max_wave, so a bad document stops after a few domains
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(entry):
+        async with semaphore:
+            await apply_domain(entry, settings)
+
+    attempted, failed, size = 0, 0, first_wave
+    while pending:
+        wave, pending = pending[:size], pending[size:]
+        await asyncio.gather(*(bounded(entry) for entry in wave))
+        attempted += len(wave)
+        failed += sum(entry["status"] == "failed" for entry in wave)
+        print(f"wave of {len(wave)} domains, {failed}/{attempted} failed so far", file=sys.stderr)
+        if failed > max_failures or failed / attempted > max_error_rate:
+            for entry in pending:
+                entry["status"] = "halted"
+            print(f"halted, {len(pending)} domains left unchanged", file=sys.stderr)
+            break
+        size = min(size * 2, max_wave)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll out default Canvas settings to the Studio domains of several accounts")
+    parser.add_argument("document", help="YAML or JSON document with the desired settings and the targets")
+    parser.add_argument("--apply", action="store_true", help="Update the domains, only reports the changes otherwise")
+    parser.add_argument("--concurrency", type=int, default=8, help="Domains updated at the same time")
+    parser.add_argument("--first-wave", type=int, default=1, help="Domains of the first wave")
+    parser.add_argument("--max-wave", type=int, default=16, help="Domains of a wave at most")
+    parser.add_argument("--max-error-rate", type=float, default=0.1, help="Halts once this share of the updates failed")
+    parser.add_argument("--max-failures", type=int, default=3, help="Halts once more updates than this failed")
+    args = parser.parse_args()
+
+    with open(args.document) as f:
+        document = yaml.safe_load(f)
+    report = asyncio.run(rollout(
+        document, args.apply, args.concurrency, args.first_wave, args.max_wave, args.max_error_rate, args.max_failures
+    ))
+    for entry in report:
+        entry.pop("client")
+    print(json.dumps(report, indent=2, default=str))
+    if any(entry["status"] in ("failed", "halted") for entry in report):
+        sys.exit(1)
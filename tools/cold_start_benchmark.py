@@ -0,0 +1,156 @@
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from studio_constructs.lambda_profile import CLIENTS_MODULE, inline_source  # noqa: E402
+
+# A second positional argument is the region, keyword arguments such as max_pool_connections are not
+CLIENT_CALL = re.compile(r"""\bclient\(['"]([a-z0-9-]+)['"](\s*,(?!\s*[a-z_]+=))?""")
+
+# Runs the module of a handler the way the Lambda runtime does during the init phase, then builds the clients its first
+# invocation builds, and prints both durations
+INIT = """
+import importlib.util, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("index", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+init = time.perf_counter()
+for call in sys.argv[2:]:
+    # service, or service:region for the clients the handler builds for the region of the event
+    service_name, _, region_name = call.partition(":")
+    module.client(service_name, region_name or None)
+print((init - start) * 1000, (time.perf_counter() - init) * 1000)
+"""
+
+# cfnresponse is provided by the runtime to inline custom resources, this stand-in imports what it imports
+CFNRESPONSE = """
+import json
+import urllib3
+
+SUCCESS = "SUCCESS"
+FAILED = "FAILED"
+
+
+def send(event, context, responseStatus, responseData, physicalResourceId=None, noEcho=False, reason=None):
+    pass
+"""
+
+
+def handlers(names: list = None) -> list:
+    paths = sorted(
+        path for path in glob.glob(os.path.join(ROOT, "lambda_images", "*", "*.py"))
+        if os.path.relpath(path, ROOT) != CLIENTS_MODULE
+    )
+    if names:
+        paths = [path for path in paths if os.path.splitext(os.path.basename(path))[0] in names]
+    return paths
+
+
+def first_clients(source: str) -> list:
+    # Clients built on first use by the shared helper, None for handlers building theirs some other way
+    if "def client(" not in source:
+        return None
+    return sorted({
+        f"{service_name}:us-east-1" if regional else service_name for service_name, regional in CLIENT_CALL.findall(source)
+    })
+
+
+def measure(path: str, runs: int, snap_start: bool, stubs: str) -> list:
+    # The handler runs from the source deployed inline, with the shared client helper pasted in
+    source = inline_source(path)
+    calls = first_clients(source)
+    index = os.path.join(stubs, "index.py")
+    with open(index, "w") as f:
+        f.write(source)
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=stubs,
+        PYTHONDONTWRITEBYTECODE="1",
+        AWS_REGION="us-east-1",
+        AWS_DEFAULT_REGION="us-east-1",
+        AWS_ACCESS_KEY_ID="testing",
+        AWS_SECRET_ACCESS_KEY="testing",
+        AWS_LAMBDA_FUNCTION_NAME="cold-start-benchmark",
+        DOMAIN_ID="d-benchmark",
+        CANVAS_BUCKET="cold-start-benchmark",
+    )
+    if snap_start:
+        env["AWS_LAMBDA_INITIALIZATION_TYPE"] = "snap-start"
+    else:
+        env.pop("AWS_LAMBDA_INITIALIZATION_TYPE", None)
+
+    timings = []
+    for _ in range(runs):
+        # A new interpreter for every run, nothing is imported yet as in a new execution environment
+        result = subprocess.run(
+            [sys.executable, "-c", INIT, index, *(calls or [])], env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        init, first_invocation = result.stdout.strip().splitlines()[-1].split()
+        timings.append((float(init), float(first_invocation) if calls is not None else None))
+    return timings
+
+
+def benchmark(names: list, runs: int, snap_start: bool) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as stubs:
+        with open(os.path.join(stubs, "cfnresponse.py"), "w") as f:
+            f.write(CFNRESPONSE)
+        for path in handlers(names):
+            name = os.path.relpath(path, ROOT)
+            try:
+                timings = measure(path, runs, snap_start, stubs)
+            except RuntimeError as e:
+                # e.g. pyarrow, which the columnar function gets from its layer
+                results[name] = {"error": str(e)}
+                continue
+            # Cold start as the first request sees it: the init phase and the clients the invocation builds
+            totals = [init + (first_invocation or 0) for init, first_invocation in timings]
+            measured = timings[0][1] is not None
+            results[name] = {
+                "init_ms": statistics.median(init for init, _ in timings),
+                "first_clients_ms": statistics.median(first for _, first in timings) if measured else None,
+                "median_ms": statistics.median(totals),
+                "max_ms": max(totals),
+                "runs": runs,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the init duration of the Lambda handlers in lambda_images, and the clients built by the first invocation"
+    )
+    parser.add_argument("handlers", nargs="*", help="Handler file names without .py, e.g. auto_shutdown, all by default")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters started for each handler")
+    parser.add_argument("--snap-start", action="store_true",
+                        help="Initialize as before a snapshot, with the clients created during the init phase")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.handlers, args.runs, args.snap_start)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'handler':<52}{'init (ms)':>10}{'clients (ms)':>14}{'median (ms)':>13}{'max (ms)':>10}")
+        for name, result in results.items():
+            if "error" in result:
+                print(f"{name:<52}  {result['error']}")
+            else:
+                first_clients_ms = result["first_clients_ms"]
+                print(
+                    f"{name:<52}{result['init_ms']:>10.1f}"
+                    f"{'-' if first_clients_ms is None else f'{first_clients_ms:.1f}':>14}"
+                    f"{result['median_ms']:>13.1f}{result['max_ms']:>10.1f}"
+                )
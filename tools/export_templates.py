@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+import sys
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from products.registry import PRODUCTS  # noqa: E402
+from products.synth_cache import CACHE_DIRECTORY, INDEX_FILE  # noqa: E402
+
+
+def template_name(product_key: str, version_name: str) -> str:
+    # Versions replacing one of the CloudFormation templates of cfn-templates/ are written over it
+    for version in PRODUCTS.get(product_key, {}).get("versions", []):
+        if version["name"] == version_name and version.get("cfn_template"):
+            return version["cfn_template"]
+    return f"{product_key}-{version_name}.yaml"
+
+
+def export(cache_directory: str, output: str, products: list = None) -> list:
+    # Writes the cached template of each product version to cfn-templates/
+    with open(os.path.join(cache_directory, INDEX_FILE)) as f:
+        index = json.load(f)
+
+    os.makedirs(output, exist_ok=True)
+    written = []
+    for name, entry in sorted(index.items()):
+        product_key, _, version_name = name.partition("/")
+        if products and product_key not in products:
+            continue
+        template_path = os.path.join(cache_directory, entry["template"])
+        if not os.path.exists(template_path):
+            print(f"skipping {name}, {entry['template']} is missing from the cache", file=sys.stderr)
+            continue
+        with open(template_path) as f:
+            template = json.load(f)
+
+        path = os.path.join(output, template_name(product_key, version_name))
+        with open(path, "w") as f:
+            f.write(f"# Generated from {entry['class']} by tools/export_templates.py, cache key {entry['key']}\n")
+            yaml.safe_dump(template, f, sort_keys=False, width=120)
+        written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the cached product templates to CloudFormation YAML")
+    parser.add_argument("products", nargs="*", help="Products of products/registry.py, all the cached ones by default")
+    parser.add_argument("--cache", default=CACHE_DIRECTORY, help="Synth cache, filled by cdk synth -c canvas:synth_cache=true")
+    parser.add_argument("--output", default="cfn-templates", help="Directory the templates are written to")
+    args = parser.parse_args()
+    for path in export(args.cache, args.output, args.products):
+        print(path)
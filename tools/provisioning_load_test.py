@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import collections
+import graphlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from products.synth_cache import CACHE_DIRECTORY, INDEX_FILE  # noqa: E402
+
+# Median latency in seconds, sustained calls per second and burst of the APIs the stand-in serves.
+# Rates are the default account quotas where they are documented, and conservative guesses otherwise.
+APIS = {
+    "servicecatalog:ProvisionProduct": (1.0, 5, 10),
+    "cloudformation:CreateStack": (0.5, 5, 10),
+    "cloudformation:UpdateStack": (0.5, 5, 10),
+    "ssm:GetParameters": (0.05, 40, 40),
+    "ssm:PutParameter": (0.1, 3, 3),
+    "iam:CreateRole": (0.3, 10, 15),
+    "iam:PutRolePolicy": (0.3, 10, 15),
+    "lambda:CreateFunction": (0.5, 10, 10),
+    "lambda:Invoke": (0.2, 100, 100),
+    "sagemaker:CreateDomain": (1.0, 1, 2),
+    "sagemaker:UpdateDomain": (0.5, 1, 2),
+    "sagemaker:CreateUserProfile": (0.5, 2, 5),
+    "sagemaker:UpdateUserProfile": (0.5, 2, 5),
+    "sagemaker:DescribeUserProfile": (0.1, 20, 20),
+    "sagemaker:DescribeDomain": (0.1, 20, 20),
+    "cloudformation:GenericResource": (0.5, 1000, 1000),
+}
+# Seconds a resource takes to stabilize after its create call, polled with its describe call every 5 seconds
+STABILIZATION = {
+    "AWS::SageMaker::Domain": (300, "sagemaker:DescribeDomain"),
+    "AWS::SageMaker::UserProfile": (25, "sagemaker:DescribeUserProfile"),
+    "AWS::IAM::Role": (8, None),
+    "AWS::Lambda::Function": (3, None),
+    "AWS::EC2::NatGateway": (90, None),
+    "AWS::EC2::VPCEndpoint": (60, None),
+}
+RESOURCE_APIS = {
+    "AWS::SageMaker::Domain": "sagemaker:CreateDomain",
+    "AWS::SageMaker::UserProfile": "sagemaker:CreateUserProfile",
+    "AWS::IAM::Role": "iam:CreateRole",
+    "AWS::IAM::Policy": "iam:PutRolePolicy",
+    "AWS::Lambda::Function": "lambda:CreateFunction",
+    "AWS::SSM::Parameter": "ssm:PutParameter",
+}
+POLL_INTERVAL = 5
+RETRYABLE = ("ThrottlingException", "InternalFailure")
+
+
+class ApiError(Exception):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+class Clock:
+    # Simulated seconds run scale times faster than real ones, an hour of onboarding takes a few seconds
+    def __init__(self, scale: float):
+        self.scale = scale
+        self.start = time.monotonic()
+
+    def now(self) -> float:
+        return (time.monotonic() - self.start) / self.scale
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds * self.scale)
+
+
+class Throttle:
+    # Token bucket refilled in simulated time
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = 0.0
+
+    def acquire(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class StandIn:
+    # Local stand-in for the CloudFormation, SageMaker, SSM, IAM and Lambda APIs a provisioning calls,
+    # with injected latency, throttling and failures, and the lock SageMaker holds on a domain while it updates
+    def __init__(self, clock: Clock, args):
+        self.clock = clock
+        self.random = random.Random(args.seed)
+        self.latency_scale = args.latency_scale
+        self.failure_rate = args.failure_rate
+        self.max_attempts = args.max_attempts
+        self.throttles = {
+            api: Throttle(rate * args.throttle_scale, burst * args.throttle_scale)
+            for api, (_, rate, burst) in APIS.items()
+        }
+        self.domain_updating_until = 0.0
+        self.stats = collections.defaultdict(collections.Counter)
+
+    def latency(self, median: float) -> float:
+        return self.random.lognormvariate(math.log(median * self.latency_scale), 0.5)
+
+    async def call(self, api: str):
+        # One API call with the SDK's standard retry mode, exponential backoff with full jitter
+        for attempt in range(1, self.max_attempts + 1):
+            self.stats[api]["calls"] += 1
+            try:
+                await self.attempt(api)
+                return
+            except ApiError as e:
+                if e.code not in RETRYABLE or attempt == self.max_attempts:
+                    raise ApiError(f"{api} {e.code}")
+                self.stats[api]["retries"] += 1
+                await self.clock.sleep(self.random.uniform(0, min(20, 0.5 * 2 ** attempt)))
+
+    async def attempt(self, api: str):
+        if not self.throttles[api].acquire(self.clock.now()):
+            self.stats[api]["throttled"] += 1
+            raise ApiError("ThrottlingException")
+        await self.clock.sleep(self.latency(APIS[api][0]))
+        if self.random.random() < self.failure_rate:
+            raise ApiError("InternalFailure")
+
+        now = self.clock.now()
+        if api in ("sagemaker:CreateUserProfile", "sagemaker:UpdateUserProfile") and now < self.domain_updating_until:
+            raise ApiError("ResourceInUse")
+        if api == "sagemaker:UpdateDomain":
+            if now < self.domain_updating_until:
+                raise ApiError("ResourceInUse")
+            self.domain_updating_until = now + self.latency(60)
+
+    async def stabilize(self, resource_type: str):
+        seconds, describe = STABILIZATION.get(resource_type, (0, None))
+        remaining = self.latency(seconds) if seconds else 0
+        while remaining > 0:
+            await self.clock.sleep(min(POLL_INTERVAL, remaining))
+            remaining -= POLL_INTERVAL
+            if describe:
+                await self.call(describe)
+
+
+def references(value) -> set:
+    # Logical ids a template value refers to through Ref, Fn::GetAtt and Fn::Sub
+    found = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "Ref" and isinstance(item, str):
+                found.add(item)
+            elif key == "Fn::GetAtt":
+                found.add(item[0] if isinstance(item, list) else item.split(".")[0])
+            elif key == "Fn::Sub":
+                text = item[0] if isinstance(item, list) else item
+                found.update(name.split(".")[0] for name in re.findall(r"\$\{([^!][^}]*)\}", text))
+                if isinstance(item, list):
+                    found.update(references(item[1]))
+            else:
+                found.update(references(item))
+    elif isinstance(value, list):
+        for item in value:
+            found.update(references(item))
+    return found
+
+
+def dynamic_references(value) -> set:
+    # {{resolve:ssm:...}} references, built with Fn::Join when the parameter path depends on a template parameter
+    found = set()
+    if isinstance(value, dict):
+        join = value.get("Fn::Join")
+        if join and join[1] and isinstance(join[1][0], str) and join[1][0].startswith("{{resolve:ssm:"):
+            found.add(json.dumps(join, sort_keys=True))
+        for item in value.values():
+            found.update(dynamic_references(item))
+    elif isinstance(value, list):
+        for item in value:
+            found.update(dynamic_references(item))
+    elif isinstance(value, str):
+        found.update(re.findall(r"\{\{resolve:ssm:[^}]+\}\}", value))
+    return found
+
+
+def evaluate(condition, conditions: dict, parameters: dict):
+    if isinstance(condition, dict):
+        (function, arguments), = condition.items()
+        if function == "Ref":
+            return parameters.get(arguments)
+        if function == "Condition":
+            return evaluate(conditions[arguments], conditions, parameters)
+        values = [evaluate(argument, conditions, parameters) for argument in arguments]
+        if function == "Fn::Equals":
+            return values[0] == values[1]
+        if function == "Fn::Contains":
+            return values[1] in values[0]
+        if function == "Fn::Not":
+            return not values[0]
+        if function == "Fn::And":
+            return all(values)
+        if function == "Fn::Or":
+            return any(values)
+        raise ValueError(f"Unsupported condition function {function}")
+    if isinstance(condition, list):
+        return [evaluate(item, conditions, parameters) for item in condition]
+    return condition
+
+
+class StackPlan:
+    # Resources a template creates for the given parameters, with the resources each one waits for
+    def __init__(self, template: dict, overrides: dict):
+        parameters = {}
+        self.ssm_parameters = 0
+        for name, parameter in template.get("Parameters", {}).items():
+            value = overrides.get(name, parameter.get("Default", ""))
+            if parameter["Type"] == "CommaDelimitedList":
+                value = [item for item in value.split(",") if item]
+            if parameter["Type"].startswith("AWS::SSM::Parameter::Value"):
+                self.ssm_parameters += 1
+            parameters[name] = value
+        conditions = template.get("Conditions", {})
+        resources = {
+            logical_id: resource for logical_id, resource in template["Resources"].items()
+            if "Condition" not in resource or evaluate(conditions[resource["Condition"]], conditions, parameters)
+        }
+        self.resources = {}
+        for logical_id, resource in resources.items():
+            depends_on = resource.get("DependsOn", [])
+            depends_on = [depends_on] if isinstance(depends_on, str) else depends_on
+            dependencies = (references(resource.get("Properties", {})) | set(depends_on)) & set(resources)
+            self.resources[logical_id] = (resource["Type"], resource.get("Properties", {}), dependencies)
+        self.ssm_parameters += len(dynamic_references(resources))
+        # CloudFormation rejects circular dependencies, the stand-in would wait on them forever
+        graphlib.TopologicalSorter({logical_id: entry[2] for logical_id, entry in self.resources.items()}).prepare()
+
+
+async def create_resource(stand_in: StandIn, resource_type: str, properties: dict):
+    if resource_type == "AWS::CloudFormation::CustomResource" or resource_type.startswith("Custom::"):
+        await stand_in.call("lambda:Invoke")
+        # The custom resources of the portfolio update the user profile or the domain they are given
+        if "UserProfileName" in properties:
+            await stand_in.call("sagemaker:UpdateUserProfile")
+        elif "SageMakerDomainId" in properties:
+            await stand_in.call("sagemaker:UpdateDomain")
+        return
+    await stand_in.call(RESOURCE_APIS.get(resource_type, "cloudformation:GenericResource"))
+    await stand_in.stabilize(resource_type)
+
+
+async def provision(stand_in: StandIn, plan: StackPlan, operation: str = "cloudformation:CreateStack"):
+    # Like CloudFormation, every resource is created as soon as the resources it refers to are complete,
+    # the first failure fails the stack
+    await stand_in.call("servicecatalog:ProvisionProduct")
+    await stand_in.call(operation)
+    for _ in range(math.ceil(plan.ssm_parameters / 10)):
+        await stand_in.call("ssm:GetParameters")
+
+    done = {logical_id: asyncio.Event() for logical_id in plan.resources}
+
+    async def create(logical_id):
+        resource_type, properties, dependencies = plan.resources[logical_id]
+        for dependency in dependencies:
+            await done[dependency].wait()
+        await create_resource(stand_in, resource_type, properties)
+        done[logical_id].set()
+
+    tasks = [asyncio.ensure_future(create(logical_id)) for logical_id in plan.resources]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    position = q / 100 * (len(ordered) - 1)
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def load_template(cache_directory: str, name: str) -> dict:
+    with open(os.path.join(cache_directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    if name not in index:
+        raise SystemExit(f"{name} is not in {cache_directory}, run cdk synth first. Cached: {sorted(index)}")
+    with open(os.path.join(cache_directory, index[name]["template"])) as f:
+        return json.load(f)
+
+
+async def load_test(args) -> dict:
+    clock = Clock(args.time_scale)
+    stand_in = StandIn(clock, args)
+    rng = random.Random(args.seed)
+    overrides = dict(parameter.split("=", 1) for parameter in args.parameter)
+    plan = StackPlan(load_template(args.cache, args.product), overrides)
+    domain_update = StackPlan({"Resources": {
+        "CanvasSettings": {"Type": "AWS::CloudFormation::CustomResource", "Properties": {"SageMakerDomainId": "d"}},
+    }}, {})
+
+    semaphore = asyncio.Semaphore(args.concurrency) if args.concurrency else None
+    durations, failures = [], collections.Counter()
+
+    async def run(arrival: float, stack_plan: StackPlan, operation: str, record: bool):
+        await clock.sleep(arrival)
+        start = clock.now()
+        try:
+            if semaphore:
+                async with semaphore:
+                    await provision(stand_in, stack_plan, operation)
+            else:
+                await provision(stand_in, stack_plan, operation)
+        except ApiError as e:
+            if record:
+                failures[e.code] += 1
+            return
+        if record:
+            durations.append(clock.now() - start)
+
+    arrivals = sorted(rng.uniform(0, args.duration) for _ in range(args.provisionings))
+    updates = sorted(rng.uniform(0, args.duration) for _ in range(args.domain_updates))
+    await asyncio.gather(
+        *(run(arrival, plan, "cloudformation:CreateStack", True) for arrival in arrivals),
+        *(run(arrival, domain_update, "cloudformation:UpdateStack", False) for arrival in updates),
+    )
+    elapsed = clock.now()
+
+    return {
+        "product": args.product,
+        "provisionings": args.provisionings,
+        "succeeded": len(durations),
+        "failed": sum(failures.values()),
+        "simulated_seconds": round(elapsed, 1),
+        "throughput_per_hour": round(len(durations) / elapsed * 3600, 1) if elapsed else 0,
+        "provisioning_seconds": {
+            name: round(percentile(durations, q), 1) for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "failure_modes": dict(failures.most_common()),
+        "apis": {api: dict(counter) for api, counter in sorted(stand_in.stats.items())},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Provision a synthesized product template many times against a local stand-in of the AWS APIs"
+    )
+    parser.add_argument("--product", default="canvas-user/v1", help="<product>/<version> of the synth cache index")
+    parser.add_argument("--cache", default=CACHE_DIRECTORY, help="Synth cache, filled by cdk synth")
+    parser.add_argument("--parameter", action="append", default=[], help="Template parameter, e.g. WorkspaceLayout=per-user")
+    parser.add_argument("--provisionings", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=3600, help="Simulated seconds the provisionings arrive over")
+    parser.add_argument("--concurrency", type=int, default=0, help="Provisionings in flight at most, unbounded by default")
+    parser.add_argument("--domain-updates", type=int, default=0,
+                        help="Domain product updates during the test, SageMaker rejects user profile changes meanwhile")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies the API latencies")
+    parser.add_argument("--throttle-scale", type=float, default=1.0, help="Multiplies the API rates and bursts")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of API calls failing with InternalFailure")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts per API call, as the SDK retry mode")
+    parser.add_argument("--time-scale", type=float, default=0.002, help="Real seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(load_test(args)), indent=2))